@@ -3,43 +3,65 @@ Point d'entrée principal de l'API backend.
 Fournit les endpoints pour l'analyse de projet, la prévisualisation et la génération de PDF.
 """
 
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, send_file
 from flask_cors import CORS
+import io
 import os
 import sys
+import copy
 import json
 import uuid
-from datetime import datetime
+import zipfile
+from datetime import datetime, timedelta
 from werkzeug.utils import secure_filename
 from config import TELLERS_INFO
 
 # Import des modules locaux
 from text_analyzer import analyze_work_description, get_explanation
 from contract_previewer import preview_contract, generate_contract_preview
-from pdf_generator import generate_pdf
-from utils import collect_author_info, ensure_default_supports
+from pdf_generator import pdf_builder_args, render_pdf
+from utils import collect_author_info, ensure_default_supports, get_base_user_id, user_has_access
 from contract_builder import ContractBuilder
 from contract_generator import generate_contract_text
 from contract_analyzer import analyze_project_description
+from contract_store import (create_contract_store, project_contract, decode_cursor, VersionConflict, SUMMARY_FIELDS,
+                            SORT_FIELDS, SUBDOCUMENT_FIELDS, TOMBSTONE_RETENTION_DAYS)
+from storage_codec import write_document
+import data_layout
+from elements_cache import ElementsCache, elements_cache_key, to_editor_elements
+from pdf_cache import PdfCache, pdf_cache_key
+from migration_jobs import MigrationJobs, migrate_contract, migrate_contract_owner
+from data_cleanup import AnonymousDataCollector
+from tmp_janitor import (TmpJanitor, DEFAULT_MAX_MB as TMP_DEFAULT_MAX_MB,
+                         DEFAULT_MAX_AGE_HOURS as TMP_DEFAULT_MAX_AGE_HOURS)
+from contract_export import export_info, check_since, ndjson_export, zip_export, passthrough_export
+from contract_import import (detect_import_format, iter_records, iter_ndjson_records, import_records,
+                             prepare_imported_contract, DEFAULT_MAX_RECORD_BYTES)
+from cessionnaire_resolver import CessionnaireResolver
+from data_schema import normalize_contract_data, normalize_profile
+from json_patch import (apply_json_patch, apply_merge_patch, patch_roots, JsonPatchError, JsonPatchTestFailed,
+                        JSON_PATCH_MEDIA_TYPE)
 
 app = Flask(__name__)
 
 # Configuration CORS complètement permissive
 CORS(app, 
      origins="*", 
-     allow_headers=["Content-Type", "Authorization", "X-Requested-With"],
+     allow_headers=["Content-Type", "Authorization", "X-Requested-With", "If-Match", "If-None-Match"],
+     expose_headers=["ETag"],
      supports_credentials=True,
      max_age=3600)
 
-# Définir le répertoire temporaire pour les fichiers PDF
+# Définir le répertoire temporaire (les PDF téléchargés sont générés en mémoire, sans y passer)
 # S'assurer que le chemin correspond à celui défini dans render.yaml
-TMP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tmp')
+# (LEXFORGE_TMP_DIR et LEXFORGE_DATA_DIR permettent d'en changer, ex: pour les tests)
+TMP_DIR = os.environ.get('LEXFORGE_TMP_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tmp')
 if not os.path.exists(TMP_DIR):
     os.makedirs(TMP_DIR)
     
 # Définir le répertoire de stockage des contrats
 # S'assurer que le chemin correspond à celui défini dans render.yaml
-DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+DATA_DIR = os.environ.get('LEXFORGE_DATA_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
 CONTRACTS_DIR = os.path.join(DATA_DIR, 'contracts')
 USER_PROFILES_DIR = os.path.join(DATA_DIR, 'user_profiles')
 
@@ -47,6 +69,66 @@ USER_PROFILES_DIR = os.path.join(DATA_DIR, 'user_profiles')
 os.makedirs(CONTRACTS_DIR, exist_ok=True)
 os.makedirs(USER_PROFILES_DIR, exist_ok=True)
 
+# Backend de stockage des contrats (fichiers JSON par défaut, SQLite via LEXFORGE_CONTRACT_STORE=sqlite)
+CONTRACTS_DB_PATH = os.path.join(DATA_DIR, 'contracts.sqlite3')
+contract_store = create_contract_store(CONTRACTS_DIR, CONTRACTS_DB_PATH)
+
+# Taille maximale d'une page de GET /api/contracts
+MAX_CONTRACTS_PAGE_SIZE = 200
+
+# Champs gérés par le serveur, non modifiables par PATCH /api/contracts/<id>
+PATCH_PROTECTED_FIELDS = ('id', 'user_id', 'original_user_id', 'created_at', 'updated_at', 'schema_version', 'version')
+
+# Durée de conservation des tombstones: un curseur de GET /api/contracts/changes plus ancien
+# impose un rechargement complet
+TOMBSTONE_RETENTION = int(os.environ.get('LEXFORGE_TOMBSTONE_RETENTION_DAYS', str(TOMBSTONE_RETENTION_DAYS)))
+
+# Taille maximale d'un contrat dans un import en masse
+IMPORT_MAX_RECORD_BYTES = int(os.environ.get('LEXFORGE_IMPORT_MAX_RECORD_BYTES', str(DEFAULT_MAX_RECORD_BYTES)))
+
+# Cache des éléments de l'éditeur générés par le ContractBuilder
+elements_cache = ElementsCache(int(os.environ.get('LEXFORGE_ELEMENTS_CACHE_SIZE', '128')))
+
+# Cache des PDF générés, en mémoire du worker puis sur le disque temporaire (voir pdf_cache.py)
+pdf_cache = PdfCache(
+    os.path.join(TMP_DIR, 'pdf_cache'),
+    memory_max_bytes=int(os.environ.get('LEXFORGE_PDF_CACHE_MEMORY_MB', '32')) * 1024 * 1024,
+    disk_max_bytes=int(os.environ.get('LEXFORGE_PDF_CACHE_DISK_MB', '256')) * 1024 * 1024
+)
+
+# Résolution du cessionnaire, avec cache des profils utilisateur validé par mtime
+cessionnaire_resolver = CessionnaireResolver(
+    USER_PROFILES_DIR, int(os.environ.get('LEXFORGE_PROFILE_CACHE_SIZE', '256'))
+)
+
+# Au-delà de ce nombre de contrats, la migration d'un utilisateur anonyme se fait en arrière-plan
+MIGRATION_SYNC_LIMIT = int(os.environ.get('LEXFORGE_MIGRATION_SYNC_LIMIT', '200'))
+migration_jobs = MigrationJobs(os.path.join(DATA_DIR, 'migration_jobs'), contract_store)
+migration_jobs.resume_pending()
+
+# Suppression des données des utilisateurs anonymes inactifs (voir data_cleanup.py).
+# Le nettoyage périodique dans le serveur est désactivé par défaut (python data_cleanup.py via cron)
+anonymous_data_collector = AnonymousDataCollector(
+    contract_store, USER_PROFILES_DIR,
+    ttl_days=int(os.environ.get('LEXFORGE_ANON_TTL_DAYS', '30')),
+    pause_seconds=int(os.environ.get('LEXFORGE_ANON_GC_PAUSE_MS', '50')) / 1000,
+    tombstone_retention_days=TOMBSTONE_RETENTION
+)
+ANON_GC_INTERVAL_HOURS = float(os.environ.get('LEXFORGE_ANON_GC_INTERVAL_HOURS', '0'))
+if ANON_GC_INTERVAL_HOURS > 0:
+    anonymous_data_collector.start_scheduler(ANON_GC_INTERVAL_HOURS * 3600)
+
+# Nettoyage du répertoire temporaire (voir tmp_janitor.py): budget en octets et durée maximale,
+# fait par un seul worker à la fois
+tmp_janitor = TmpJanitor(
+    TMP_DIR,
+    max_bytes=int(os.environ.get('LEXFORGE_TMP_MAX_MB', str(TMP_DEFAULT_MAX_MB))) * 1024 * 1024,
+    max_age_seconds=float(os.environ.get('LEXFORGE_TMP_MAX_AGE_HOURS', str(TMP_DEFAULT_MAX_AGE_HOURS))) * 3600
+)
+TMP_JANITOR_INTERVAL_MINUTES = float(os.environ.get('LEXFORGE_TMP_JANITOR_INTERVAL_MINUTES', '10'))
+if TMP_JANITOR_INTERVAL_MINUTES > 0:
+    tmp_janitor.start_scheduler(TMP_JANITOR_INTERVAL_MINUTES * 60)
+
 # Structure par défaut pour un nouveau profil
 DEFAULT_PROFILE = {
     "physical_person": {
@@ -72,6 +154,68 @@ DEFAULT_PROFILE = {
     "user_id": ""  # Nouvel attribut pour stocker l'ID utilisateur
 }
 
+def has_contract_access(endpoint, contract_id, user_id, contract_user_id):
+    """
+    Vérifie si un utilisateur a accès à un contrat et trace la vérification.
+
+    Args:
+        endpoint (str): Nom de l'endpoint appelant (pour les traces)
+        contract_id (str): ID du contrat
+        user_id (str): ID de l'utilisateur qui fait la requête
+        contract_user_id (str): ID du propriétaire du contrat (issu de l'index)
+
+    Returns:
+        bool: True si l'accès est autorisé
+    """
+    has_access = user_has_access(user_id, contract_user_id)
+
+    print(f"DEBUG - {endpoint} - Vérification d'accès au contrat {contract_id}:")
+    print(f"  - ID utilisateur: {user_id} (base: {get_base_user_id(user_id)})")
+    print(f"  - ID du contrat: {contract_user_id} (base: {get_base_user_id(contract_user_id)})")
+    print(f"  - Accès autorisé: {has_access}")
+
+    return has_access
+
+def version_conflict(version):
+    """
+    Réponse 409 d'une écriture refusée parce que le contrat a été modifié depuis sa lecture
+    (If-Match ne correspond plus). Le client doit relire le contrat (version et ETag actuels).
+    """
+    response = jsonify({'error': 'Le contrat a été modifié depuis sa lecture', 'version': version})
+    response.status_code = 409
+    response.set_etag(str(version))
+    return response
+
+@app.errorhandler(VersionConflict)
+def handle_version_conflict(e):
+    # Écriture concurrente détectée par le stockage (voir ContractStore.save)
+    return version_conflict(e.version)
+
+@app.errorhandler(data_layout.InvalidId)
+def handle_invalid_id(e):
+    # ID de contrat fourni par le client qui ne peut pas servir de nom de fichier (ex: "../x")
+    return jsonify({'error': 'ID de contrat invalide'}), 400
+
+def if_match_failed(contract):
+    """
+    Indique si l'en-tête If-Match de la requête ne correspond pas à la version du contrat.
+    Sans en-tête If-Match, l'écriture est acceptée quelle que soit la version.
+    """
+    return bool(request.if_match) and not request.if_match.contains(str(contract.get('version', 0)))
+
+def save_user_profile(user_id, profile):
+    """
+    Écrit le profil d'un utilisateur à son emplacement réparti, sous sa forme normalisée.
+    """
+    profile = normalize_profile(profile)
+    filename = f'user_profile_{user_id}.json'
+    path = data_layout.write_path(USER_PROFILES_DIR, filename)
+    # Même verrou que storage_codec.migrate, qui peut réécrire le fichier pendant que l'API tourne
+    with contract_store.locks.hold(filename):
+        stat = write_document(path, profile)
+        data_layout.remove_legacy(USER_PROFILES_DIR, filename)
+    cessionnaire_resolver.profile_cache.put(path, profile, stat)
+
 @app.route('/api', methods=['GET'])
 def index():
     """
@@ -82,6 +226,21 @@ def index():
         'message': 'LexForge API is running'
     })
 
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """
+    Endpoint exposant les métriques internes du worker (caches, stockage).
+    """
+    return jsonify({
+        'pid': os.getpid(),
+        'contract_store': contract_store.stats(),
+        'elements_cache': elements_cache.stats(),
+        'pdf_cache': pdf_cache.stats(),
+        'cessionnaire_resolver': cessionnaire_resolver.stats(),
+        'anonymous_data_gc': anonymous_data_collector.stats(),
+        'tmp_dir': tmp_janitor.stats()
+    })
+
 @app.route('/api/analyze', methods=['POST'])
 def analyze():
     """
@@ -114,80 +273,18 @@ def preview():
         # Récupérer l'ID utilisateur
         user_id = contract_data.get('user_id', 'anonymous')
         
-        # Si l'utilisateur a un profil configuré, utiliser ces informations
-        user_profile = {}
-        USER_PROFILE_FILE_WITH_ID = os.path.join(USER_PROFILES_DIR, f'user_profile_{user_id}.json')
-        if os.path.exists(USER_PROFILE_FILE_WITH_ID):
-            with open(USER_PROFILE_FILE_WITH_ID, 'r') as f:
-                user_profile = json.load(f)
+        # Le cessionnaire de l'aperçu suit les informations saisies (entreprise_info), puis le profil
+        # Normaliser une fois les informations des parties saisies dans le wizard
+        contract_data = normalize_contract_data(contract_data)
         
-        # Fonction pour normaliser les données entre l'étape 3 et le dashboard
-        def normalize_data(data):
-            normalized = data.copy() if data else {}
-            
-            # Mapping entre les noms de champs potentiellement différents
-            field_mappings = {
-                'rcs': 'siren',
-                'siege': 'adresse',
-                'representant': 'representant_nom',
-            }
-            
-            # Appliquer les mappings
-            for old_field, new_field in field_mappings.items():
-                if old_field in normalized and not normalized.get(new_field):
-                    normalized[new_field] = normalized[old_field]
-                    
-            # Assurer que l'adresse complète est extraite des composants si nécessaire
-            if 'adresse' in normalized and 'code_postal' in normalized and 'ville' in normalized:
-                address_parts = []
-                if normalized.get('adresse'):
-                    address_parts.append(normalized['adresse'])
-                
-                city_part = ''
-                if normalized.get('code_postal'):
-                    city_part += normalized['code_postal'] 
-                if normalized.get('ville'):
-                    if city_part:
-                        city_part += ' '
-                    city_part += normalized['ville']
-                
-                if city_part:
-                    address_parts.append(city_part)
-                
-                if address_parts:
-                    normalized['adresse_complete'] = ', '.join(address_parts)
-            
-            return normalized
-        
-        # 1. Vérifier si entreprise_info est fourni dans les données du contrat et l'utiliser en priorité
-        entreprise_info = contract_data.get('entreprise_info')
-        if entreprise_info:
-            entreprise_info = normalize_data(entreprise_info)
-            print(f"entreprise_info trouvé et normalisé: {json.dumps(entreprise_info, indent=2)}")
-            print(f"IMPORTANT - Type détecté: {entreprise_info.get('type')}, prenom présent: {'prenom' in entreprise_info}")
-            cessionnaire_info = entreprise_info
-        elif user_profile.get('selected_entity_type') == 'physical_person' and user_profile['physical_person']['is_configured']:
-            cessionnaire_info = user_profile['physical_person']
-            print("Utilisation du profil physical_person comme cessionnaire_info")
-            cessionnaire_info = normalize_data(cessionnaire_info)
-        elif user_profile.get('selected_entity_type') == 'legal_entity' and user_profile['legal_entity']['is_configured']:
-            cessionnaire_info = user_profile['legal_entity']
-            print("Utilisation du profil legal_entity comme cessionnaire_info")
-            cessionnaire_info = normalize_data(cessionnaire_info)
-        else:
-            # 3. Utiliser les informations par défaut de Tellers
-            cessionnaire_info = TELLERS_INFO
-            print("Utilisation des informations par défaut Tellers comme cessionnaire_info")
+        cessionnaire_info, source = cessionnaire_resolver.resolve(contract_data, user_id, use_stored=False)
+        print(f"Cessionnaire de l'aperçu résolu depuis: {source}")
         
         # IMPORTANT: Stocker explicitement les informations du cessionnaire dans le contrat
         # pour éviter de les perdre lors de la migration ou du changement de profil
         contract_data['cessionnaire_info'] = cessionnaire_info
         print(f"Sauvegarde explicite des informations du cessionnaire dans les données du contrat: {json.dumps(cessionnaire_info, indent=2)}")
         
-        # Faire la même chose pour les informations de l'auteur si présentes
-        if 'auteur_info' in contract_data:
-            contract_data['auteur_info'] = normalize_data(contract_data['auteur_info'])
-        
         # Utiliser la nouvelle fonction generate_contract_preview
         preview_text = generate_contract_preview(contract_data)
         return jsonify({'preview': preview_text})
@@ -197,68 +294,18 @@ def preview():
         traceback.print_exc()
         return jsonify({'preview': "Une erreur est survenue lors de la génération de l'aperçu.", 'error': str(e)})
 
-@app.route('/api/generate-pdf', methods=['POST'])
-def create_pdf():
+def contract_pdf_args(contract_data, user_id, contract=None):
     """
-    Endpoint pour générer le PDF du contrat.
+    Détermine les paramètres du PDF d'un contrat, le cessionnaire étant résolu comme pour l'éditeur.
+
+    Args:
+        contract_data (dict): Données du contrat, normalisées (voir data_schema.py)
+        user_id (str): ID de l'utilisateur qui demande le PDF
+        contract (dict, optional): Contrat enregistré dont les données sont issues
+
+    Returns:
+        dict: Paramètres canonisés du PDF (voir pdf_generator.pdf_builder_args)
     """
-    data = request.json
-    contract_data = data.get('contractData', {})
-    filename = data.get('filename', 'contrat')
-    user_id = data.get('user_id', 'anonymous')  # Récupérer l'ID utilisateur
-    contract_id = data.get('contractId')  # ID du contrat s'il s'agit d'un contrat sauvegardé
-    
-    # Fonction pour normaliser les données entre l'étape 3 et le dashboard
-    def normalize_data(data):
-        normalized = data.copy() if data else {}
-        
-        # Mapping entre les noms de champs potentiellement différents
-        field_mappings = {
-            'rcs': 'siren',
-            'siege': 'adresse',
-            'representant': 'representant_nom',
-        }
-        
-        # Appliquer les mappings
-        for old_field, new_field in field_mappings.items():
-            if old_field in normalized and not normalized.get(new_field):
-                normalized[new_field] = normalized[old_field]
-                
-        # Assurer que l'adresse complète est extraite des composants si nécessaire
-        if 'adresse' in normalized and 'code_postal' in normalized and 'ville' in normalized:
-            address_parts = []
-            if normalized.get('adresse'):
-                address_parts.append(normalized['adresse'])
-            
-            city_part = ''
-            if normalized.get('code_postal'):
-                city_part += normalized['code_postal'] 
-            if normalized.get('ville'):
-                if city_part:
-                    city_part += ' '
-                city_part += normalized['ville']
-            
-            if city_part:
-                address_parts.append(city_part)
-            
-            if address_parts:
-                normalized['adresse_complete'] = ', '.join(address_parts)
-        
-        return normalized
-    
-    # Si on a un ID de contrat et que le contract_data est vide, charger les données du contrat
-    contract = None
-    if contract_id and not contract_data:
-        contract_file = os.path.join(CONTRACTS_DIR, f"{contract_id}.json")
-        if os.path.exists(contract_file):
-            try:
-                with open(contract_file, 'r', encoding='utf-8') as f:
-                    contract = json.load(f)
-                contract_data = contract.get('data', {})
-                print(f"PDF: Données du contrat {contract_id} chargées")
-            except Exception as e:
-                print(f"PDF: Erreur lors du chargement du contrat {contract_id}: {str(e)}")
-    
     # Extraire les données du contrat
     contract_type = contract_data.get('type_contrat', [])
     is_free = contract_data.get('type_cession', 'Gratuite')
@@ -273,73 +320,87 @@ def create_pdf():
     
     # ⚠️ IMPORTANT: Utiliser en priorité les informations de cessionnaire stockées dans le contrat
     # au lieu de celles du profil utilisateur actuel
-    cessionnaire_info = None
-    
-    # 1. Vérifier d'abord si le contrat contient déjà des infos de cessionnaire
-    if 'cessionnaire_info' in contract_data:
-        print(f"PDF: Utilisation des infos de cessionnaire stockées dans le contrat")
-        cessionnaire_info = contract_data['cessionnaire_info']
-        cessionnaire_info = normalize_data(cessionnaire_info)
-    # 2. Ensuite, vérifier si entreprise_info est disponible
-    elif 'entreprise_info' in contract_data and contract_data['entreprise_info']:
-        print(f"PDF: Utilisation de entreprise_info du contrat")
-        cessionnaire_info = normalize_data(contract_data['entreprise_info'])
-    # 3. Si le contrat existe et a été importé/migré, essayer de récupérer le profil original
-    elif contract and contract.get('original_user_id'):
-        original_user_id = contract.get('original_user_id')
-        original_profile_path = os.path.join(USER_PROFILES_DIR, f'user_profile_{original_user_id}.json')
-        
-        if os.path.exists(original_profile_path):
-            print(f"PDF: Utilisation du profil original: {original_user_id}")
-            try:
-                with open(original_profile_path, 'r') as f:
-                    original_profile = json.load(f)
-                
-                if original_profile.get('selected_entity_type') == 'physical_person' and original_profile['physical_person']['is_configured']:
-                    cessionnaire_info = normalize_data(original_profile['physical_person'])
-                elif original_profile.get('selected_entity_type') == 'legal_entity' and original_profile['legal_entity']['is_configured']:
-                    cessionnaire_info = normalize_data(original_profile['legal_entity'])
-            except Exception as e:
-                print(f"PDF: Erreur lors de la lecture du profil original: {e}")
-    
-    # 4. Si aucune des options ci-dessus n'a fonctionné, utiliser le profil utilisateur actuel
-    if not cessionnaire_info:
-        # Récupérer les informations du cessionnaire depuis le profil utilisateur spécifique
-        USER_PROFILE_FILE_WITH_ID = os.path.join(USER_PROFILES_DIR, f'user_profile_{user_id}.json')
-        if os.path.exists(USER_PROFILE_FILE_WITH_ID):
-            print(f"PDF: Utilisation du profil utilisateur actuel en dernier recours")
-            with open(USER_PROFILE_FILE_WITH_ID, 'r') as f:
-                user_profile = json.load(f)
-            
-            # Si un type d'entité est sélectionné, utiliser ses informations comme cessionnaire
-            if user_profile.get('selected_entity_type') == 'physical_person' and user_profile['physical_person']['is_configured']:
-                cessionnaire_info = user_profile['physical_person']
-                cessionnaire_info = normalize_data(cessionnaire_info)
-            elif user_profile.get('selected_entity_type') == 'legal_entity' and user_profile['legal_entity']['is_configured']:
-                cessionnaire_info = user_profile['legal_entity']
-                cessionnaire_info = normalize_data(cessionnaire_info)
-            else:
-                # Utiliser les informations par défaut de Tellers
-                cessionnaire_info = TELLERS_INFO
-        else:
-            cessionnaire_info = TELLERS_INFO
-    
-    # Normaliser également les informations sur l'auteur
-    if author_info:
-        author_info = normalize_data(author_info)
+    original_user_id = contract.get('original_user_id') if contract else None
+    cessionnaire_info, source = cessionnaire_resolver.resolve(contract_data, user_id, original_user_id)
+    print(f"PDF: Cessionnaire résolu depuis: {source}")
     
     print(f"PDF: Infos cessionnaire finales: {cessionnaire_info}")
     
-    # Générer le PDF
-    pdf_path = generate_pdf(
+    return pdf_builder_args(
         contract_type, is_free, author_type, author_info,
         work_description, image_description, supports,
         additional_rights, remuneration, is_exclusive,
         cessionnaire_info=cessionnaire_info
     )
+
+def pdf_response(builder_args, filename):
+    """
+    Réponse de téléchargement du PDF d'un contrat, généré en mémoire (en mode déterministe) ou lu
+    dans le cache. Les mêmes paramètres donnant toujours les mêmes octets, la clé du cache sert
+    d'ETag fort: un PDF déjà téléchargé est revalidé (304) sans être généré ni lu.
+    Content-Length et requêtes partielles (Range) sont gérés par send_file.
+    """
+    etag = pdf_cache_key(builder_args)
+    if request.method in ('GET', 'HEAD') and request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    # Générer le PDF en mémoire, sauf s'il est déjà en cache
+    pdf = pdf_cache.get_or_render(etag, lambda: render_pdf(builder_args, deterministic=True))
+    return send_file(io.BytesIO(pdf), mimetype='application/pdf', as_attachment=True,
+                     download_name=f"{filename}.pdf", etag=etag, conditional=True)
+
+@app.route('/api/generate-pdf', methods=['POST'])
+def create_pdf():
+    """
+    Endpoint pour générer le PDF du contrat.
+    """
+    data = request.json
+    contract_data = data.get('contractData', {})
+    filename = data.get('filename', 'contrat')
+    user_id = data.get('user_id', 'anonymous')  # Récupérer l'ID utilisateur
+    contract_id = data.get('contractId')  # ID du contrat s'il s'agit d'un contrat sauvegardé
+    
+    # Si on a un ID de contrat et que le contract_data est vide, charger les données du contrat
+    contract = None
+    if contract_id and not contract_data:
+        try:
+            contract = contract_store.get(contract_id)
+            if contract:
+                contract_data = contract.get('data', {})
+                print(f"PDF: Données du contrat {contract_id} chargées")
+        except Exception as e:
+            print(f"PDF: Erreur lors du chargement du contrat {contract_id}: {str(e)}")
+    
+    # Les contrats enregistrés sont déjà normalisés; seules les données reçues doivent l'être
+    if contract is None:
+        contract_data = normalize_contract_data(contract_data)
+    
+    # Envoyer le PDF directement depuis la mémoire
+    return pdf_response(contract_pdf_args(contract_data, user_id, contract), filename)
+
+@app.route('/api/contracts/<contract_id>/pdf', methods=['GET'])
+def get_contract_pdf(contract_id):
+    """
+    Endpoint pour télécharger le PDF d'un contrat enregistré.
+    En GET, le navigateur peut revalider le téléchargement (If-None-Match) ou le reprendre (Range).
+    """
+    user_id = request.args.get('user_id', 'anonymous')
+    
+    contract_user_id = contract_store.get_owner(contract_id)
+    if contract_user_id is None:
+        return jsonify({'error': 'Contrat non trouvé'}), 404
     
-    # Envoyer le fichier PDF
-    return send_file(pdf_path, as_attachment=True, download_name=f"{filename}.pdf")
+    if not has_contract_access('get_contract_pdf', contract_id, user_id, contract_user_id):
+        return jsonify({'error': 'Accès non autorisé'}), 403
+    
+    contract = contract_store.get(contract_id)
+    if contract is None:
+        return jsonify({'error': 'Contrat non trouvé'}), 404
+    
+    filename = request.args.get('filename') or contract.get('title') or 'contrat'
+    return pdf_response(contract_pdf_args(contract.get('data', {}), user_id, contract), filename)
 
 # Routes pour la gestion des contrats sauvegardés
 @app.route('/api/contracts', methods=['POST'])
@@ -354,67 +415,16 @@ def save_contract():
     from_step6 = data.get('fromStep6', False)  # Nouveau champ pour indiquer si ça vient de l'étape 6
     user_id = data.get('user_id', 'anonymous')  # Récupérer l'ID utilisateur, utiliser 'anonymous' par défaut
     
+    # Normaliser les informations des parties avant de résoudre le cessionnaire
+    contract_data = normalize_contract_data(contract_data)
+    
     # S'assurer que les informations du cessionnaire sont présentes dans le contrat
     if not contract_data.get('cessionnaire_info'):
-        # Fonction pour normaliser les données
-        def normalize_data(data):
-            normalized = data.copy() if data else {}
-            
-            # Mapping entre les noms de champs potentiellement différents
-            field_mappings = {
-                'rcs': 'siren',
-                'siege': 'adresse',
-                'representant': 'representant_nom',
-            }
-            
-            # Appliquer les mappings
-            for old_field, new_field in field_mappings.items():
-                if old_field in normalized and not normalized.get(new_field):
-                    normalized[new_field] = normalized[old_field]
-                    
-            # Assurer que l'adresse complète est extraite des composants si nécessaire
-            if 'adresse' in normalized and 'code_postal' in normalized and 'ville' in normalized:
-                address_parts = []
-                if normalized.get('adresse'):
-                    address_parts.append(normalized['adresse'])
-                
-                city_part = ''
-                if normalized.get('code_postal'):
-                    city_part += normalized['code_postal'] 
-                if normalized.get('ville'):
-                    if city_part:
-                        city_part += ' '
-                    city_part += normalized['ville']
-                
-                if city_part:
-                    address_parts.append(city_part)
-                
-                if address_parts:
-                    normalized['adresse_complete'] = ', '.join(address_parts)
-            
-            return normalized
-        
-        # 1. Vérifier si entreprise_info est fourni et l'utiliser
-        if contract_data.get('entreprise_info'):
-            print(f"save_contract: Utilisation de entreprise_info comme cessionnaire_info")
-            contract_data['cessionnaire_info'] = normalize_data(contract_data.get('entreprise_info', {}))
-        else:
-            # 2. Sinon, chercher dans le profil utilisateur
-            USER_PROFILE_FILE_WITH_ID = os.path.join(USER_PROFILES_DIR, f'user_profile_{user_id}.json')
-            if os.path.exists(USER_PROFILE_FILE_WITH_ID):
-                with open(USER_PROFILE_FILE_WITH_ID, 'r') as f:
-                    user_profile = json.load(f)
-                
-                if user_profile.get('selected_entity_type') == 'physical_person' and user_profile['physical_person']['is_configured']:
-                    print(f"save_contract: Utilisation du profil physical_person comme cessionnaire_info")
-                    contract_data['cessionnaire_info'] = normalize_data(user_profile['physical_person'])
-                elif user_profile.get('selected_entity_type') == 'legal_entity' and user_profile['legal_entity']['is_configured']:
-                    print(f"save_contract: Utilisation du profil legal_entity comme cessionnaire_info")
-                    contract_data['cessionnaire_info'] = normalize_data(user_profile['legal_entity'])
-                else:
-                    # 3. Par défaut, utiliser les informations de Tellers
-                    print(f"save_contract: Utilisation des informations Tellers par défaut")
-                    contract_data['cessionnaire_info'] = TELLERS_INFO
+        cessionnaire_info, source = cessionnaire_resolver.resolve(contract_data, user_id, use_stored=False)
+        # Sans profil, le cessionnaire reste à déterminer lors de la génération du contrat
+        if source != 'default' or cessionnaire_resolver.get_profile(user_id) is not None:
+            print(f"save_contract: Cessionnaire résolu depuis: {source}")
+            contract_data['cessionnaire_info'] = cessionnaire_info
     
     # Générer un ID unique pour le contrat s'il n'existe pas
     contract_id = data.get('id')
@@ -429,13 +439,11 @@ def save_contract():
         'is_draft': is_draft,
         'from_step6': from_step6,
         'user_id': user_id,  # Ajouter l'ID utilisateur au contrat
-        'created_at': datetime.now().isoformat(),
-        'updated_at': datetime.now().isoformat()
+        'created_at': datetime.now().isoformat()
     }
     
-    # Sauvegarder le contrat
-    with open(os.path.join(CONTRACTS_DIR, f"{contract_id}.json"), 'w', encoding='utf-8') as f:
-        json.dump(contract, f, ensure_ascii=False, indent=2)
+    # Sauvegarder le contrat (updated_at est daté par le stockage, voir ContractStore.save)
+    contract_store.save(contract, touch=True)
     
     return jsonify({
         'id': contract_id,
@@ -445,7 +453,17 @@ def save_contract():
 @app.route('/api/contracts', methods=['GET'])
 def get_contracts():
     """
-    Endpoint pour récupérer tous les contrats d'un utilisateur
+    Endpoint pour récupérer les contrats d'un utilisateur.
+    
+    Paramètres optionnels:
+        - limit: nombre maximal de contrats renvoyés (pagination)
+        - cursor: curseur renvoyé par la page précédente (next_cursor)
+        - sort: champ de tri (created_at, updated_at ou title), created_at par défaut
+        - order: asc ou desc (par défaut)
+        - view: "summary" pour ne renvoyer qu'un résumé de chaque contrat (sans data, elements
+          ni comments); par défaut, les contrats complets sont renvoyés
+        - fields: liste de champs séparés par des virgules, ou "all" pour les contrats complets
+    Sans limit, tous les contrats sont renvoyés (next_cursor vaut alors null).
     """
     user_id = request.args.get('user_id')
     
@@ -453,52 +471,113 @@ def get_contracts():
         return jsonify({'error': 'User ID manquant'}), 400
     
     # Extraire l'ID de base (sans suffixe) pour la vérification de l'accès
-    base_user_id = user_id
-    if '_' in user_id and not user_id.startswith('anon_'):
-        # Formater: user_XYZ (2 premières parties de l'ID)
-        parts = user_id.split('_')
-        if len(parts) >= 2:
-            base_user_id = f"{parts[0]}_{parts[1]}"
+    base_user_id = get_base_user_id(user_id)
     
     print(f"DEBUG - get_contracts - ID utilisateur complet: {user_id}")
     print(f"DEBUG - get_contracts - ID utilisateur de base: {base_user_id}")
     
-    contracts = []
-    for filename in os.listdir(CONTRACTS_DIR):
-        if not filename.endswith('.json'):
-            continue
-        
-        contract_path = os.path.join(CONTRACTS_DIR, filename)
+    # Lire les paramètres de pagination, de tri et de projection
+    sort_by = request.args.get('sort', 'created_at')
+    order = request.args.get('order', 'desc').lower()
+    cursor = request.args.get('cursor') or None
+    fields_param = request.args.get('fields', '').strip()
+    view = request.args.get('view', 'full')
+    
+    if sort_by not in SORT_FIELDS:
+        return jsonify({'error': f"Tri non supporté: {sort_by}"}), 400
+    
+    if order not in ('asc', 'desc'):
+        return jsonify({'error': f"Ordre non supporté: {order}"}), 400
+    
+    if view not in ('full', 'summary'):
+        return jsonify({'error': f"Vue non supportée: {view}"}), 400
+    
+    limit = request.args.get('limit')
+    if limit is not None:
         try:
-            with open(contract_path, 'r', encoding='utf-8') as f:
-                contract = json.load(f)
-            
-            # Obtenir l'ID utilisateur du contrat
-            contract_user_id = contract.get('user_id', '')
-            
-            # Extraire l'ID de base du contrat si nécessaire
-            base_contract_user_id = contract_user_id
-            if '_' in contract_user_id and not contract_user_id.startswith('anon_'):
-                # Formater: user_XYZ (2 premières parties de l'ID)
-                parts = contract_user_id.split('_')
-                if len(parts) >= 2:
-                    base_contract_user_id = f"{parts[0]}_{parts[1]}"
-            
-            # Vérifier la correspondance des IDs avec plusieurs combinaisons pour compatibilité
-            if (user_id == contract_user_id or  # IDs complets identiques
-                base_user_id == base_contract_user_id or  # IDs de base identiques
-                user_id == base_contract_user_id or  # ID complet = ID de base du contrat
-                base_user_id == contract_user_id):  # ID de base = ID complet du contrat
-                contracts.append(contract)
-        except Exception as e:
-            print(f"Erreur lors de la lecture du contrat {filename}: {e}")
+            limit = int(limit)
+        except ValueError:
+            return jsonify({'error': 'Paramètre limit invalide'}), 400
+        if limit < 1 or limit > MAX_CONTRACTS_PAGE_SIZE:
+            return jsonify({'error': f"Le paramètre limit doit être compris entre 1 et {MAX_CONTRACTS_PAGE_SIZE}"}), 400
+    
+    # En mode résumé, les sous-documents lourds ne sont ni lus ni sérialisés
+    if fields_param == 'all':
+        fields = None
+        full = True
+    elif fields_param:
+        fields = [field.strip() for field in fields_param.split(',') if field.strip()]
+        full = any(field not in SUMMARY_FIELDS for field in fields)
+    else:
+        fields = None
+        full = (view == 'full')
+    
+    try:
+        contracts, next_cursor = contract_store.list_page(
+            user_id, sort_by=sort_by, descending=(order == 'desc'),
+            limit=limit, cursor=cursor, full=full
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if fields:
+        contracts = [project_contract(contract, fields) for contract in contracts]
     
     print(f"DEBUG - get_contracts - Trouvé {len(contracts)} contrats pour l'utilisateur {user_id}")
     
-    # Trier les contrats par date de création (du plus récent au plus ancien)
-    contracts.sort(key=lambda x: x.get('created_at', ''), reverse=True)
+    return jsonify({'contracts': contracts, 'next_cursor': next_cursor})
+
+@app.route('/api/contracts/changes', methods=['GET'])
+def get_contract_changes():
+    """
+    Endpoint de synchronisation du tableau de bord: renvoie les contrats créés ou modifiés
+    (résumés) et les contrats supprimés (deleted) depuis une synchronisation précédente.
+    
+    Paramètres:
+        user_id: ID de l'utilisateur
+        since: Curseur next_since de la synchronisation précédente; sans curseur, tous les contrats
+        limit: Nombre maximal de changements renvoyés (has_more indique s'il en reste)
+    
+    Si le curseur est plus ancien que la durée de conservation des suppressions, reset vaut true
+    et tous les contrats sont renvoyés: la liste du client doit alors être remplacée.
+    """
+    user_id = request.args.get('user_id')
+    if not user_id:
+        return jsonify({'error': 'User ID manquant'}), 400
+    
+    since = request.args.get('since') or None
+    limit = request.args.get('limit')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            return jsonify({'error': 'Paramètre limit invalide'}), 400
+        if limit < 1 or limit > MAX_CONTRACTS_PAGE_SIZE:
+            return jsonify({'error': f"Le paramètre limit doit être compris entre 1 et {MAX_CONTRACTS_PAGE_SIZE}"}), 400
+    
+    reset = False
+    if since:
+        try:
+            since_date, _ = decode_cursor(since)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        # Les suppressions plus anciennes ont pu être oubliées
+        horizon = (datetime.now() - timedelta(days=TOMBSTONE_RETENTION)).isoformat()
+        if TOMBSTONE_RETENTION and since_date and since_date < horizon:
+            since = None
+            reset = True
+    
+    contracts, deleted, next_since, has_more = contract_store.list_changes(user_id, cursor=since, limit=limit)
+    
+    print(f"DEBUG - get_contract_changes - {len(contracts)} contrats modifiés et {len(deleted)} supprimés pour l'utilisateur {user_id}")
     
-    return jsonify({'contracts': contracts})
+    return jsonify({
+        'contracts': contracts,
+        'deleted': [{'id': tombstone['id'], 'deleted_at': tombstone['deleted_at']} for tombstone in deleted],
+        'next_since': next_since,
+        'has_more': has_more,
+        'reset': reset
+    })
 
 @app.route('/api/contracts/<contract_id>', methods=['GET'])
 def get_contract(contract_id):
@@ -511,439 +590,317 @@ def get_contract(contract_id):
     if not user_id:
         return jsonify({'error': 'User ID manquant'}), 400
     
-    # Extraire l'ID de base (sans suffixe) pour la vérification de l'accès
-    base_user_id = user_id
-    if '_' in user_id and not user_id.startswith('anon_'):
-        # Formater: user_XYZ (2 premières parties de l'ID)
-        parts = user_id.split('_')
-        if len(parts) >= 2:
-            base_user_id = f"{parts[0]}_{parts[1]}"
-    
-    print(f"DEBUG - get_contract - ID utilisateur complet: {user_id}")
-    print(f"DEBUG - get_contract - ID utilisateur de base: {base_user_id}")
-    
-    contract_file = os.path.join(CONTRACTS_DIR, f"{contract_id}.json")
+    # Vérifier si le contrat appartient à l'utilisateur via l'index des propriétaires
+    contract_user_id = contract_store.get_owner(contract_id)
     
-    if not os.path.exists(contract_file):
+    if contract_user_id is None:
         return jsonify({'error': 'Contrat non trouvé'}), 404
     
-    with open(contract_file, 'r', encoding='utf-8') as f:
-        contract = json.load(f)
-    
-    # Vérifier si le contrat appartient à l'utilisateur 
-    contract_user_id = contract.get('user_id', '')
-    
-    # Extraire l'ID de base du contrat si nécessaire
-    base_contract_user_id = contract_user_id
-    if '_' in contract_user_id and not contract_user_id.startswith('anon_'):
-        # Formater: user_XYZ (2 premières parties de l'ID)
-        parts = contract_user_id.split('_')
-        if len(parts) >= 2:
-            base_contract_user_id = f"{parts[0]}_{parts[1]}"
-    
-    # Vérifier la correspondance des IDs (avec plusieurs vérifications pour compatibilité)
-    has_access = (
-        user_id == contract_user_id or  # IDs complets identiques
-        base_user_id == base_contract_user_id or  # IDs de base identiques
-        user_id == base_contract_user_id or  # ID complet = ID de base du contrat
-        base_user_id == contract_user_id)  # ID de base = ID complet du contrat
-    
-    print(f"DEBUG - get_contract - Vérification d'accès au contrat {contract_id}:")
-    print(f"  - ID utilisateur: {user_id} (base: {base_user_id})")
-    print(f"  - ID du contrat: {contract_user_id} (base: {base_contract_user_id})")
-    print(f"  - Accès autorisé: {has_access}")
-    
-    if not has_access:
+    if not has_contract_access('get_contract', contract_id, user_id, contract_user_id):
         return jsonify({'error': 'Accès non autorisé'}), 403
     
-    return jsonify({'contract': contract})
+    contract = contract_store.get(contract_id)
+    
+    # ETag: version du contrat, à renvoyer dans If-Match lors de la modification
+    response = jsonify({'contract': contract})
+    response.set_etag(str(contract.get('version', 0)))
+    return response.make_conditional(request)
 
 @app.route('/api/contracts/<contract_id>', methods=['PUT'])
 def update_contract(contract_id):
     """
     Endpoint pour mettre à jour un contrat.
+    Avec un en-tête If-Match (ETag renvoyé par GET /api/contracts/<id>), la mise à jour est
+    refusée (409) si le contrat a été modifié depuis sa lecture.
     """
-    file_path = os.path.join(CONTRACTS_DIR, f"{contract_id}.json")
+    # Vérifier l'accès via l'index des propriétaires avant de charger le contrat
+    contract_user_id = contract_store.get_owner(contract_id)
     
-    if not os.path.exists(file_path):
+    if contract_user_id is None:
         return jsonify({'error': 'Contract not found'}), 404
     
-    # Charger le contrat existant
-    with open(file_path, 'r', encoding='utf-8') as f:
-        contract = json.load(f)
-    
     # Récupérer l'ID utilisateur de la requête
     user_id = request.json.get('user_id', 'anonymous')
     
-    # Extraire l'ID de base (sans suffixe) pour la vérification de l'accès
-    base_user_id = user_id
-    if '_' in user_id and not user_id.startswith('anon_'):
-        # Formater: user_XYZ (2 premières parties de l'ID)
-        parts = user_id.split('_')
-        if len(parts) >= 2:
-            base_user_id = f"{parts[0]}_{parts[1]}"
-    
-    # Obtenir l'ID utilisateur du contrat
-    contract_user_id = contract.get('user_id', '')
-    
-    # Extraire l'ID de base du contrat si nécessaire
-    base_contract_user_id = contract_user_id
-    if '_' in contract_user_id and not contract_user_id.startswith('anon_'):
-        # Formater: user_XYZ (2 premières parties de l'ID)
-        parts = contract_user_id.split('_')
-        if len(parts) >= 2:
-            base_contract_user_id = f"{parts[0]}_{parts[1]}"
-    
-    # Vérifier la correspondance des IDs (avec plusieurs vérifications pour compatibilité)
-    has_access = (
-        user_id == contract_user_id or  # IDs complets identiques
-        base_user_id == base_contract_user_id or  # IDs de base identiques
-        user_id == base_contract_user_id or  # ID complet = ID de base du contrat
-        base_user_id == contract_user_id  # ID de base = ID complet du contrat
-    )
-    
-    print(f"DEBUG - update_contract - Vérification d'accès au contrat {contract_id}:")
-    print(f"  - ID utilisateur: {user_id} (base: {base_user_id})")
-    print(f"  - ID du contrat: {contract_user_id} (base: {base_contract_user_id})")
-    print(f"  - Accès autorisé: {has_access}")
-    
-    if not has_access:
+    if not has_contract_access('update_contract', contract_id, user_id, contract_user_id):
         return jsonify({'error': 'Accès non autorisé'}), 403
     
-    data = request.json
-    
-    # Vérifier si le client a demandé de préserver les données (cas des contrats importés/migrés)
-    preserve_data = data.get('preserve_data', False)
-    print(f"DEBUG - update_contract - Préservation des données demandée: {preserve_data}")
-    
-    # ⚠️ Mode de préservation des données (pour les contrats migrés/importés)
-    # Si ce mode est activé, on ne modifie que le titre et le statut is_draft
-    if preserve_data:
-        print(f"DEBUG - update_contract - Mode préservation activé: seuls le titre et is_draft seront modifiés")
-        
-        # Récupérer uniquement le titre et le statut is_draft
-        title = data.get('title')
-        is_draft = data.get('is_draft')
-        
-        # Mettre à jour le titre si fourni
-        if title:
-            contract['title'] = title
-            print(f"DEBUG - update_contract - Titre mis à jour: {title}")
-        
-        # Mettre à jour le statut de brouillon si fourni
-        if is_draft is not None:
-            contract['is_draft'] = is_draft
-            print(f"DEBUG - update_contract - Statut de brouillon mis à jour: {is_draft}")
+    # Lecture, modification et écriture sans écriture concurrente du même contrat
+    with contract_store.lock(contract_id):
+        # Charger le contrat existant
+        contract = contract_store.get(contract_id)
+        if contract is None:
+            return jsonify({'error': 'Contract not found'}), 404
         
-        # Ajouter un marqueur indiquant que ce contrat est préservé
-        if contract.get('original_user_id') and not contract.get('preserved_import'):
-            contract['preserved_import'] = True
-            print(f"DEBUG - update_contract - Marqueur de préservation ajouté")
+        # Contrat modifié depuis sa lecture par le client (If-Match)
+        if if_match_failed(contract):
+            return version_conflict(contract.get('version', 0))
         
-        # Mettre à jour la date de mise à jour
-        contract['updated_at'] = datetime.now().isoformat()
+        data = request.json
         
-    # Mode normal - mise à jour complète
-    else:
-        title = data.get('title')
-        is_draft = data.get('is_draft')
-        updated_elements = data.get('updatedElements', {})
-        comments = data.get('comments', [])
-        updated_data = data.get('data')  # Nouvelles données du contrat
+        # Vérifier si le client a demandé de préserver les données (cas des contrats importés/migrés)
+        preserve_data = data.get('preserve_data', False)
+        print(f"DEBUG - update_contract - Préservation des données demandée: {preserve_data}")
         
-        # Mettre à jour le titre si fourni
-        if title:
-            contract['title'] = title
+        # ⚠️ Mode de préservation des données (pour les contrats migrés/importés)
+        # Si ce mode est activé, on ne modifie que le titre et le statut is_draft
+        if preserve_data:
+            print(f"DEBUG - update_contract - Mode préservation activé: seuls le titre et is_draft seront modifiés")
+            
+            # Récupérer uniquement le titre et le statut is_draft
+            title = data.get('title')
+            is_draft = data.get('is_draft')
+            
+            # Mettre à jour le titre si fourni
+            if title:
+                contract['title'] = title
+                print(f"DEBUG - update_contract - Titre mis à jour: {title}")
+            
+            # Mettre à jour le statut de brouillon si fourni
+            if is_draft is not None:
+                contract['is_draft'] = is_draft
+                print(f"DEBUG - update_contract - Statut de brouillon mis à jour: {is_draft}")
+            
+            # Ajouter un marqueur indiquant que ce contrat est préservé
+            if contract.get('original_user_id') and not contract.get('preserved_import'):
+                contract['preserved_import'] = True
+                print(f"DEBUG - update_contract - Marqueur de préservation ajouté")
+            
+        # Mode normal - mise à jour complète
+        else:
+            title = data.get('title')
+            is_draft = data.get('is_draft')
+            updated_elements = data.get('updatedElements', {})
+            comments = data.get('comments', [])
+            updated_data = data.get('data')  # Nouvelles données du contrat
+            
+            # Mettre à jour le titre si fourni
+            if title:
+                contract['title'] = title
+            
+            # Mettre à jour le statut de brouillon si fourni
+            if is_draft is not None:
+                contract['is_draft'] = is_draft
+                print(f"DEBUG - update_contract - Statut de brouillon mis à jour: {is_draft}")
+            
+            # Mettre à jour les données du contrat si fournies
+            if updated_data:
+                contract['data'] = normalize_contract_data(updated_data)
+                print(f"DEBUG - update_contract - Données du contrat mises à jour")
+            
+            # Mettre à jour les éléments modifiés si fournis (chargés uniquement dans ce cas)
+            if updated_elements:
+                elements = contract_store.get_subdocument(contract_id, 'elements')
+                if elements is None:
+                    # Les éléments générés ne sont enregistrés qu'à la première modification
+                    elements = generate_contract_elements(contract)
+                for index, content in updated_elements.items():
+                    index = int(index)
+                    if index < len(elements):
+                        if 'text' in elements[index]:
+                            elements[index]['text'] = content
+                contract['elements'] = elements
+            
+            # Mettre à jour ou ajouter les commentaires si fournis
+            if comments is not None:
+                contract['comments'] = comments
         
-        # Mettre à jour le statut de brouillon si fourni
-        if is_draft is not None:
-            contract['is_draft'] = is_draft
-            print(f"DEBUG - update_contract - Statut de brouillon mis à jour: {is_draft}")
+        # Sauvegarder le contrat mis à jour (la date de mise à jour est attribuée par le stockage)
+        version = contract_store.save(contract, expected_version=contract.get('version', 0), touch=True)
+    
+    response = jsonify({'id': contract_id, 'title': contract['title'], 'version': version})
+    response.set_etag(str(version))
+    return response
+
+@app.route('/api/contracts/<contract_id>', methods=['PATCH'])
+def patch_contract(contract_id):
+    """
+    Endpoint pour modifier une partie d'un contrat (ex: un paragraphe dans l'éditeur), sans
+    renvoyer le contrat entier.
+    
+    Corps de la requête, selon le Content-Type:
+        - application/json-patch+json: opérations JSON Patch (RFC 6902), ex:
+          [{"op": "replace", "path": "/elements/12/text", "value": "..."}]
+        - application/merge-patch+json ou application/json: JSON Merge Patch (RFC 7386), ex:
+          {"title": "Nouveau titre", "is_draft": false}
+    Les chemins portent sur le contrat complet (champs, data, elements, comments); seuls les
+    éléments et commentaires visés par la modification sont chargés et réécrits.
+    
+    Paramètres:
+        user_id: ID de l'utilisateur
+    """
+    # Vérifier l'accès via l'index des propriétaires avant de charger le contrat
+    contract_user_id = contract_store.get_owner(contract_id)
+    
+    if contract_user_id is None:
+        return jsonify({'error': 'Contract not found'}), 404
+    
+    user_id = request.args.get('user_id', 'anonymous')
+    
+    if not has_contract_access('patch_contract', contract_id, user_id, contract_user_id):
+        return jsonify({'error': 'Accès non autorisé'}), 403
+    
+    patch = request.get_json(force=True, silent=True)
+    if patch is None:
+        return jsonify({'error': 'Corps de requête JSON invalide'}), 400
+    
+    merge = request.mimetype != JSON_PATCH_MEDIA_TYPE
+    try:
+        roots = patch_roots(patch, merge=merge)
+    except JsonPatchError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Lecture, modification et écriture sans écriture concurrente du même contrat
+    with contract_store.lock(contract_id):
+        contract = contract_store.get(contract_id)
+        if contract is None:
+            return jsonify({'error': 'Contract not found'}), 404
         
-        # Mettre à jour les données du contrat si fournies
-        if updated_data:
-            contract['data'] = updated_data
-            print(f"DEBUG - update_contract - Données du contrat mises à jour")
+        # Charger uniquement les sous-documents visés
+        for name in SUBDOCUMENT_FIELDS:
+            if name not in roots:
+                continue
+            value = contract_store.get_subdocument(contract_id, name)
+            if value is None:
+                # Les éléments générés ne sont enregistrés qu'à la première modification
+                value = generate_contract_elements(contract) if name == 'elements' else []
+            contract[name] = value
         
-        # Mettre à jour les éléments modifiés si fournis
-        if updated_elements and 'elements' in contract:
-            for index, content in updated_elements.items():
-                index = int(index)
-                if index < len(contract['elements']):
-                    if 'text' in contract['elements'][index]:
-                        contract['elements'][index]['text'] = content
+        # Contrat modifié depuis sa lecture par le client (If-Match)
+        if if_match_failed(contract):
+            return version_conflict(contract.get('version', 0))
         
-        # Mettre à jour ou ajouter les commentaires si fournis
-        if comments is not None:
-            contract['comments'] = comments
+        protected = {field: contract[field] for field in PATCH_PROTECTED_FIELDS if field in contract}
         
-        # Mettre à jour la date de mise à jour
-        contract['updated_at'] = datetime.now().isoformat()
-    
-    # Sauvegarder le contrat mis à jour
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(contract, f, ensure_ascii=False, indent=2)
-    
-    return jsonify({'id': contract_id, 'title': contract['title']})
+        try:
+            if merge:
+                apply_merge_patch(contract, patch)
+            else:
+                apply_json_patch(contract, patch)
+        except JsonPatchTestFailed as e:
+            return jsonify({'error': str(e)}), 409
+        except JsonPatchError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if {field: contract[field] for field in PATCH_PROTECTED_FIELDS if field in contract} != protected:
+            return jsonify({'error': f"Champs non modifiables: {', '.join(PATCH_PROTECTED_FIELDS)}"}), 400
+        if 'data' in roots and not isinstance(contract.get('data'), dict):
+            return jsonify({'error': 'data doit être un objet'}), 400
+        if any(name in roots and not isinstance(contract.get(name), list) for name in SUBDOCUMENT_FIELDS):
+            return jsonify({'error': 'elements et comments doivent être des listes'}), 400
+        
+        # Les sous-documents non chargés ne sont pas réécrits (voir ContractStore.save)
+        version = contract_store.save(contract, expected_version=contract.get('version', 0), touch=True)
+    
+    print(f"DEBUG - patch_contract - Contrat {contract_id} modifié ({', '.join(sorted(roots))})")
+    
+    response = jsonify({'id': contract_id, 'title': contract.get('title'), 'updated_at': contract['updated_at'],
+                        'version': version})
+    response.set_etag(str(version))
+    return response
 
 @app.route('/api/contracts/<contract_id>', methods=['DELETE'])
 def delete_contract(contract_id):
     """
     Endpoint pour supprimer un contrat.
     """
-    file_path = os.path.join(CONTRACTS_DIR, f"{contract_id}.json")
+    # Vérifier l'accès via l'index des propriétaires
+    contract_user_id = contract_store.get_owner(contract_id)
     
-    if not os.path.exists(file_path):
+    if contract_user_id is None:
         return jsonify({'error': 'Contract not found'}), 404
     
-    # Charger le contrat pour vérifier l'accès
-    with open(file_path, 'r', encoding='utf-8') as f:
-        contract = json.load(f)
-    
     # Récupérer l'ID utilisateur de la requête
     user_id = request.args.get('user_id', 'anonymous')
     
-    # Extraire l'ID de base (sans suffixe) pour la vérification de l'accès
-    base_user_id = user_id
-    if '_' in user_id and not user_id.startswith('anon_'):
-        parts = user_id.split('_')
-        if len(parts) >= 2:
-            base_user_id = f"{parts[0]}_{parts[1]}"
-    
-    # Obtenir l'ID utilisateur du contrat
-    contract_user_id = contract.get('user_id', '')
-    
-    # Extraire l'ID de base du contrat si nécessaire
-    base_contract_user_id = contract_user_id
-    if '_' in contract_user_id and not contract_user_id.startswith('anon_'):
-        parts = contract_user_id.split('_')
-        if len(parts) >= 2:
-            base_contract_user_id = f"{parts[0]}_{parts[1]}"
-    
-    # Vérifier la correspondance des IDs
-    has_access = (
-        user_id == contract_user_id or  # IDs complets identiques
-        base_user_id == base_contract_user_id or  # IDs de base identiques
-        user_id == base_contract_user_id or  # ID complet = ID de base du contrat
-        base_user_id == contract_user_id  # ID de base = ID complet du contrat
-    )
-    
-    print(f"DEBUG - delete_contract - Vérification d'accès au contrat {contract_id}:")
-    print(f"  - ID utilisateur: {user_id} (base: {base_user_id})")
-    print(f"  - ID du contrat: {contract_user_id} (base: {base_contract_user_id})")
-    print(f"  - Accès autorisé: {has_access}")
-    
-    if not has_access:
+    if not has_contract_access('delete_contract', contract_id, user_id, contract_user_id):
         return jsonify({'error': 'Accès non autorisé'}), 403
     
-    # Supprimer le fichier
-    os.remove(file_path)
+    # Supprimer le contrat
+    contract_store.delete(contract_id)
     
     return jsonify({'success': True})
 
+def generate_contract_elements(contract):
+    """
+    Génère les éléments de l'éditeur à partir des données d'un contrat.
+    Le cessionnaire est résolu depuis le contrat, puis depuis le profil original ou actuel.
+    
+    Args:
+        contract (dict): Contrat, données normalisées (voir data_schema.py)
+        
+    Returns:
+        list: Éléments au format de l'éditeur
+    """
+    # Récupérer les données du contrat
+    contract_data = contract['data']
+    
+    # Extraire les paramètres pour le ContractBuilder
+    contract_type = contract_data.get('type_contrat', [])
+    is_free = contract_data.get('type_cession', 'Gratuite') == 'Gratuite'
+    author_type = contract_data.get('auteur_type', 'Personne physique')
+    author_info = contract_data.get('auteur_info', {})
+    work_description = contract_data.get('description_oeuvre', '')
+    image_description = contract_data.get('description_image', '')
+    supports = contract_data.get('supports', [])
+    additional_rights = contract_data.get('droits_cedes', [])
+    remuneration = contract_data.get('remuneration', '')
+    is_exclusive = contract_data.get('exclusivite', False)
+    
+    # ⚠️ IMPORTANT: Utiliser en priorité les informations de cessionnaire stockées dans le contrat 
+    # au lieu de celles du profil utilisateur actuel
+    cessionnaire_info, source = cessionnaire_resolver.resolve(
+        contract_data, contract.get('user_id', 'anonymous'), contract.get('original_user_id')
+    )
+    print(f"DEBUG - get_contract_elements - Cessionnaire résolu depuis: {source}")
+    
+    print(f"DEBUG - get_contract_elements - Infos cessionnaire finales: {cessionnaire_info}")
+    
+    # Générer les éléments du contrat avec le ContractBuilder, sauf s'ils sont déjà en cache
+    builder_args = {
+        'contract_type': contract_type, 'is_free': is_free, 'author_type': author_type,
+        'author_info': author_info, 'work_description': work_description,
+        'image_description': image_description, 'supports': supports,
+        'additional_rights': additional_rights, 'remuneration': remuneration,
+        'is_exclusive': is_exclusive,
+        'cessionnaire_info': cessionnaire_info  # Ajouter les informations du cessionnaire
+    }
+    
+    return elements_cache.get_or_build(
+        elements_cache_key(builder_args),
+        lambda: to_editor_elements(ContractBuilder.build_contract_elements(**builder_args))
+    )
+
 @app.route('/api/contracts/<contract_id>/elements', methods=['GET'])
 def get_contract_elements(contract_id):
     """
     Endpoint pour récupérer les éléments d'un contrat.
+    Les éléments enregistrés depuis l'éditeur sont renvoyés tels quels; sinon ils sont générés
+    (ou lus dans le cache des éléments) sans modifier le contrat.
     """
     try:
-        # Vérifier si le contrat existe
-        file_path = os.path.join(CONTRACTS_DIR, f"{contract_id}.json")
-        if not os.path.exists(file_path):
+        # Vérifier l'accès via l'index des propriétaires
+        contract_user_id = contract_store.get_owner(contract_id)
+        if contract_user_id is None:
             return jsonify({'error': 'Contract not found'}), 404
         
-        # Récupérer les données du contrat
-        with open(file_path, 'r', encoding='utf-8') as f:
-            contract = json.load(f)
-        
         # Récupérer l'ID utilisateur de la requête pour vérifier l'accès
         user_id = request.args.get('user_id', 'anonymous')
         
-        # Extraire l'ID de base (sans suffixe) pour la vérification de l'accès
-        base_user_id = user_id
-        if '_' in user_id and not user_id.startswith('anon_'):
-            parts = user_id.split('_')
-            if len(parts) >= 2:
-                base_user_id = f"{parts[0]}_{parts[1]}"
-        
-        # Obtenir l'ID utilisateur du contrat
-        contract_user_id = contract.get('user_id', '')
-        
-        # Extraire l'ID de base du contrat si nécessaire
-        base_contract_user_id = contract_user_id
-        if '_' in contract_user_id and not contract_user_id.startswith('anon_'):
-            parts = contract_user_id.split('_')
-            if len(parts) >= 2:
-                base_contract_user_id = f"{parts[0]}_{parts[1]}"
-        
-        # Vérifier la correspondance des IDs
-        has_access = (
-            user_id == contract_user_id or  # IDs complets identiques
-            base_user_id == base_contract_user_id or  # IDs de base identiques
-            user_id == base_contract_user_id or  # ID complet = ID de base du contrat
-            base_user_id == contract_user_id  # ID de base = ID complet du contrat
-        )
-        
-        print(f"DEBUG - get_contract_elements - Vérification d'accès au contrat {contract_id}:")
-        print(f"  - ID utilisateur: {user_id} (base: {base_user_id})")
-        print(f"  - ID du contrat: {contract_user_id} (base: {base_contract_user_id})")
-        print(f"  - Accès autorisé: {has_access}")
-        
-        if not has_access:
+        if not has_contract_access('get_contract_elements', contract_id, user_id, contract_user_id):
             return jsonify({'error': 'Accès non autorisé'}), 403
         
-        # Fonction pour normaliser les données entre l'étape 3 et le dashboard
-        def normalize_data(data):
-            normalized = data.copy() if data else {}
-            
-            # Mapping entre les noms de champs potentiellement différents
-            field_mappings = {
-                'rcs': 'siren',
-                'siege': 'adresse',
-                'representant': 'representant_nom',
-            }
-            
-            # Appliquer les mappings
-            for old_field, new_field in field_mappings.items():
-                if old_field in normalized and not normalized.get(new_field):
-                    normalized[new_field] = normalized[old_field]
-                    
-            # Assurer que l'adresse complète est extraite des composants si nécessaire
-            if 'adresse' in normalized and 'code_postal' in normalized and 'ville' in normalized:
-                address_parts = []
-                if normalized.get('adresse'):
-                    address_parts.append(normalized['adresse'])
-                
-                city_part = ''
-                if normalized.get('code_postal'):
-                    city_part += normalized['code_postal'] 
-                if normalized.get('ville'):
-                    if city_part:
-                        city_part += ' '
-                    city_part += normalized['ville']
-                
-                if city_part:
-                    address_parts.append(city_part)
-                
-                if address_parts:
-                    normalized['adresse_complete'] = ', '.join(address_parts)
-            
-            return normalized
+        # Les éléments et commentaires sont stockés à part du contrat
+        comments = contract_store.get_subdocument(contract_id, 'comments') or []
         
         # Vérifier si le contrat a déjà des éléments stockés
-        if 'elements' in contract:
-            return jsonify({'elements': contract['elements'], 'comments': contract.get('comments', [])})
-        
-        # Si non, générer les éléments à partir des données du contrat
-        # Récupérer les données du contrat
-        contract_data = contract['data']
-        
-        # Extraire les paramètres pour le ContractBuilder
-        contract_type = contract_data.get('type_contrat', [])
-        is_free = contract_data.get('type_cession', 'Gratuite') == 'Gratuite'
-        author_type = contract_data.get('auteur_type', 'Personne physique')
-        author_info = contract_data.get('auteur_info', {})
-        work_description = contract_data.get('description_oeuvre', '')
-        image_description = contract_data.get('description_image', '')
-        supports = contract_data.get('supports', [])
-        additional_rights = contract_data.get('droits_cedes', [])
-        remuneration = contract_data.get('remuneration', '')
-        is_exclusive = contract_data.get('exclusivite', False)
-        
-        # ⚠️ IMPORTANT: Utiliser en priorité les informations de cessionnaire stockées dans le contrat 
-        # au lieu de celles du profil utilisateur actuel
-        cessionnaire_info = None
-        
-        # 1. Vérifier d'abord si le contrat contient déjà des infos de cessionnaire
-        if 'cessionnaire_info' in contract_data:
-            print(f"DEBUG - get_contract_elements - Utilisation des infos de cessionnaire stockées dans le contrat")
-            cessionnaire_info = contract_data['cessionnaire_info']
-            cessionnaire_info = normalize_data(cessionnaire_info)
-        # 2. Ensuite, vérifier si entreprise_info est disponible
-        elif 'entreprise_info' in contract_data and contract_data['entreprise_info']:
-            print(f"DEBUG - get_contract_elements - Utilisation de entreprise_info du contrat")
-            cessionnaire_info = normalize_data(contract_data['entreprise_info'])
-        # 3. Si le contrat a été importé/migré, essayer de récupérer le profil original
-        elif contract.get('original_user_id'):
-            original_user_id = contract.get('original_user_id')
-            original_profile_path = os.path.join(USER_PROFILES_DIR, f'user_profile_{original_user_id}.json')
-            
-            if os.path.exists(original_profile_path):
-                print(f"DEBUG - get_contract_elements - Utilisation du profil original: {original_user_id}")
-                try:
-                    with open(original_profile_path, 'r') as f:
-                        original_profile = json.load(f)
-                    
-                    if original_profile.get('selected_entity_type') == 'physical_person' and original_profile['physical_person']['is_configured']:
-                        cessionnaire_info = normalize_data(original_profile['physical_person'])
-                    elif original_profile.get('selected_entity_type') == 'legal_entity' and original_profile['legal_entity']['is_configured']:
-                        cessionnaire_info = normalize_data(original_profile['legal_entity'])
-                except Exception as e:
-                    print(f"DEBUG - get_contract_elements - Erreur lors de la lecture du profil original: {e}")
-        
-        # 4. Si aucune des options ci-dessus n'a fonctionné, utiliser le profil utilisateur actuel
-        if not cessionnaire_info:
-            USER_PROFILE_FILE_WITH_ID = os.path.join(USER_PROFILES_DIR, f'user_profile_{contract.get("user_id", "anonymous")}.json')
-            if os.path.exists(USER_PROFILE_FILE_WITH_ID):
-                print(f"DEBUG - get_contract_elements - Utilisation du profil utilisateur actuel en dernier recours")
-                with open(USER_PROFILE_FILE_WITH_ID, 'r') as f:
-                    user_profile = json.load(f)
-                
-                # Si un type d'entité est sélectionné, utiliser ses informations comme cessionnaire
-                if user_profile.get('selected_entity_type') == 'physical_person' and user_profile['physical_person']['is_configured']:
-                    cessionnaire_info = user_profile['physical_person']
-                    cessionnaire_info = normalize_data(cessionnaire_info)
-                elif user_profile.get('selected_entity_type') == 'legal_entity' and user_profile['legal_entity']['is_configured']:
-                    cessionnaire_info = user_profile['legal_entity']
-                    cessionnaire_info = normalize_data(cessionnaire_info)
-                else:
-                    # Utiliser les informations par défaut de Tellers
-                    cessionnaire_info = TELLERS_INFO
-            else:
-                cessionnaire_info = TELLERS_INFO
-        
-        # Normaliser également les informations sur l'auteur si présentes
-        if author_info:
-            author_info = normalize_data(author_info)
+        elements = contract_store.get_subdocument(contract_id, 'elements')
+        if elements is not None:
+            return jsonify({'elements': elements, 'comments': comments})
         
-        print(f"DEBUG - get_contract_elements - Infos cessionnaire finales: {cessionnaire_info}")
-        
-        # Générer les éléments du contrat avec le ContractBuilder
-        elements = ContractBuilder.build_contract_elements(
-            contract_type, is_free, author_type, author_info,
-            work_description, image_description, supports,
-            additional_rights, remuneration, is_exclusive,
-            cessionnaire_info=cessionnaire_info  # Ajouter les informations du cessionnaire
-        )
-        
-        # Convertir les éléments en format pour l'éditeur
-        editor_elements = []
-        
-        for element in elements:
-            if hasattr(element, 'text'):
-                # Si c'est un élément Paragraph
-                style_name = str(element.style.name) if hasattr(element, 'style') and hasattr(element.style, 'name') else 'ContractText'
-                editor_elements.append({
-                    'type': 'paragraph',
-                    'style': style_name,
-                    'text': element.text
-                })
-            elif hasattr(element, 'height'):
-                # Si c'est un élément Spacer
-                editor_elements.append({
-                    'type': 'spacer',
-                    'height': element.height
-                })
-        
-        # Stocker les éléments générés dans le contrat pour référence future
-        contract['elements'] = editor_elements
-        contract['comments'] = []
-        
-        # Sauvegarder le contrat avec les éléments
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(contract, f, ensure_ascii=False, indent=2)
-        
-        return jsonify({'elements': editor_elements, 'comments': []})
+        # Sinon, les générer à partir des données du contrat
+        contract = contract_store.get(contract_id)
+        return jsonify({'elements': generate_contract_elements(contract), 'comments': comments})
     except Exception as e:
         print(f"Error accessing contract elements: {e}")
         return jsonify({'error': str(e)}), 500
@@ -954,34 +911,74 @@ def export_contract(contract_id):
     Endpoint pour exporter un contrat au format JSON.
     Retourne le contrat complet dans un format qui préserve toutes les données et le formatage.
     """
-    file_path = os.path.join(CONTRACTS_DIR, f"{contract_id}.json")
+    contract_user_id = contract_store.get_owner(contract_id)
     
-    if not os.path.exists(file_path):
+    if contract_user_id is None:
         return jsonify({'error': 'Contract not found'}), 404
     
-    # Lire le contrat complet depuis le fichier
-    with open(file_path, 'r', encoding='utf-8') as f:
-        contract = json.load(f)
-    
     # Récupérer l'ID utilisateur de la requête
     user_id = request.args.get('user_id', 'anonymous')
     
     # Vérifier que l'utilisateur a accès à ce contrat
-    if contract.get('user_id', 'anonymous') != user_id and user_id != 'anonymous':
+    if (contract_user_id or 'anonymous') != user_id and user_id != 'anonymous':
         return jsonify({'error': 'Unauthorized access to contract'}), 403
     
-    # Ajouter des métadonnées d'exportation
-    contract['export_info'] = {
-        'exported_at': datetime.now().isoformat(),
-        'version': '1.0',
-        'application': 'LexForge'
-    }
+    # Contrat à jour stocké en JSON: fichiers envoyés tels quels, sans décodage ni réencodage
+    files = contract_store.open_raw(contract_id)
+    passthrough = passthrough_export(files) if files is not None else None
+    if passthrough is not None:
+        body, content_length = passthrough
+        response = Response(body, mimetype='application/json')
+        response.headers.set('Content-Length', str(content_length))
+    else:
+        # Lire le contrat complet (avec éléments et commentaires) depuis le stockage
+        contract = contract_store.get_full(contract_id)
+        if contract is None:
+            return jsonify({'error': 'Contract not found'}), 404
+        
+        # Ajouter des métadonnées d'exportation
+        contract['export_info'] = export_info()
+        response = jsonify(contract)
     
     # Définir les en-têtes pour le téléchargement du fichier
-    response = jsonify(contract)
     response.headers.set('Content-Disposition', f'attachment; filename=lexforge_contract_{contract_id}.json')
     return response
 
+@app.route('/api/contracts/export', methods=['GET'])
+def export_contracts():
+    """
+    Endpoint pour exporter tous les contrats d'un utilisateur, en flux.
+    
+    Paramètres:
+        user_id: ID de l'utilisateur
+        format: "ndjson" (par défaut, un contrat par ligne) ou "zip"
+        since: Curseur next_since d'un export précédent, pour n'exporter que les contrats modifiés depuis
+    """
+    user_id = request.args.get('user_id')
+    if not user_id:
+        return jsonify({'error': 'User ID manquant'}), 400
+    
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'zip'):
+        return jsonify({'error': f"Format d'export non supporté: {export_format}"}), 400
+    
+    since = request.args.get('since')
+    try:
+        check_since(since)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Le contenu est produit au fil de l'eau: aucun contrat n'est chargé avant l'envoi
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    if export_format == 'zip':
+        response = Response(zip_export(contract_store, user_id, since), mimetype='application/zip')
+        filename = f'lexforge_contracts_{timestamp}.zip'
+    else:
+        response = Response(ndjson_export(contract_store, user_id, since), mimetype='application/x-ndjson')
+        filename = f'lexforge_contracts_{timestamp}.ndjson'
+    response.headers.set('Content-Disposition', f'attachment; filename={filename}')
+    return response
+
 @app.route('/api/contracts/import', methods=['POST'])
 def import_contract():
     """
@@ -1008,21 +1005,12 @@ def import_contract():
         if 'id' not in contract_data or 'data' not in contract_data or 'title' not in contract_data:
             return jsonify({'error': 'Invalid contract format'}), 400
         
-        # Générer un nouvel ID pour éviter les doublons
-        new_id = str(uuid.uuid4())
-        contract_data['id'] = new_id
-        
-        # Mettre à jour les dates de création et de modification
-        contract_data['created_at'] = datetime.now().isoformat()
-        contract_data['updated_at'] = datetime.now().isoformat()
-        
-        # Associer le contrat à l'utilisateur actuel
-        contract_data['user_id'] = user_id
+        # Nouvel ID (pour éviter les doublons), nouvelles dates et rattachement à l'utilisateur actuel
+        prepare_imported_contract(contract_data, user_id)
+        new_id = contract_data['id']
         
         # Sauvegarder le contrat
-        file_path = os.path.join(CONTRACTS_DIR, f"{new_id}.json")
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(contract_data, f, ensure_ascii=False, indent=2)
+        contract_store.save(contract_data, touch=True)
         
         return jsonify({
             'success': True,
@@ -1035,6 +1023,40 @@ def import_contract():
     except Exception as e:
         return jsonify({'error': f'Error importing contract: {str(e)}'}), 500
 
+@app.route('/api/contracts/import/bulk', methods=['POST'])
+def import_contracts_bulk():
+    """
+    Endpoint pour importer plusieurs contrats exportés par LexForge.
+    Accepte un fichier (champ "file": .ndjson, .zip ou .json) avec user_id dans le formulaire,
+    ou un corps NDJSON (Content-Type application/x-ndjson) avec user_id dans l'URL.
+    Le fichier est lu enregistrement par enregistrement et les contrats sont écrits par lots.
+    """
+    user_id = request.form.get('user_id') or request.args.get('user_id')
+    if not user_id:
+        return jsonify({'error': 'User ID manquant'}), 400
+    
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        # Corps lu en flux, sans passer par un fichier temporaire
+        records = iter_ndjson_records(request.stream, IMPORT_MAX_RECORD_BYTES)
+    else:
+        file = request.files.get('file')
+        if file is None or file.filename == '':
+            return jsonify({'error': 'No file provided'}), 400
+        
+        import_format = detect_import_format(file.filename)
+        if import_format is None:
+            return jsonify({'error': 'File must be a NDJSON, ZIP or JSON file'}), 400
+        
+        # Werkzeug stocke les fichiers volumineux sur disque: file.stream n'est pas chargé en mémoire
+        records = iter_records(file.stream, import_format, IMPORT_MAX_RECORD_BYTES)
+    
+    try:
+        report = import_records(contract_store, records, user_id)
+    except zipfile.BadZipFile:
+        return jsonify({'error': 'Invalid ZIP archive'}), 400
+    
+    return jsonify(dict(report, success=report['errors'] == 0))
+
 @app.route('/api/cors-test', methods=['GET', 'POST', 'OPTIONS'])
 def cors_test():
     """
@@ -1058,41 +1080,29 @@ def cors_test():
 
 @app.route('/api/user-profile', methods=['GET'])
 def get_user_profile():
-    """Récupère le profil de l'utilisateur."""
+    """
+    Récupère le profil de l'utilisateur.
+    Cet endpoint n'écrit jamais sur le disque: un utilisateur sans profil reçoit le profil par
+    défaut, et son fichier n'est créé qu'à sa première sauvegarde.
+    """
     try:
         # Récupérer l'ID utilisateur de la requête
         user_id = request.args.get('user_id', 'anonymous')
         
-        # Créer un fichier de profil spécifique à l'utilisateur
-        USER_PROFILE_FILE_WITH_ID = os.path.join(USER_PROFILES_DIR, f'user_profile_{user_id}.json')
+        # Lire le profil (cache des profils partagé avec la résolution du cessionnaire)
+        profile = cessionnaire_resolver.get_profile(user_id)
         
-        # Si le fichier de profil n'existe pas, créer un profil par défaut
-        if not os.path.exists(USER_PROFILE_FILE_WITH_ID):
-            default_profile = DEFAULT_PROFILE.copy()
-            default_profile['user_id'] = user_id
-            
-            # Ajouter un indicateur de données temporaires pour les utilisateurs anonymes
-            if user_id.startswith('anon_'):
-                default_profile['is_temporary'] = True
-                default_profile['created_at'] = datetime.now().isoformat()
-            
-            with open(USER_PROFILE_FILE_WITH_ID, 'w') as f:
-                json.dump(default_profile, f, indent=2)
-            return jsonify(default_profile)
+        # Si le profil n'existe pas, renvoyer un profil par défaut sans l'enregistrer
+        if profile is None:
+            profile = copy.deepcopy(DEFAULT_PROFILE)
+            profile['user_id'] = user_id
         
-        # Lire et retourner le profil
-        with open(USER_PROFILE_FILE_WITH_ID, 'r') as f:
-            profile = json.load(f)
-            
-            # Assurer que le flag de données temporaires est présent pour les utilisateurs anonymes
-            if user_id.startswith('anon_') and not profile.get('is_temporary'):
-                profile['is_temporary'] = True
-                profile['updated_at'] = datetime.now().isoformat()
-                # Sauvegarder le profil mis à jour
-                with open(USER_PROFILE_FILE_WITH_ID, 'w') as f:
-                    json.dump(profile, f, indent=2)
-            
-            return jsonify(profile)
+        # Assurer que le flag de données temporaires est présent pour les utilisateurs anonymes
+        # (il est enregistré à la sauvegarde du profil)
+        if user_id.startswith('anon_') and not profile.get('is_temporary'):
+            profile['is_temporary'] = True
+        
+        return jsonify(profile)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -1111,12 +1121,13 @@ def update_user_profile():
         # Récupérer l'ID utilisateur
         user_id = profile_data.get('user_id', 'anonymous')
         
-        # Créer un fichier de profil spécifique à l'utilisateur
-        USER_PROFILE_FILE_WITH_ID = os.path.join(USER_PROFILES_DIR, f'user_profile_{user_id}.json')
+        # Ajouter un indicateur de données temporaires pour les utilisateurs anonymes
+        if user_id.startswith('anon_'):
+            profile_data['is_temporary'] = True
+            profile_data.setdefault('created_at', datetime.now().isoformat())
         
-        # Sauvegarder le profil
-        with open(USER_PROFILE_FILE_WITH_ID, 'w') as f:
-            json.dump(profile_data, f, indent=2)
+        # Sauvegarder le profil dans un fichier spécifique à l'utilisateur
+        save_user_profile(user_id, profile_data)
         
         return jsonify({'success': True, 'message': 'Profil mis à jour avec succès'})
     except Exception as e:
@@ -1131,63 +1142,34 @@ def access_finalization_step(contract_id):
     # Récupérer l'ID utilisateur de la requête
     user_id = request.args.get('user_id', 'anonymous')
     
-    # Vérifier si le contrat existe
-    contract_file = os.path.join(CONTRACTS_DIR, f"{contract_id}.json")
-    if not os.path.exists(contract_file):
+    # Vérifier si le contrat existe via l'index des propriétaires
+    contract_user_id = contract_store.get_owner(contract_id)
+    if contract_user_id is None:
         return jsonify({'error': 'Contract not found'}), 404
     
     try:
-        with open(contract_file, 'r', encoding='utf-8') as f:
-            contract = json.load(f)
-        
-        # Extraire l'ID de base (sans suffixe) pour la vérification de l'accès
-        base_user_id = user_id
-        if '_' in user_id and not user_id.startswith('anon_'):
-            parts = user_id.split('_')
-            if len(parts) >= 2:
-                base_user_id = f"{parts[0]}_{parts[1]}"
-        
-        # Obtenir l'ID utilisateur du contrat
-        contract_user_id = contract.get('user_id', '')
-        
-        # Extraire l'ID de base du contrat si nécessaire
-        base_contract_user_id = contract_user_id
-        if '_' in contract_user_id and not contract_user_id.startswith('anon_'):
-            parts = contract_user_id.split('_')
-            if len(parts) >= 2:
-                base_contract_user_id = f"{parts[0]}_{parts[1]}"
-        
-        # Vérifier la correspondance des IDs
-        has_access = (
-            user_id == contract_user_id or  # IDs complets identiques
-            base_user_id == base_contract_user_id or  # IDs de base identiques
-            user_id == base_contract_user_id or  # ID complet = ID de base du contrat
-            base_user_id == contract_user_id  # ID de base = ID complet du contrat
-        )
-        
-        print(f"DEBUG - access_finalization_step - Vérification d'accès au contrat {contract_id}:")
-        print(f"  - ID utilisateur: {user_id} (base: {base_user_id})")
-        print(f"  - ID du contrat: {contract_user_id} (base: {base_contract_user_id})")
-        print(f"  - Accès autorisé: {has_access}")
-        
-        if not has_access:
+        if not has_contract_access('access_finalization_step', contract_id, user_id, contract_user_id):
             return jsonify({'error': 'Accès non autorisé'}), 403
         
-        # Récupérer les données du formulaire
-        form_data = contract.get('form_data', contract.get('data', {}))
-        
-        # Mettre à jour le statut de "from_step6" à True pour indiquer que ce contrat est passé par l'étape 6
-        contract['from_step6'] = True
-        contract['updated_at'] = datetime.now().isoformat()
-        
-        # S'assurer que le user_id est correctement défini dans le contrat
-        # Utiliser l'ID utilisateur actuel (avec suffixe) pour assurer la compatibilité avec les requêtes futures
-        if not contract.get('user_id') or contract.get('user_id') == 'anonymous':
-            contract['user_id'] = user_id
-        
-        # Sauvegarder les modifications
-        with open(contract_file, 'w', encoding='utf-8') as f:
-            json.dump(contract, f, ensure_ascii=False, indent=2)
+        # Lecture, modification et écriture sans écriture concurrente du même contrat
+        with contract_store.lock(contract_id):
+            contract = contract_store.get(contract_id)
+            if contract is None:
+                return jsonify({'error': 'Contract not found'}), 404
+            
+            # Récupérer les données du formulaire
+            form_data = contract.get('form_data', contract.get('data', {}))
+            
+            # Mettre à jour le statut de "from_step6" à True pour indiquer que ce contrat est passé par l'étape 6
+            contract['from_step6'] = True
+            
+            # S'assurer que le user_id est correctement défini dans le contrat
+            # Utiliser l'ID utilisateur actuel (avec suffixe) pour assurer la compatibilité avec les requêtes futures
+            if not contract.get('user_id') or contract.get('user_id') == 'anonymous':
+                contract['user_id'] = user_id
+            
+            # Sauvegarder les modifications
+            contract_store.save(contract, expected_version=contract.get('version', 0), touch=True)
         
         return jsonify({
             'form_data': form_data,
@@ -1196,6 +1178,8 @@ def access_finalization_step(contract_id):
             'message': 'Successfully retrieved form data for finalization step'
         })
     
+    except VersionConflict as e:
+        return version_conflict(e.version)
     except Exception as e:
         print(f"Error accessing finalization step for contract {contract_id}: {e}")
         return jsonify({'error': str(e)}), 500
@@ -1250,39 +1234,45 @@ def migrate_user_data():
         
         migrated_contracts = 0
         
+        # Contrats déjà accessibles à l'utilisateur, lus dans l'index (résumés) avant la migration:
+        # la liste de vérification est complétée avec les contrats migrés, sans charger de contrat complet
+        user_contracts_by_id = {}
+        for owner_base in {get_base_user_id(formatted_authenticated_id), get_base_user_id(authenticated_id)}:
+            for summary in contract_store.list_summaries(owner_base):
+                user_contracts_by_id[summary.get('id')] = summary
+        
+        migration_job = None
+        
         # Traiter d'abord le brouillon spécifique s'il est fourni
         if draft_contract_id:
-            contract_file = os.path.join(CONTRACTS_DIR, f"{draft_contract_id}.json")
-            print(f"DEBUG - migrate_user_data - Recherche du fichier de brouillon: {contract_file}")
+            print(f"DEBUG - migrate_user_data - Recherche du brouillon: {draft_contract_id}")
             
-            if os.path.exists(contract_file):
-                # ⚠️ IMPORTANT: Utiliser une approche similaire à l'import plutôt qu'une simple modification
-                # Cela permet de conserver intégralement les données du contrat sans modification
-                
-                # 1. Lire le contrat original
-                with open(contract_file, 'r', encoding='utf-8') as f:
-                    contract = json.load(f)
-                
-                print(f"DEBUG - migrate_user_data - Contrat trouvé: {contract.get('id')}, user_id actuel: {contract.get('user_id')}")
-                
-                # 2. Créer une copie du contrat avec seulement les modifications minimales nécessaires
-                migrated_contract = contract.copy()
+            # 1. Lire le contrat original (verrouillé jusqu'à son écriture)
+            with contract_store.lock(draft_contract_id):
+                contract = contract_store.get(draft_contract_id)
                 
-                # 3. Stocker l'ID utilisateur d'origine dans un champ spécial pour référence future
-                old_user_id = contract.get('user_id')
-                migrated_contract['original_user_id'] = old_user_id
-                
-                # 4. Mettre à jour uniquement l'ID utilisateur et la date de mise à jour
-                migrated_contract['user_id'] = formatted_authenticated_id
-                migrated_contract['updated_at'] = datetime.now().isoformat()
-                
-                # 5. S'assurer que le statut de brouillon est préservé
-                if 'is_draft' not in migrated_contract:
-                    migrated_contract['is_draft'] = True
-                
-                # 6. Sauvegarder le contrat mis à jour (même ID, mais nouveau propriétaire)
-                with open(contract_file, 'w', encoding='utf-8') as f:
-                    json.dump(migrated_contract, f, ensure_ascii=False, indent=2)
+                if contract is not None:
+                    # ⚠️ IMPORTANT: Utiliser une approche similaire à l'import plutôt qu'une simple modification
+                    # Cela permet de conserver intégralement les données du contrat sans modification
+                    
+                    print(f"DEBUG - migrate_user_data - Contrat trouvé: {contract.get('id')}, user_id actuel: {contract.get('user_id')}")
+                    
+                    # 2. Créer une copie du contrat avec seulement les modifications minimales nécessaires:
+                    # l'ID utilisateur d'origine est conservé dans original_user_id pour référence future
+                    old_user_id = contract.get('user_id')
+                    migrated_contract = migrate_contract_owner(contract, formatted_authenticated_id)
+                    
+                    # 5. S'assurer que le statut de brouillon est préservé
+                    if 'is_draft' not in migrated_contract:
+                        migrated_contract['is_draft'] = True
+                    
+                    # 6. Sauvegarder le contrat mis à jour (même ID, mais nouveau propriétaire), à partir de la version lue
+                    migrated_contract['version'] = contract_store.save(
+                        migrated_contract, expected_version=contract.get('version', 0), touch=True
+                    )
+            
+            if contract is not None:
+                user_contracts_by_id[draft_contract_id] = migrated_contract
                 
                 print(f"DEBUG - migrate_user_data - Brouillon {draft_contract_id} migré comme import: user_id changé de {old_user_id} à {formatted_authenticated_id}")
                 print(f"DEBUG - migrate_user_data - Toutes les données du contrat original ont été préservées")
@@ -1295,73 +1285,59 @@ def migrate_user_data():
             # Code existant pour la migration basée sur l'ID anonyme
             print(f"DEBUG - migrate_user_data - Migration des données basée sur l'ID anonyme: {anonymous_id}")
             
-            # Compter les contrats migrés via cette méthode
-            anonymous_migrated = 0
+            # Seuls les contrats de l'utilisateur anonyme sont lus, via l'index des propriétaires
+            anonymous_contract_ids = contract_store.contract_ids_for_exact_owner(anonymous_id)
             
-            for filename in os.listdir(CONTRACTS_DIR):
-                if not filename.endswith('.json'):
-                    continue
+            if len(anonymous_contract_ids) > MIGRATION_SYNC_LIMIT:
+                # Migration volumineuse: tâche de fond reprise automatiquement après un redémarrage
+                migration_job = migration_jobs.start(anonymous_id, formatted_authenticated_id, anonymous_contract_ids)
+                print(f"DEBUG - migrate_user_data - {len(anonymous_contract_ids)} contrats à migrer: tâche de fond {migration_job['id']}")
+            else:
+                # Compter les contrats migrés via cette méthode
+                anonymous_migrated = 0
                 
-                contract_path = os.path.join(CONTRACTS_DIR, filename)
-                try:
-                    with open(contract_path, 'r', encoding='utf-8') as f:
-                        contract = json.load(f)
-                    
-                    # Vérifier si le contrat appartient à l'utilisateur anonyme
-                    if contract.get('user_id') == anonymous_id:
-                        # Même approche que pour le brouillon spécifique
-                        migrated_contract = contract.copy()
-                        old_user_id = contract.get('user_id')
-                        migrated_contract['original_user_id'] = old_user_id
-                        migrated_contract['user_id'] = formatted_authenticated_id
-                        migrated_contract['updated_at'] = datetime.now().isoformat()
-                        
-                        # Sauvegarder le contrat mis à jour
-                        with open(contract_path, 'w', encoding='utf-8') as f:
-                            json.dump(migrated_contract, f, ensure_ascii=False, indent=2)
+                for contract_id in anonymous_contract_ids:
+                    try:
+                        # Même approche que pour le brouillon spécifique; le propriétaire est revérifié
+                        # car l'index peut contenir des entrées obsolètes
+                        migrated_contract = migrate_contract(contract_store, contract_id, anonymous_id,
+                                                             formatted_authenticated_id)
+                        if migrated_contract is None:
+                            continue
+                        user_contracts_by_id[contract_id] = migrated_contract
                         
-                        print(f"DEBUG - migrate_user_data - Contrat {contract.get('id')} migré comme import: user_id changé de {old_user_id} à {formatted_authenticated_id}")
+                        print(f"DEBUG - migrate_user_data - Contrat {contract_id} migré comme import: user_id changé de {anonymous_id} à {formatted_authenticated_id}")
                         anonymous_migrated += 1
                         migrated_contracts += 1
-                except Exception as e:
-                    print(f"DEBUG - migrate_user_data - Erreur lors de la migration du contrat {filename}: {e}")
-            
-            print(f"DEBUG - migrate_user_data - {anonymous_migrated} contrats migrés basés sur l'ID anonyme")
+                    except Exception as e:
+                        print(f"DEBUG - migrate_user_data - Erreur lors de la migration du contrat {contract_id}: {e}")
+                
+                print(f"DEBUG - migrate_user_data - {anonymous_migrated} contrats migrés basés sur l'ID anonyme")
         
         # Vérifier que les migrations ont fonctionné en listant tous les contrats de l'utilisateur
+        # ⚠️ Les contrats avec l'ID formaté ET l'ID de base sont pris en compte
         user_contracts = []
         
-        # ⚠️ Pour la vérification, nous devons chercher les contrats avec l'ID formaté ET l'ID de base
-        for filename in os.listdir(CONTRACTS_DIR):
-            if not filename.endswith('.json'):
-                continue
+        for contract in user_contracts_by_id.values():
+            contract_user_id = contract.get('user_id', '')
             
-            contract_path = os.path.join(CONTRACTS_DIR, filename)
-            try:
-                with open(contract_path, 'r', encoding='utf-8') as f:
-                    contract = json.load(f)
-                
-                contract_user_id = contract.get('user_id', '')
-                
-                # Vérifier si le contrat appartient à l'utilisateur (avec ou sans suffixe)
-                if (contract_user_id == formatted_authenticated_id or
-                    contract_user_id == authenticated_id or
-                    (contract_user_id.startswith(authenticated_id + '_'))):
-                    user_contracts.append({
-                        'id': contract.get('id'),
-                        'title': contract.get('title'),
-                        'is_draft': contract.get('is_draft', False),
-                        'user_id': contract_user_id,  # Inclure l'ID utilisateur pour débogage
-                        'was_imported': bool(contract.get('original_user_id')) # Indiquer si c'était un import
-                    })
-            except Exception as e:
-                print(f"DEBUG - migrate_user_data - Erreur lors de la vérification du contrat {filename}: {e}")
+            # Vérifier si le contrat appartient à l'utilisateur (avec ou sans suffixe)
+            if (contract_user_id == formatted_authenticated_id or
+                contract_user_id == authenticated_id or
+                (contract_user_id.startswith(authenticated_id + '_'))):
+                user_contracts.append({
+                    'id': contract.get('id'),
+                    'title': contract.get('title'),
+                    'is_draft': contract.get('is_draft', False),
+                    'user_id': contract_user_id,  # Inclure l'ID utilisateur pour débogage
+                    'was_imported': bool(contract.get('original_user_id')) # Indiquer si c'était un import
+                })
         
         print(f"DEBUG - migrate_user_data - L'utilisateur {formatted_authenticated_id} a maintenant {len(user_contracts)} contrats:")
         for contract in user_contracts:
             print(f"  - Contrat {contract['id']}: {contract['title']} (user_id: {contract['user_id']})")
         
-        return jsonify({
+        response = {
             'success': True,
             'message': f'Migration réussie: {migrated_contracts} contrats migrés comme imports',
             'migrated_contracts': migrated_contracts,
@@ -1370,12 +1346,31 @@ def migrate_user_data():
                 'base': authenticated_id,
                 'formatted': formatted_authenticated_id
             }
-        })
+        }
+        
+        if migration_job is not None:
+            # Les contrats anonymes seront ajoutés au fur et à mesure de la tâche de fond
+            response['message'] = f'Migration en cours: {migration_job["total"]} contrats à migrer en arrière-plan'
+            response['migration_job'] = MigrationJobs.progress(migration_job)
+            return jsonify(response), 202
+        
+        return jsonify(response)
     
     except Exception as e:
         print(f"DEBUG - migrate_user_data - Erreur pendant la migration: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/migrate-user-data/<job_id>', methods=['GET'])
+def get_migration_job(job_id):
+    """
+    Endpoint pour suivre l'avancement d'une migration en arrière-plan.
+    """
+    job = migration_jobs.get(secure_filename(job_id))
+    if job is None:
+        return jsonify({'error': 'Migration introuvable'}), 404
+    
+    return jsonify(MigrationJobs.progress(job))
+
 # Pour le développement local
 if __name__ == '__main__':
     app.run(debug=True, port=5001)
@@ -0,0 +1,353 @@
+"""
+Écriture sûre des fichiers de données.
+Les fichiers sont écrits dans un fichier temporaire puis renommés à leur place: un worker
+interrompu en cours d'écriture ne laisse jamais de fichier tronqué.
+Les rafales d'écritures d'un même fichier (sauvegardes automatiques) peuvent être regroupées.
+Les lectures-modifications-écritures d'un même document peuvent être sérialisées par KeyedLock.
+Les tâches périodiques d'un seul worker sont lancées par start_leader_scheduler.
+"""
+import os
+import json
+import zlib
+import time
+import atexit
+import tempfile
+import threading
+from contextlib import contextmanager, nullcontext, ExitStack
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: les verrous ne sont partagés qu'entre les threads d'un même processus
+    fcntl = None
+
+
+def atomic_write_bytes(path, data, durable=True):
+    """
+    Écrit des octets dans un fichier de manière atomique.
+
+    Args:
+        path (str): Chemin du fichier de destination
+        data (bytes): Contenu à écrire
+        durable (bool, optional): Forcer l'écriture sur disque (fsync) avant le renommage
+
+    Returns:
+        os.stat_result: État du fichier écrit, relevé avant le renommage: contrairement à un
+            os.stat(path) après coup, il ne peut pas être celui d'un fichier écrit entre-temps
+            par un autre worker (mtime et taille sont conservés par le renommage)
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            if durable:
+                os.fsync(f.fileno())
+            stat = os.fstat(f.fileno())
+        os.replace(tmp_path, path)
+        return stat
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_json(path, document, durable=True, **dump_kwargs):
+    """
+    Sérialise un document en JSON et l'écrit de manière atomique.
+
+    Args:
+        path (str): Chemin du fichier de destination
+        document: Document à sérialiser
+        durable (bool, optional): Forcer l'écriture sur disque (fsync) avant le renommage
+        **dump_kwargs: Options transmises à json.dumps (indent, ensure_ascii...)
+
+    Returns:
+        os.stat_result: État du fichier écrit (voir atomic_write_bytes)
+    """
+    return atomic_write_bytes(path, json.dumps(document, **dump_kwargs).encode('utf-8'), durable=durable)
+
+
+class CoalescingWriter:
+    """
+    Regroupe les écritures successives d'un même fichier dans une fenêtre de temps.
+    Seule la dernière version reçue pendant la fenêtre est écrite. Avec une fenêtre
+    nulle, chaque écriture est effectuée immédiatement.
+    """
+
+    def __init__(self, write_fn, window_seconds=0.0, on_written=None, lock_fn=None, is_current=None):
+        """
+        Args:
+            write_fn (callable): Fonction write_fn(path, document) qui écrit réellement le fichier
+                et retourne son état (voir atomic_write_bytes)
+            window_seconds (float, optional): Fenêtre de regroupement des écritures
+            on_written (callable, optional): Rappel on_written(path, document, stat) après chaque écriture
+            lock_fn (callable, optional): lock_fn(path) retourne le verrou (gestionnaire de contexte)
+                sous lequel une écriture différée est effectuée, ex: le verrou du document dans KeyedLock
+            is_current (callable, optional): is_current(path, document), appelé sous ce verrou avant une
+                écriture différée: False si le fichier contient déjà une version plus récente, qui ne
+                doit pas être écrasée (l'écriture en attente est alors abandonnée)
+        """
+        self.write_fn = write_fn
+        self.window_seconds = window_seconds
+        self.on_written = on_written
+        self.lock_fn = lock_fn
+        self.is_current = is_current
+        self._pending = {}
+        self._timers = {}
+        # Verrous répartis par hachage du chemin, pour ne pas conserver un verrou par fichier
+        self._path_locks = [threading.Lock() for _ in range(64)]
+        self._lock = threading.Lock()
+        self.writes_requested = 0
+        self.writes_performed = 0
+        self.writes_coalesced = 0
+        self.writes_failed = 0
+        self.writes_dropped = 0
+        atexit.register(self.flush_all)
+
+    def write(self, path, document):
+        """
+        Demande l'écriture d'un document. Le document ne doit plus être modifié par l'appelant.
+        """
+        with self._lock:
+            self.writes_requested += 1
+            if self.window_seconds <= 0:
+                immediate = True
+            else:
+                immediate = False
+                if path in self._pending:
+                    # Une écriture est déjà programmée: elle emportera cette version
+                    self.writes_coalesced += 1
+                self._pending[path] = document
+                if path not in self._timers:
+                    self._start_timer(path)
+
+        if immediate:
+            with self._path_lock(path):
+                self._perform(path, document)
+
+    def pending(self, path):
+        """
+        Retourne la version en attente d'écriture d'un fichier, ou None.
+        """
+        with self._lock:
+            return self._pending.get(path)
+
+    def discard(self, path):
+        """
+        Abandonne l'écriture en attente d'un fichier (ex: fichier supprimé).
+        Attend la fin d'une écriture en cours pour qu'elle ne recrée pas le fichier ensuite.
+
+        Returns:
+            bool: True si une écriture était en attente
+        """
+        with self._path_lock(path):
+            with self._lock:
+                timer = self._timers.pop(path, None)
+                if timer is not None:
+                    timer.cancel()
+                return self._pending.pop(path, None) is not None
+
+    def flush(self, path):
+        """
+        Écrit immédiatement la version en attente d'un fichier.
+        Si l'écriture échoue, la version reste en attente et une nouvelle tentative est programmée.
+        """
+        # Ordre des verrous: celui du document (lock_fn) avant celui du fichier, comme un appelant
+        # qui écrit ou abandonne un fichier sous le verrou du document
+        lock = self.lock_fn(path) if self.lock_fn is not None else nullcontext()
+        with lock, self._path_lock(path):
+            # Le verrou du fichier sérialise les écritures d'un même fichier. La version reste
+            # visible via pending() jusqu'à ce qu'elle soit sur le disque.
+            with self._lock:
+                timer = self._timers.pop(path, None)
+                if timer is not None:
+                    timer.cancel()
+                document = self._pending.get(path)
+            if document is None:
+                return
+
+            if self.is_current is not None and not self.is_current(path, document):
+                print(f"Écriture différée de {path} abandonnée: le fichier contient une version plus récente")
+                with self._lock:
+                    self.writes_dropped += 1
+                    if self._pending.get(path) is document:
+                        del self._pending[path]
+                return
+
+            try:
+                self._perform(path, document)
+            except Exception:
+                with self._lock:
+                    self.writes_failed += 1
+                    # Garder la version en attente (toujours lue par pending()) et réessayer plus tard
+                    if path in self._pending and path not in self._timers:
+                        self._start_timer(path)
+                return
+
+            with self._lock:
+                # Une version plus récente a pu être demandée pendant l'écriture
+                if self._pending.get(path) is document:
+                    del self._pending[path]
+
+    def flush_all(self):
+        """
+        Écrit toutes les versions en attente (appelé à l'arrêt du processus).
+        """
+        with self._lock:
+            paths = list(self._pending)
+        for path in paths:
+            self.flush(path)
+
+    def _start_timer(self, path):
+        # Appelé sous self._lock
+        timer = threading.Timer(self.window_seconds, self.flush, args=(path,))
+        timer.daemon = True
+        self._timers[path] = timer
+        timer.start()
+
+    def _path_lock(self, path):
+        return self._path_locks[hash(path) % len(self._path_locks)]
+
+    def _perform(self, path, document):
+        try:
+            stat = self.write_fn(path, document)
+        except Exception as e:
+            print(f"Erreur lors de l'écriture de {path}: {e}")
+            raise
+        with self._lock:
+            self.writes_performed += 1
+        if self.on_written is not None:
+            self.on_written(path, document, stat)
+
+    def stats(self):
+        """
+        Retourne les compteurs d'écriture (dont le nombre d'écritures économisées).
+        """
+        with self._lock:
+            return {
+                'window_seconds': self.window_seconds,
+                'writes_requested': self.writes_requested,
+                'writes_performed': self.writes_performed,
+                'writes_saved': self.writes_coalesced,
+                'writes_failed': self.writes_failed,
+                'writes_dropped': self.writes_dropped,
+                'pending': len(self._pending)
+            }
+
+
+class KeyedLock:
+    """
+    Verrous par clé (ex: ID de contrat), répartis sur un nombre fixe de verrous.
+    Avec un répertoire de verrous, chaque verrou est aussi un fichier verrouillé par flock:
+    les workers gunicorn qui partagent le répertoire de données sont sérialisés entre eux.
+    Un thread qui détient déjà le verrou d'une clé peut le reprendre (ex: save() appelé
+    pendant une lecture-modification-écriture verrouillée).
+    """
+
+    def __init__(self, lock_dir=None, stripes=64):
+        self.lock_dir = lock_dir if fcntl is not None else None
+        if self.lock_dir is not None:
+            os.makedirs(self.lock_dir, exist_ok=True)
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._held = threading.local()
+
+    def _stripe(self, key):
+        # crc32 plutôt que hash(): la répartition doit être la même dans tous les workers
+        return zlib.crc32(key.encode('utf-8')) % len(self._locks)
+
+    @contextmanager
+    def hold_all(self, keys):
+        """
+        Verrouille plusieurs clés pendant la durée du bloc with. Les verrous sont pris dans l'ordre
+        de leur répartition: deux appels concurrents sur des clés communes ne peuvent pas s'interbloquer.
+        """
+        with ExitStack() as stack:
+            for key in sorted(set(keys), key=self._stripe):
+                stack.enter_context(self.hold(key))
+            yield
+
+    @contextmanager
+    def hold(self, key):
+        """
+        Verrouille une clé pendant la durée du bloc with.
+        """
+        stripe = self._stripe(key)
+        held = self._held.__dict__.setdefault('stripes', set())
+        if stripe in held:
+            yield
+            return
+
+        with self._locks[stripe]:
+            held.add(stripe)
+            try:
+                if self.lock_dir is None:
+                    yield
+                    return
+                with open(os.path.join(self.lock_dir, f'{stripe:02x}.lock'), 'a') as f:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                    try:
+                        yield
+                    finally:
+                        fcntl.flock(f, fcntl.LOCK_UN)
+            finally:
+                held.discard(stripe)
+
+
+def try_process_lock(path, exclusive=True):
+    """
+    Tente de verrouiller un fichier (flock non bloquant) pour le reste de la vie du processus.
+
+    Args:
+        path (str): Chemin du fichier de verrou (créé si nécessaire)
+        exclusive (bool, optional): Verrou exclusif, ou partagé avec d'autres processus
+
+    Returns:
+        file: Fichier ouvert à conserver tant que le verrou est nécessaire (sa fermeture le libère),
+            ou None si un autre processus détient un verrou incompatible. Sans fcntl (Windows),
+            le fichier est retourné sans être verrouillé.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    f = open(path, 'a')
+    if fcntl is None:
+        return f
+    try:
+        fcntl.flock(f, (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return None
+    return f
+
+
+def start_leader_scheduler(is_leader, task, interval_seconds, label, run_immediately=True):
+    """
+    Lance une tâche périodique dans un thread d'arrière-plan du worker.
+    Seul le worker élu (is_leader) exécute la tâche; les autres retentent à chaque intervalle.
+
+    Args:
+        is_leader (callable): Retourne True si ce worker est chargé de la tâche (voir try_process_lock)
+        task (callable): Tâche à exécuter
+        interval_seconds (float): Intervalle entre deux exécutions
+        label (str): Nom de la tâche dans les journaux
+        run_immediately (bool, optional): Exécuter la tâche au démarrage plutôt qu'après un intervalle
+
+    Returns:
+        threading.Thread: Thread de la tâche
+    """
+    def run():
+        if not run_immediately:
+            time.sleep(interval_seconds)
+        while True:
+            try:
+                if is_leader():
+                    task()
+            except Exception as e:
+                print(f"{label} interrompu: {e}")
+            time.sleep(interval_seconds)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,115 @@
+"""
+Cache LRU borné en mémoire du worker, commun aux caches de documents (document_cache.py), des
+éléments de l'éditeur (elements_cache.py) et au niveau mémoire des PDF (pdf_cache.py).
+Le budget est un nombre d'entrées ou un nombre d'octets; les valeurs ne sont pas copiées.
+"""
+import threading
+from collections import OrderedDict
+
+
+class BoundedLRU:
+    """
+    Dictionnaire LRU borné et sûr entre threads, avec compteurs de succès, d'échecs et d'évictions.
+    Un budget à 0 désactive le cache: rien n'est conservé, les échecs sont comptés.
+    """
+
+    def __init__(self, max_entries=None, max_bytes=None, sizeof=len):
+        """
+        Args:
+            max_entries (int, optional): Nombre maximal d'entrées
+            max_bytes (int, optional): Taille maximale des valeurs, mesurée par sizeof (à la place de max_entries)
+            sizeof (callable, optional): Taille d'une valeur en octets, pour un budget en octets
+        """
+        if (max_entries is None) == (max_bytes is None):
+            raise ValueError("Indiquer un budget en entrées ou en octets")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return (self.max_bytes if self.max_bytes is not None else self.max_entries) > 0
+
+    def _size(self, value):
+        return self._sizeof(value) if self.max_bytes is not None else 0
+
+    def _over_budget(self):
+        if self.max_bytes is not None:
+            return self._bytes > self.max_bytes
+        return len(self._entries) > self.max_entries
+
+    def get(self, key, is_valid=None):
+        """
+        Retourne la valeur associée à une clé et la marque comme récemment utilisée.
+
+        Args:
+            key: Clé de l'entrée
+            is_valid (callable, optional): Prédicat sur la valeur en cache; une valeur périmée
+                est comptée comme un échec
+
+        Returns:
+            La valeur en cache, ou None
+        """
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None and (is_valid is None or is_valid(value)):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        """
+        Ajoute ou remplace une entrée, puis évince les moins récemment utilisées au-delà du budget.
+        Une valeur plus grande que tout le budget n'est pas conservée.
+        """
+        size = self._size(value)
+        if not self.enabled or (self.max_bytes is not None and size > self.max_bytes):
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= self._size(previous)
+            self._entries[key] = value
+            self._bytes += size
+            while self._over_budget():
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= self._size(evicted)
+                self.evictions += 1
+
+    def pop(self, key):
+        with self._lock:
+            value = self._entries.pop(key, None)
+            if value is not None:
+                self._bytes -= self._size(value)
+            return value
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self):
+        """
+        Retourne l'occupation et les compteurs du cache.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {'entries': len(self._entries)}
+            if self.max_bytes is not None:
+                stats.update({'bytes': self._bytes, 'max_bytes': self.max_bytes})
+            else:
+                stats['max_entries'] = self.max_entries
+            stats.update({
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            })
+            return stats
@@ -0,0 +1,143 @@
+"""
+Résolution des informations du cessionnaire d'un contrat.
+Les endpoints de prévisualisation, de génération de PDF, de sauvegarde et d'édition partagent
+le même ordre de priorité: informations stockées dans le contrat, puis entreprise_info, puis
+profil du propriétaire d'origine, puis profil de l'utilisateur, puis informations de Tellers.
+
+Les profils lus sont conservés dans un cache validé par mtime (voir document_cache.py), sous leur
+forme normalisée: les données des contrats et des profils sont normalisées à l'écriture
+(voir data_schema.py), la résolution ne fait que choisir parmi des valeurs déjà normalisées.
+"""
+import time
+import threading
+
+import data_layout
+from config import TELLERS_INFO
+from data_schema import needs_upgrade, normalize_profile
+from document_cache import DocumentCache
+from storage_codec import read_document
+
+
+def profile_entity(profile):
+    """
+    Retourne l'entité sélectionnée et configurée d'un profil utilisateur.
+
+    Args:
+        profile (dict): Profil utilisateur
+
+    Returns:
+        dict: Informations de la personne physique ou morale, ou None
+    """
+    entity_type = profile.get('selected_entity_type')
+    if entity_type in ('physical_person', 'legal_entity'):
+        entity = profile.get(entity_type) or {}
+        if entity.get('is_configured'):
+            return entity
+    return None
+
+
+class CessionnaireResolver:
+    """
+    Service de résolution du cessionnaire, partagé par tous les endpoints du worker.
+    """
+
+    # Origines possibles du cessionnaire résolu
+    SOURCES = ('contract', 'entreprise_info', 'original_profile', 'profile', 'default')
+
+    def __init__(self, profiles_dir, cache_size=256):
+        self.profiles_dir = profiles_dir
+        self.profile_cache = DocumentCache(cache_size)
+        self._lock = threading.Lock()
+        self.resolutions = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.by_source = {source: 0 for source in self.SOURCES}
+
+    @staticmethod
+    def _load_profile(path):
+        # Profil enregistré avant la normalisation à l'écriture: mis à niveau en mémoire une fois
+        # par version du fichier, puis réécrit normalisé à sa prochaine sauvegarde
+        profile = read_document(path)
+        return normalize_profile(profile) if needs_upgrade(profile) else profile
+
+    def get_profile(self, user_id):
+        """
+        Retourne le profil d'un utilisateur, depuis le cache s'il est à jour.
+
+        Args:
+            user_id (str): ID de l'utilisateur
+
+        Returns:
+            dict: Copie du profil, ou None si l'utilisateur n'a pas de profil
+        """
+        path = data_layout.resolve_path(self.profiles_dir, f'user_profile_{user_id}.json')
+        try:
+            return self.profile_cache.get(path, self._load_profile)
+        except FileNotFoundError:
+            return None
+        except ValueError as e:
+            print(f"Profil illisible pour l'utilisateur {user_id}: {e}")
+            return None
+
+    def resolve(self, contract_data, user_id, original_user_id=None, use_stored=True):
+        """
+        Détermine les informations du cessionnaire d'un contrat.
+
+        Args:
+            contract_data (dict): Données du contrat, normalisées (voir data_schema.py)
+            user_id (str): ID de l'utilisateur dont le profil sert de dernier recours
+            original_user_id (str, optional): ID du propriétaire d'origine d'un contrat importé/migré
+            use_stored (bool, optional): Utiliser le cessionnaire_info déjà stocké dans le contrat
+
+        Returns:
+            tuple: (informations du cessionnaire, origine parmi SOURCES)
+        """
+        started = time.perf_counter()
+        cessionnaire_info, source = self._resolve(contract_data, user_id, original_user_id, use_stored)
+        elapsed = time.perf_counter() - started
+
+        with self._lock:
+            self.resolutions += 1
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+            self.by_source[source] += 1
+
+        return cessionnaire_info, source
+
+    def _resolve(self, contract_data, user_id, original_user_id, use_stored):
+        # 1. Informations de cessionnaire déjà stockées dans le contrat
+        if use_stored and contract_data.get('cessionnaire_info'):
+            return contract_data['cessionnaire_info'], 'contract'
+
+        # 2. Informations de l'entreprise saisies à l'étape 3
+        if contract_data.get('entreprise_info'):
+            return contract_data['entreprise_info'], 'entreprise_info'
+
+        # 3. Profil du propriétaire d'origine d'un contrat importé/migré
+        if original_user_id:
+            original_profile = self.get_profile(original_user_id)
+            entity = profile_entity(original_profile) if original_profile else None
+            if entity:
+                return entity, 'original_profile'
+
+        # 4. Profil de l'utilisateur actuel
+        profile = self.get_profile(user_id)
+        entity = profile_entity(profile) if profile else None
+        if entity:
+            return entity, 'profile'
+
+        # 5. Informations par défaut de Tellers
+        return dict(TELLERS_INFO), 'default'
+
+    def stats(self):
+        """
+        Retourne les compteurs du cache des profils et la latence des résolutions.
+        """
+        with self._lock:
+            return {
+                'profile_cache': self.profile_cache.stats(),
+                'resolutions': self.resolutions,
+                'by_source': dict(self.by_source),
+                'avg_latency_ms': round(self.total_seconds * 1000 / self.resolutions, 3) if self.resolutions else 0.0,
+                'max_latency_ms': round(self.max_seconds * 1000, 3)
+            }
@@ -0,0 +1,225 @@
+"""
+Export des contrats d'un utilisateur au format LexForge.
+Les contrats sont exportés un par un par des générateurs (NDJSON ou archive zip), en mémoire
+constante: seule une page de résumés et le contrat en cours d'écriture sont chargés.
+
+Les contrats sont parcourus par date de modification croissante; le curseur renvoyé en fin
+d'export (next_since) permet de n'exporter ensuite que les contrats modifiés depuis
+(sauvegardes incrémentales).
+"""
+import io
+import os
+import re
+import json
+import zipfile
+from datetime import datetime
+
+from contract_store import encode_cursor, decode_cursor, SUBDOCUMENT_FIELDS
+from data_schema import DATA_SCHEMA_VERSION
+from storage_codec import detect_codec
+
+# Version du format d'export (voir export_info)
+EXPORT_VERSION = '1.0'
+
+# Nombre de résumés chargés à la fois pendant le parcours des contrats
+EXPORT_PAGE_SIZE = 200
+
+
+def export_info():
+    """
+    Retourne les métadonnées ajoutées à chaque contrat exporté.
+    """
+    return {
+        'exported_at': datetime.now().isoformat(),
+        'version': EXPORT_VERSION,
+        'application': 'LexForge'
+    }
+
+
+def check_since(since):
+    """
+    Vérifie un curseur since= avant le début de l'export.
+
+    Raises:
+        ValueError: Si le curseur est invalide
+    """
+    if since:
+        decode_cursor(since)
+
+
+def iter_export_contracts(contract_store, user_id, since=None, page_size=EXPORT_PAGE_SIZE):
+    """
+    Parcourt les contrats d'un utilisateur à exporter, avec leurs éléments et commentaires enregistrés.
+
+    Args:
+        contract_store (ContractStore): Stockage des contrats
+        user_id (str): ID de l'utilisateur (correspondance sur l'ID de base, comme le tableau de bord)
+        since (str, optional): Curseur d'un export précédent
+        page_size (int, optional): Nombre de résumés chargés à la fois
+
+    Yields:
+        tuple: (contrat complet, curseur de reprise après ce contrat)
+    """
+    cursor = since
+    while True:
+        summaries, next_cursor = contract_store.list_page(
+            user_id, sort_by='updated_at', descending=False, limit=page_size, cursor=cursor
+        )
+        for summary in summaries:
+            # Les éléments enregistrés sont exportés tels quels, sans être régénérés
+            contract = contract_store.get_full(summary['id'])
+            if contract is None:
+                # Contrat supprimé pendant l'export
+                continue
+            yield contract, encode_cursor(summary.get('updated_at') or '', summary['id'])
+        if next_cursor is None:
+            return
+        cursor = next_cursor
+
+
+def _export_summary(count, next_since):
+    return {'export_summary': dict(export_info(), count=count, next_since=next_since)}
+
+
+def _encode_line(document):
+    return json.dumps(document, ensure_ascii=False).encode('utf-8') + b'\n'
+
+
+def ndjson_export(contract_store, user_id, since=None):
+    """
+    Générateur de l'export NDJSON: un contrat par ligne (avec export_info), puis une dernière
+    ligne {"export_summary": {..., "count", "next_since"}}.
+
+    Yields:
+        bytes: Lignes de l'export
+    """
+    count = 0
+    next_since = since
+    for contract, cursor in iter_export_contracts(contract_store, user_id, since):
+        contract['export_info'] = export_info()
+        yield _encode_line(contract)
+        count += 1
+        next_since = cursor
+    yield _encode_line(_export_summary(count, next_since))
+
+
+class _ChunkBuffer(io.RawIOBase):
+    """
+    Flux d'écriture non positionnable dont le contenu est vidé après chaque fichier de l'archive.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def zip_export(contract_store, user_id, since=None):
+    """
+    Générateur de l'export zip: un fichier contracts/<id>.json par contrat (même format que
+    l'export d'un contrat), puis manifest.json contenant le résumé de l'export.
+    L'archive est produite au fil de l'eau: chaque fichier est envoyé dès qu'il est compressé.
+
+    Yields:
+        bytes: Morceaux de l'archive
+    """
+    buffer = _ChunkBuffer()
+    count = 0
+    next_since = since
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for contract, cursor in iter_export_contracts(contract_store, user_id, since):
+            contract['export_info'] = export_info()
+            archive.writestr(f"contracts/{contract['id']}.json", json.dumps(contract, ensure_ascii=False))
+            count += 1
+            next_since = cursor
+            yield buffer.drain()
+        archive.writestr('manifest.json', json.dumps(_export_summary(count, next_since), ensure_ascii=False))
+    yield buffer.drain()
+
+
+# Fin d'un enregistrement à jour: schema_version est toujours le dernier champ écrit (voir data_schema.py)
+_RECORD_TAIL = re.compile(rb'"schema_version"\s*:\s*(\d+)\s*(\})\s*$')
+
+# Taille des morceaux lus sur le disque pendant l'export sans décodage
+_CHUNK_SIZE = 64 * 1024
+
+
+def _stream_file(f, length):
+    remaining = length
+    while remaining > 0:
+        chunk = f.read(min(_CHUNK_SIZE, remaining))
+        if not chunk:
+            return
+        remaining -= len(chunk)
+        yield chunk
+
+
+def passthrough_export(files):
+    """
+    Prépare l'export d'un contrat sans décoder ses fichiers: le contenu de l'enregistrement
+    principal est recopié sans son accolade finale, suivi des sous-documents et d'export_info.
+    Le résultat est identique à l'export décodé (mêmes champs), sans travail JSON côté Python.
+
+    Possible uniquement si les fichiers sont en JSON et l'enregistrement à jour (voir
+    data_schema.py): sinon l'export doit passer par le décodage, qui met aussi le contrat à niveau.
+
+    Args:
+        files (dict): Fichiers ouverts par ContractStore.open_raw (fermés par cette fonction)
+
+    Returns:
+        tuple: (générateur du contenu, taille totale en octets), ou None si l'export doit être décodé
+    """
+    try:
+        record = files['record']
+        size = os.fstat(record.fileno()).st_size
+        tail_offset = max(0, size - 256)
+        record.seek(tail_offset)
+        match = _RECORD_TAIL.search(record.read())
+        if match is None or int(match.group(1)) != DATA_SCHEMA_VERSION:
+            raise ValueError("Enregistrement à mettre à niveau")
+        record_length = tail_offset + match.start(2)
+        record.seek(0)
+        if detect_codec(record.read(16)) != 'json':
+            raise ValueError("Enregistrement au format msgpack")
+        record.seek(0)
+
+        subdocuments = []
+        for name in SUBDOCUMENT_FIELDS:
+            f = files.get(name)
+            if f is None:
+                continue
+            # Un sous-document JSON est un objet ou une liste; tout autre début (msgpack) est refusé
+            if f.read(1) not in (b'[', b'{'):
+                raise ValueError("Sous-document illisible sans décodage")
+            f.seek(0)
+            subdocuments.append((f'"{name}":'.encode('utf-8'), f, os.fstat(f.fileno()).st_size))
+    except ValueError:
+        for f in files.values():
+            f.close()
+        return None
+
+    info = f',"export_info":{json.dumps(export_info(), ensure_ascii=False)}}}'.encode('utf-8')
+    total = record_length + sum(1 + len(key) + length for key, _, length in subdocuments) + len(info)
+
+    def generate():
+        try:
+            yield from _stream_file(record, record_length)
+            for key, f, length in subdocuments:
+                yield b',' + key
+                yield from _stream_file(f, length)
+            yield info
+        finally:
+            for f in files.values():
+                f.close()
+
+    return generate(), total
@@ -0,0 +1,269 @@
+"""
+Import en masse de contrats exportés par LexForge (voir contract_export.py).
+Les fichiers NDJSON, les archives zip et les exports d'un seul contrat (JSON) sont lus
+enregistrement par enregistrement, avec une taille maximale par enregistrement: l'import
+ne charge jamais le fichier entier en mémoire. Les contrats valides reçoivent un nouvel ID,
+sont rattachés à l'utilisateur qui importe et sont écrits par lots.
+"""
+import os
+import json
+import uuid
+import zipfile
+import argparse
+from datetime import datetime
+
+# Taille maximale d'un enregistrement (un contrat exporté avec ses éléments et commentaires)
+DEFAULT_MAX_RECORD_BYTES = 5 * 1024 * 1024
+
+# Nombre de contrats écrits par lot
+IMPORT_BATCH_SIZE = 100
+
+IMPORT_FORMATS = ('ndjson', 'zip', 'json')
+
+
+def detect_import_format(filename):
+    """
+    Détermine le format d'un fichier d'import d'après son extension.
+
+    Returns:
+        str: Format parmi IMPORT_FORMATS, ou None s'il n'est pas supporté
+    """
+    extension = os.path.splitext(filename or '')[1].lower().lstrip('.')
+    if extension == 'jsonl':
+        return 'ndjson'
+    return extension if extension in IMPORT_FORMATS else None
+
+
+def _parse_record(data):
+    try:
+        return json.loads(data), None
+    except ValueError:
+        return None, "JSON invalide"
+
+
+def _too_large(max_record_bytes):
+    return f"Enregistrement trop volumineux (plus de {max_record_bytes} octets)"
+
+
+def iter_ndjson_records(stream, max_record_bytes=DEFAULT_MAX_RECORD_BYTES):
+    """
+    Lit un flux NDJSON ligne par ligne.
+
+    Args:
+        stream: Flux binaire (fichier, upload ou corps de requête)
+        max_record_bytes (int, optional): Taille maximale d'une ligne
+
+    Yields:
+        tuple: (source "ligne N", document ou None, erreur ou None)
+    """
+    line_number = 0
+    while True:
+        line = stream.readline(max_record_bytes + 1)
+        if not line:
+            return
+        line_number += 1
+        source = f"ligne {line_number}"
+
+        if len(line) > max_record_bytes and not line.endswith(b'\n'):
+            # Ignorer la fin de la ligne sans la charger
+            while line and not line.endswith(b'\n'):
+                line = stream.readline(64 * 1024)
+            yield source, None, _too_large(max_record_bytes)
+            continue
+
+        if not line.strip():
+            continue
+        document, error = _parse_record(line)
+        yield source, document, error
+
+
+def iter_zip_records(fileobj, max_record_bytes=DEFAULT_MAX_RECORD_BYTES):
+    """
+    Lit les fichiers .json d'une archive zip (hors manifest.json), un par un.
+
+    Args:
+        fileobj: Fichier zip positionnable (les uploads volumineux sont stockés sur disque par Werkzeug)
+        max_record_bytes (int, optional): Taille décompressée maximale d'un fichier
+
+    Yields:
+        tuple: (nom du fichier dans l'archive, document ou None, erreur ou None)
+    """
+    with zipfile.ZipFile(fileobj) as archive:
+        for info in archive.infolist():
+            name = info.filename
+            if info.is_dir() or not name.endswith('.json') or os.path.basename(name) == 'manifest.json':
+                continue
+            if info.file_size > max_record_bytes:
+                yield name, None, _too_large(max_record_bytes)
+                continue
+            # La taille annoncée peut être fausse: ne jamais décompresser plus que la limite
+            with archive.open(info) as member:
+                data = member.read(max_record_bytes + 1)
+            if len(data) > max_record_bytes:
+                yield name, None, _too_large(max_record_bytes)
+                continue
+            document, error = _parse_record(data)
+            yield name, document, error
+
+
+def iter_json_record(stream, max_record_bytes=DEFAULT_MAX_RECORD_BYTES):
+    """
+    Lit l'export d'un seul contrat (GET /api/contracts/export/<id>).
+
+    Yields:
+        tuple: (source "fichier", document ou None, erreur ou None)
+    """
+    data = stream.read(max_record_bytes + 1)
+    if len(data) > max_record_bytes:
+        yield 'fichier', None, _too_large(max_record_bytes)
+        return
+    document, error = _parse_record(data)
+    yield 'fichier', document, error
+
+
+def iter_records(stream, import_format, max_record_bytes=DEFAULT_MAX_RECORD_BYTES):
+    """
+    Lit les enregistrements d'un fichier d'import selon son format (voir IMPORT_FORMATS).
+    """
+    if import_format == 'zip':
+        return iter_zip_records(stream, max_record_bytes)
+    if import_format == 'json':
+        return iter_json_record(stream, max_record_bytes)
+    return iter_ndjson_records(stream, max_record_bytes)
+
+
+def validate_record(document):
+    """
+    Vérifie qu'un enregistrement est un contrat LexForge.
+
+    Returns:
+        str: Message d'erreur, ou None si le contrat est valide
+    """
+    if not isinstance(document, dict):
+        return "L'enregistrement n'est pas un objet JSON"
+    missing = [field for field in ('id', 'data', 'title') if field not in document]
+    if missing:
+        return f"Format de contrat invalide (champs manquants: {', '.join(missing)})"
+    if not isinstance(document['data'], dict):
+        return "Format de contrat invalide (data doit être un objet)"
+    return None
+
+
+def prepare_imported_contract(document, user_id):
+    """
+    Prépare un contrat importé: nouvel ID (pour éviter les doublons), nouvelles dates et
+    rattachement à l'utilisateur qui importe.
+
+    Returns:
+        dict: Le contrat à enregistrer
+    """
+    now = datetime.now().isoformat()
+    document['id'] = str(uuid.uuid4())
+    document['created_at'] = now
+    document['updated_at'] = now
+    document['user_id'] = user_id
+    return document
+
+
+def import_records(contract_store, records, user_id, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Importe des enregistrements dans le stockage des contrats, par lots.
+
+    Args:
+        contract_store (ContractStore): Stockage des contrats
+        records (iterable): Enregistrements (source, document, erreur) produits par iter_records
+        user_id (str): ID de l'utilisateur qui importe
+        batch_size (int, optional): Nombre de contrats écrits par lot
+
+    Returns:
+        dict: Nombre de contrats importés, ignorés et en erreur, et résultat de chaque enregistrement
+    """
+    report = {'imported': 0, 'skipped': 0, 'errors': 0, 'results': []}
+    batch = []
+    batch_results = []
+
+    def flush():
+        try:
+            contract_store.save_many(batch, touch=True)
+            for result in batch_results:
+                result['status'] = 'imported'
+            report['imported'] += len(batch)
+        except Exception as e:
+            # Avec le stockage JSON, les contrats du lot qui précèdent l'erreur sont enregistrés
+            # (voir ContractStore.save_many); les IDs sont neufs, leur existence suffit à le savoir
+            for result in batch_results:
+                if contract_store.exists(result['id']):
+                    result['status'] = 'imported'
+                    report['imported'] += 1
+                else:
+                    result['status'] = 'error'
+                    result['error'] = f"Erreur d'écriture: {e}"
+                    report['errors'] += 1
+        del batch[:]
+        del batch_results[:]
+
+    for source, document, error in records:
+        # Dernière ligne d'un export NDJSON
+        if error is None and isinstance(document, dict) and 'export_summary' in document:
+            report['skipped'] += 1
+            report['results'].append({'source': source, 'status': 'skipped'})
+            continue
+
+        if error is None:
+            error = validate_record(document)
+        if error is not None:
+            report['errors'] += 1
+            report['results'].append({'source': source, 'status': 'error', 'error': error})
+            continue
+
+        original_id = document['id']
+        contract = prepare_imported_contract(document, user_id)
+        result = {
+            'source': source,
+            'status': 'pending',
+            'id': contract['id'],
+            'original_id': original_id,
+            'title': contract.get('title', 'Imported Contract')
+        }
+        report['results'].append(result)
+        batch.append(contract)
+        batch_results.append(result)
+
+        if len(batch) >= batch_size:
+            flush()
+
+    if batch:
+        flush()
+
+    return report
+
+
+if __name__ == "__main__":
+    from contract_store import create_contract_store
+
+    DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+    parser = argparse.ArgumentParser(description="Import en masse de contrats exportés par LexForge")
+    parser.add_argument('path', help="Fichier .ndjson, .zip ou .json")
+    parser.add_argument('--user-id', required=True, help="Utilisateur auquel rattacher les contrats importés")
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+    parser.add_argument('--max-record-bytes', type=int, default=DEFAULT_MAX_RECORD_BYTES)
+
+    args = parser.parse_args()
+
+    import_format = detect_import_format(args.path)
+    if import_format is None:
+        parser.error(f"Format non supporté: {args.path} (attendu: .ndjson, .zip ou .json)")
+
+    # Même backend de stockage que l'API (LEXFORGE_CONTRACT_STORE)
+    store = create_contract_store(os.path.join(args.data_dir, 'contracts'),
+                                  os.path.join(args.data_dir, 'contracts.sqlite3'))
+    with open(args.path, 'rb') as f:
+        report = import_records(store, iter_records(f, import_format, args.max_record_bytes),
+                                args.user_id, batch_size=args.batch_size)
+
+    for result in report['results']:
+        if result['status'] == 'error':
+            print(f"  {result['source']}: {result['error']}")
+    print(f"{report['imported']} contrats importés, {report['errors']} erreurs, {report['skipped']} ignorés")
@@ -0,0 +1,1276 @@
+"""
+Module de stockage des contrats.
+Fournit une interface commune pour les différents backends de stockage (fichiers JSON ou SQLite)
+utilisés par les endpoints /api/contracts.
+"""
+import os
+import copy
+import json
+import base64
+import sqlite3
+import argparse
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+from utils import get_base_user_id
+from owner_index import OwnerIndex
+from document_cache import DocumentCache
+from atomic_writer import CoalescingWriter, KeyedLock, try_process_lock
+from storage_codec import read_document, write_document
+from data_schema import needs_upgrade, normalize_contract
+import data_layout
+
+# Champs renvoyés par GET /api/contracts en mode résumé (sans data, elements ni comments)
+SUMMARY_FIELDS = ('id', 'title', 'is_draft', 'from_step6', 'user_id', 'created_at', 'updated_at', 'type_contrat')
+
+# Champs autorisés pour le tri des listes de contrats
+SORT_FIELDS = ('created_at', 'updated_at', 'title')
+
+# Sous-documents volumineux stockés à part et chargés uniquement par les endpoints qui en ont besoin
+SUBDOCUMENT_FIELDS = ('elements', 'comments')
+
+# Durée de conservation par défaut des tombstones des contrats supprimés (voir list_changes)
+TOMBSTONE_RETENTION_DAYS = 30
+
+
+class VersionConflict(Exception):
+    """
+    Le contrat a été modifié depuis sa lecture: sa version enregistrée n'est pas celle attendue.
+    """
+
+    def __init__(self, contract_id, version):
+        super().__init__(f"Le contrat {contract_id} a été modifié (version actuelle: {version})")
+        self.contract_id = contract_id
+        self.version = version
+
+
+def contract_summary(contract):
+    """
+    Construit le résumé d'un contrat utilisé pour les listes (tableau de bord).
+
+    Args:
+        contract (dict): Contrat complet
+
+    Returns:
+        dict: Résumé du contrat (voir SUMMARY_FIELDS)
+    """
+    return {
+        'id': contract.get('id'),
+        'title': contract.get('title', ''),
+        'is_draft': contract.get('is_draft', False),
+        'from_step6': contract.get('from_step6', False),
+        'user_id': contract.get('user_id', ''),
+        'created_at': contract.get('created_at', ''),
+        'updated_at': contract.get('updated_at', ''),
+        'type_contrat': (contract.get('data') or {}).get('type_contrat', [])
+    }
+
+
+def split_subdocuments(contract):
+    """
+    Sépare un contrat en enregistrement principal et sous-documents (voir SUBDOCUMENT_FIELDS).
+
+    Args:
+        contract (dict): Contrat, avec ou sans sous-documents
+
+    Returns:
+        tuple: (enregistrement principal, {nom: sous-document} pour les sous-documents présents)
+    """
+    record = {key: value for key, value in contract.items() if key not in SUBDOCUMENT_FIELDS}
+    subdocuments = {name: contract[name] for name in SUBDOCUMENT_FIELDS if name in contract}
+    return record, subdocuments
+
+
+def project_contract(contract, fields):
+    """
+    Ne conserve que les champs demandés d'un contrat ou d'un résumé.
+    Les champs du résumé (ex: type_contrat) sont dérivés du contrat complet si nécessaire.
+
+    Args:
+        contract (dict): Contrat complet ou résumé
+        fields (list): Champs à conserver
+
+    Returns:
+        dict: Contrat projeté
+    """
+    summary = None
+    projected = {}
+    for field in fields:
+        if field in contract:
+            projected[field] = contract[field]
+        else:
+            if summary is None:
+                summary = contract_summary(contract)
+            projected[field] = summary.get(field)
+    return projected
+
+
+def encode_cursor(sort_value, contract_id):
+    """
+    Encode la position du dernier contrat d'une page en curseur opaque.
+    """
+    raw = json.dumps([sort_value, contract_id], ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """
+    Décode un curseur produit par encode_cursor.
+
+    Raises:
+        ValueError: Si le curseur est invalide
+    """
+    try:
+        sort_value, contract_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except Exception:
+        raise ValueError("Curseur invalide")
+    return str(sort_value), str(contract_id)
+
+
+def paginate_contracts(contracts, sort_by='created_at', descending=True, limit=None, cursor=None):
+    """
+    Trie et découpe une liste de contrats (ou de résumés) par curseur.
+
+    Args:
+        contracts (list): Contrats ou résumés
+        sort_by (str): Champ de tri (voir SORT_FIELDS)
+        descending (bool): Tri décroissant
+        limit (int, optional): Taille de la page, None pour tout renvoyer
+        cursor (str, optional): Curseur renvoyé par la page précédente
+
+    Returns:
+        tuple: (contrats de la page, curseur de la page suivante ou None)
+    """
+    if sort_by not in SORT_FIELDS:
+        raise ValueError(f"Champ de tri non supporté: {sort_by}")
+
+    def sort_key(contract):
+        return (str(contract.get(sort_by) or ''), str(contract.get('id') or ''))
+
+    items = sorted(contracts, key=sort_key, reverse=descending)
+
+    if cursor:
+        position = decode_cursor(cursor)
+        if descending:
+            items = [item for item in items if sort_key(item) < position]
+        else:
+            items = [item for item in items if sort_key(item) > position]
+
+    if limit is None or len(items) <= limit:
+        return items, None
+
+    page = items[:limit]
+    return page, encode_cursor(*sort_key(page[-1]))
+
+
+def paginate_changes(summaries, tombstones, limit=None, cursor=None):
+    """
+    Sélectionne les changements postérieurs à un curseur, par date croissante: contrats créés ou
+    modifiés (date updated_at) et contrats supprimés (date deleted_at des tombstones).
+
+    Args:
+        summaries (list): Résumés des contrats de l'utilisateur
+        tombstones (list): Tombstones de l'utilisateur ({'id', 'user_id', 'deleted_at'})
+        limit (int, optional): Nombre maximal de changements, None pour tout renvoyer
+        cursor (str, optional): Curseur next_since d'une synchronisation précédente
+
+    Returns:
+        tuple: (résumés modifiés, tombstones, curseur après le dernier changement, True s'il en reste)
+    """
+    changes = [((str(summary.get('updated_at') or ''), str(summary.get('id') or '')), False, summary)
+               for summary in summaries]
+    changes += [((tombstone['deleted_at'], tombstone['id']), True, tombstone) for tombstone in tombstones]
+    changes.sort(key=lambda change: change[0])
+
+    if cursor:
+        position = decode_cursor(cursor)
+        changes = [change for change in changes if change[0] > position]
+
+    has_more = limit is not None and len(changes) > limit
+    if has_more:
+        changes = changes[:limit]
+
+    next_cursor = encode_cursor(*changes[-1][0]) if changes else cursor
+    contracts = [entry for _, deleted, entry in changes if not deleted]
+    deleted = [entry for _, is_deleted, entry in changes if is_deleted]
+    return contracts, deleted, next_cursor, has_more
+
+
+class ContractStore(ABC):
+    """
+    Interface commune des backends de stockage des contrats.
+    Un backend qui n'implémente pas toutes les méthodes abstraites ne peut pas être instancié.
+    """
+
+    @abstractmethod
+    def get(self, contract_id):
+        """
+        Récupère l'enregistrement principal d'un contrat (sans les sous-documents).
+
+        Args:
+            contract_id (str): ID du contrat
+
+        Returns:
+            dict: Le contrat, ou None s'il n'existe pas
+        """
+
+    @abstractmethod
+    def get_subdocument(self, contract_id, name):
+        """
+        Récupère un sous-document d'un contrat (voir SUBDOCUMENT_FIELDS).
+
+        Returns:
+            Le sous-document, ou None s'il n'a jamais été enregistré
+        """
+
+    def get_full(self, contract_id):
+        """
+        Récupère un contrat avec tous ses sous-documents (export).
+        """
+        contract = self.get(contract_id)
+        if contract is None:
+            return None
+        for name in SUBDOCUMENT_FIELDS:
+            value = self.get_subdocument(contract_id, name)
+            if value is not None:
+                contract[name] = value
+        return contract
+
+    @abstractmethod
+    def exists(self, contract_id):
+        """
+        Indique si un contrat existe.
+        """
+
+    def open_raw(self, contract_id):
+        """
+        Ouvre les fichiers d'un contrat tels qu'ils sont stockés, pour un export sans décodage
+        (voir contract_export.py).
+
+        Returns:
+            dict: {'record' ou nom du sous-document: fichier ouvert en binaire}, ou None si le
+                backend ne stocke pas les contrats dans des fichiers
+        """
+        return None
+
+    @abstractmethod
+    def get_owner(self, contract_id):
+        """
+        Retourne le user_id du propriétaire d'un contrat sans charger le document complet.
+
+        Returns:
+            str: Le user_id du propriétaire, ou None si le contrat n'existe pas
+        """
+
+    def lock(self, contract_id):
+        """
+        Verrouille un contrat pendant une lecture-modification-écriture (bloc with), entre les
+        threads du worker et entre les workers qui partagent le répertoire de données.
+        """
+        return self.locks.hold(contract_id)
+
+    @abstractmethod
+    def save(self, contract, expected_version=None, touch=False):
+        """
+        Crée ou remplace un contrat (identifié par contract['id']).
+        Les données sont enregistrées normalisées (voir data_schema.py).
+        Les sous-documents présents dans le contrat sont enregistrés à part; ceux qui en sont
+        absents ne sont pas modifiés.
+        Chaque écriture incrémente la version du contrat (champ version, 0 pour un contrat
+        enregistré avant son ajout); la version éventuellement présente dans contract est ignorée.
+        L'ID doit pouvoir servir de nom de fichier (UUID ou [A-Za-z0-9_-]+, voir data_layout.check_id).
+
+        Args:
+            contract (dict): Contrat à enregistrer
+            expected_version (int, optional): Version lue avant la modification; l'écriture est
+                refusée si le contrat a été modifié depuis
+            touch (bool, optional): Dater la modification (updated_at, aussi reporté dans contract) au
+                moment de l'écriture, sous les verrous du stockage: l'ordre des dates est alors celui
+                dans lequel les écritures deviennent visibles, ce dont dépend le curseur de list_changes
+
+        Returns:
+            int: Nouvelle version du contrat
+
+        Raises:
+            VersionConflict: Si la version enregistrée n'est pas expected_version
+            InvalidId: Si l'ID du contrat n'est pas valide
+        """
+
+    def save_many(self, contracts, touch=False):
+        """
+        Crée ou remplace plusieurs contrats (touch: voir save).
+        Par défaut (stockage JSON), les contrats sont enregistrés un par un avec save(): rien n'est
+        regroupé (chaque contrat a ses propres écritures de fichiers et d'index) et l'opération n'est
+        pas atomique, les contrats qui précèdent une erreur restent enregistrés. Seul le stockage
+        SQLite écrit le lot dans une seule transaction.
+        """
+        for contract in contracts:
+            self.save(contract, touch=touch)
+
+    @abstractmethod
+    def delete(self, contract_id):
+        """
+        Supprime un contrat.
+
+        Returns:
+            bool: True si le contrat existait
+        """
+
+    @abstractmethod
+    def list_for_owner(self, user_id):
+        """
+        Liste les contrats accessibles par un utilisateur (correspondance sur l'ID de base),
+        du plus récent au plus ancien.
+        """
+
+    @abstractmethod
+    def list_for_exact_owner(self, user_id):
+        """
+        Liste les contrats dont le user_id est exactement celui fourni.
+        """
+
+    def contract_ids_for_exact_owner(self, user_id):
+        """
+        Liste les IDs des contrats dont le user_id est exactement celui fourni, sans les charger.
+        La liste peut contenir des IDs en trop: le propriétaire doit être revérifié au chargement.
+        """
+        return [contract['id'] for contract in self.list_for_exact_owner(user_id)]
+
+    def owner_ids(self, prefix=''):
+        """
+        Liste les user_id des propriétaires de contrats commençant par un préfixe (ex: "anon_").
+        La liste peut contenir des IDs en trop (ID de base des utilisateurs authentifiés, propriétaires
+        sans contrat): les contrats doivent être revérifiés au chargement.
+        """
+        return sorted({
+            contract.get('user_id', '') or '' for contract in self.iter_contracts(full=False)
+            if (contract.get('user_id', '') or '').startswith(prefix)
+        })
+
+    def storage_footprint(self, contract_id):
+        """
+        Retourne la place occupée par un contrat et ses sous-documents.
+
+        Returns:
+            tuple: (nombre de fichiers, nombre d'octets)
+        """
+        return 0, 0
+
+    def list_summaries(self, user_id):
+        """
+        Liste les résumés des contrats accessibles par un utilisateur (ordre non garanti).
+        """
+        return [contract_summary(contract) for contract in self.list_for_owner(user_id)]
+
+    def list_page(self, user_id, sort_by='created_at', descending=True, limit=None, cursor=None, full=False):
+        """
+        Liste une page des contrats accessibles par un utilisateur.
+
+        Args:
+            user_id (str): ID de l'utilisateur
+            sort_by (str): Champ de tri (voir SORT_FIELDS)
+            descending (bool): Tri décroissant
+            limit (int, optional): Taille de la page, None pour tout renvoyer
+            cursor (str, optional): Curseur renvoyé par la page précédente
+            full (bool): True pour renvoyer les contrats complets plutôt que les résumés
+
+        Returns:
+            tuple: (contrats de la page, curseur de la page suivante ou None)
+        """
+        contracts = self.list_for_owner(user_id) if full else self.list_summaries(user_id)
+        return paginate_contracts(contracts, sort_by, descending, limit, cursor)
+
+    def list_tombstones(self, user_id):
+        """
+        Liste les contrats supprimés, ou passés à un propriétaire d'un autre ID de base, que
+        l'utilisateur voyait (correspondance sur l'ID de base).
+
+        Returns:
+            list: Entrées {'id', 'user_id', 'deleted_at'}
+        """
+        return []
+
+    def list_changes(self, user_id, cursor=None, limit=None):
+        """
+        Liste les changements des contrats d'un utilisateur depuis une synchronisation précédente
+        (voir paginate_changes). Sans curseur, tous les contrats sont renvoyés, sans tombstones.
+        """
+        tombstones = self.list_tombstones(user_id) if cursor else []
+        return paginate_changes(self.list_summaries(user_id), tombstones, limit, cursor)
+
+    def purge_tombstones(self, before):
+        """
+        Supprime les tombstones antérieures à une date (ISO).
+
+        Returns:
+            int: Nombre de tombstones supprimées
+        """
+        return 0
+
+    @abstractmethod
+    def iter_contracts(self, full=True):
+        """
+        Itère sur tous les contrats stockés.
+
+        Args:
+            full (bool): True pour inclure les sous-documents
+        """
+
+    def stats(self):
+        """
+        Retourne les métriques du backend de stockage.
+        """
+        return {'backend': type(self).__name__}
+
+
+class JsonContractStore(ContractStore):
+    """
+    Stockage historique: un fichier {contract_id}.json par contrat, réparti dans les
+    sous-répertoires de CONTRACTS_DIR (voir data_layout.py).
+    Un index des propriétaires (voir owner_index.py) est tenu à jour à chaque écriture,
+    et les contrats lus sont conservés dans un cache LRU validé par mtime.
+    Les écritures sont atomiques et peuvent être regroupées dans une fenêtre de temps, à condition
+    qu'un seul processus écrive dans le répertoire (vérifié à la première écriture).
+    Les sous-documents sont stockés dans des fichiers {contract_id}.{nom} à côté du contrat.
+    Les contrats enregistrés avant la normalisation à l'écriture sont réécrits à leur première lecture.
+    """
+
+    def __init__(self, contracts_dir, index_dir=None, cache_size=256, write_window=0.0):
+        self.contracts_dir = contracts_dir
+        os.makedirs(self.contracts_dir, exist_ok=True)
+        if index_dir is None:
+            index_dir = os.path.join(os.path.dirname(os.path.abspath(contracts_dir)), 'owner_index')
+        self.owner_index = OwnerIndex(index_dir)
+        self.locks = KeyedLock(os.path.join(os.path.dirname(os.path.abspath(contracts_dir)), 'locks'))
+        # Par ID de base des propriétaires: datation et indexation des écritures, lecture des changements
+        # (voir list_changes). Fichiers à part: un même fichier verrouillé deux fois par le processus
+        # (verrou du contrat puis de son propriétaire) l'interbloquerait
+        self.change_locks = KeyedLock(os.path.join(os.path.dirname(os.path.abspath(contracts_dir)), 'locks', 'changes'))
+        self.cache = DocumentCache(cache_size)
+        self.writer = CoalescingWriter(self._write_file, write_window, on_written=self.cache.put,
+                                       lock_fn=self._lock_for_path, is_current=self._is_current_write)
+        self._writers_lock = None
+        self._writers_lock_guard = threading.Lock()
+
+    def path_for(self, contract_id):
+        """
+        Retourne l'emplacement où le contrat est écrit.
+
+        Raises:
+            InvalidId: Si l'ID ne peut pas servir de nom de fichier (voir data_layout.check_id)
+        """
+        return data_layout.shard_path(self.contracts_dir, f"{data_layout.check_id(contract_id)}.json")
+
+    def _read_path(self, contract_id):
+        # Les contrats pas encore migrés sont lus à leur ancien emplacement à plat
+        return data_layout.resolve_path(self.contracts_dir, f"{data_layout.check_id(contract_id)}.json")
+
+    def _subdocument_path(self, contract_id, name):
+        # Même sous-répertoire que le contrat; l'extension n'est pas .json pour ne pas être
+        # confondu avec un contrat lors des parcours
+        return os.path.join(os.path.dirname(self.path_for(contract_id)), f"{contract_id}.{name}")
+
+    @staticmethod
+    def _load(file_path):
+        return read_document(file_path)
+
+    def _write_file(self, file_path, document):
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        stat = write_document(file_path, document)
+        filename = os.path.basename(file_path)
+        if filename.endswith('.json'):
+            # Contrat réécrit à son emplacement réparti: supprimer l'ancienne copie à plat
+            data_layout.remove_legacy(self.contracts_dir, filename)
+        return stat
+
+    def _read_subdocument_file(self, contract_id, name):
+        path = self._subdocument_path(contract_id, name)
+        pending = self.writer.pending(path)
+        if pending is not None:
+            return True, copy.deepcopy(pending)
+        try:
+            return True, self.cache.get(path, self._load)
+        except FileNotFoundError:
+            return False, None
+
+    def _has_subdocument_file(self, contract_id, name):
+        path = self._subdocument_path(contract_id, name)
+        return self.writer.pending(path) is not None or os.path.exists(path)
+
+    def get(self, contract_id):
+        record = self._get_record(contract_id)
+        if record is not None:
+            # Contrats enregistrés avant la séparation: sous-documents encore intégrés
+            for name in SUBDOCUMENT_FIELDS:
+                record.pop(name, None)
+        return record
+
+    def get_subdocument(self, contract_id, name):
+        found, value = self._read_subdocument_file(contract_id, name)
+        if found:
+            return value
+        # Contrat enregistré avant la séparation des sous-documents
+        record = self._get_record(contract_id)
+        return record.get(name) if record is not None else None
+
+    def _get_record(self, contract_id):
+        # Une version en attente d'écriture est plus récente que le fichier
+        pending = self.writer.pending(self.path_for(contract_id))
+        if pending is not None:
+            return copy.deepcopy(pending)
+
+        # Deux tentatives: une migration peut déplacer le fichier entre la résolution et la lecture
+        for _ in range(2):
+            path = self._read_path(contract_id)
+            try:
+                record = self.cache.get(path, self._load)
+            except FileNotFoundError:
+                continue
+            if needs_upgrade(record):
+                record = self._upgrade(contract_id, path, record)
+            return record
+        return None
+
+    def _upgrade(self, contract_id, path, record):
+        # Contrat enregistré avant la normalisation à l'écriture: le réécrire normalisé une fois,
+        # sauf s'il a été modifié depuis sa lecture (l'écriture concurrente est plus récente)
+        upgraded = normalize_contract(record)
+        try:
+            unchanged = self._load(path) == record
+        except FileNotFoundError:
+            unchanged = False
+        if unchanged and self.writer.pending(self.path_for(contract_id)) is None:
+            # Ni le propriétaire ni le résumé ne changent: l'index n'est pas mis à jour
+            self._write_record(contract_id, *split_subdocuments(upgraded))
+        return upgraded
+
+    def exists(self, contract_id):
+        return (self.writer.pending(self.path_for(contract_id)) is not None
+                or os.path.exists(self._read_path(contract_id)))
+
+    def open_raw(self, contract_id):
+        paths = {'record': self.path_for(contract_id)}
+        paths.update((name, self._subdocument_path(contract_id, name)) for name in SUBDOCUMENT_FIELDS)
+        if any(self.writer.pending(path) is not None for path in paths.values()):
+            # Les fichiers ne contiennent pas encore la dernière version
+            return None
+        paths['record'] = self._read_path(contract_id)
+
+        # Les fichiers sont ouverts ensemble: un remplacement ultérieur (renommage) ne les modifie pas
+        files = {}
+        try:
+            for name, path in paths.items():
+                try:
+                    files[name] = open(path, 'rb')
+                except FileNotFoundError:
+                    if name == 'record':
+                        raise
+        except FileNotFoundError:
+            for f in files.values():
+                f.close()
+            return None
+        return files
+
+    def get_owner(self, contract_id):
+        if not self.exists(contract_id):
+            return None
+
+        user_id = self.owner_index.get_owner(contract_id)
+        if user_id is None:
+            # Contrat antérieur à l'index: l'indexer à la première consultation
+            contract = self._get_record(contract_id)
+            if contract is None:
+                return None
+            user_id = contract.get('user_id', '') or ''
+            self.owner_index.add(contract_id, user_id, contract_summary(contract))
+        return user_id
+
+    def save(self, contract, expected_version=None, touch=False):
+        contract_id = contract['id']
+        caller_contract = contract
+        if self.writer.window_seconds > 0:
+            # L'écriture est différée: l'appelant doit pouvoir continuer à modifier son document
+            contract = copy.deepcopy(contract)
+        record, subdocuments = split_subdocuments(contract)
+
+        # La version lue et la version écrite doivent encadrer une seule écriture, tous workers confondus
+        with self.lock(contract_id):
+            previous = self._get_record(contract_id) or {}
+            version = previous.get('version', 0)
+            if expected_version is not None and expected_version != version:
+                raise VersionConflict(contract_id, version)
+            record['version'] = version + 1
+
+            # Extraire les sous-documents encore intégrés à l'ancienne version du contrat,
+            # pour qu'ils ne soient pas perdus à la réécriture de l'enregistrement principal
+            for name in SUBDOCUMENT_FIELDS:
+                if name in subdocuments or self._has_subdocument_file(contract_id, name):
+                    continue
+                if name in previous:
+                    subdocuments[name] = previous[name]
+
+            # Dates de modification (et de suppression chez l'ancien propriétaire) attribuées et
+            # rendues visibles dans l'index dans le même ordre (voir list_changes)
+            owners = {get_base_user_id(record.get('user_id', '') or '')}
+            if previous:
+                owners.add(get_base_user_id(previous.get('user_id', '') or ''))
+            with self.change_locks.hold_all(owners):
+                if touch:
+                    record['updated_at'] = caller_contract['updated_at'] = datetime.now().isoformat()
+                record = normalize_contract(record)
+                self._write_record(contract_id, record, subdocuments)
+                self.owner_index.add(contract_id, record.get('user_id', ''), contract_summary(record))
+        return record['version']
+
+    def _lock_for_path(self, file_path):
+        # Verrou du contrat auquel appartient un fichier ({id}.json ou {id}.{sous-document})
+        return self.lock(os.path.basename(file_path).split('.', 1)[0])
+
+    def _is_current_write(self, file_path, document):
+        # Avant une écriture différée de l'enregistrement principal, sous le verrou du contrat:
+        # ne pas écraser une version plus récente écrite hors de ce processus
+        if not file_path.endswith('.json'):
+            return True
+        contract_id = os.path.basename(file_path)[:-len('.json')]
+        try:
+            on_disk = self._load(self._read_path(contract_id))
+        except FileNotFoundError:
+            return True
+        return on_disk.get('version', 0) < document.get('version', 0)
+
+    def _claim_writes(self):
+        # Les écritures différées ne sont visibles que de ce processus: un autre processus lirait le
+        # fichier et sa version périmés, et son save(expected_version) serait accepté à tort. Un processus
+        # qui regroupe les écritures doit donc être le seul à écrire dans le répertoire de données.
+        # Le verrou est pris à la première écriture (pas à l'import: le processus de rechargement
+        # de Flask en mode debug n'écrit jamais) et conservé jusqu'à la fin du processus.
+        if self._writers_lock is not None or self.locks.lock_dir is None:
+            return
+        with self._writers_lock_guard:
+            if self._writers_lock is not None:
+                return
+            coalescing = self.writer.window_seconds > 0
+            f = try_process_lock(os.path.join(self.locks.lock_dir, data_layout.WRITERS_LOCK_FILENAME),
+                                 exclusive=coalescing)
+            if f is None:
+                raise RuntimeError(
+                    "Un autre processus écrit dans le répertoire des contrats alors que le regroupement des "
+                    "écritures (LEXFORGE_WRITE_COALESCE_MS) est actif: il n'est possible qu'avec un seul worker, "
+                    "et sans outil de maintenance en cours d'exécution"
+                )
+            self._writers_lock = f
+
+    def _write_record(self, contract_id, record, subdocuments):
+        self._claim_writes()
+        # Sous-documents d'abord: l'enregistrement principal ne doit jamais précéder ses données
+        for name, value in subdocuments.items():
+            self.writer.write(self._subdocument_path(contract_id, name), value)
+        self.writer.write(self.path_for(contract_id), record)
+
+    def delete(self, contract_id):
+        self._claim_writes()
+        # Date de suppression attribuée sous le verrou des changements du propriétaire (voir save)
+        with self.lock(data_layout.check_id(contract_id)):
+            owner = self.owner_index.get_owner(contract_id)
+            with self.change_locks.hold(get_base_user_id(owner or '')):
+                return self._delete(contract_id)
+
+    def _delete(self, contract_id):
+        filename = f"{contract_id}.json"
+        was_pending = self.writer.discard(self.path_for(contract_id))
+        if not data_layout.remove_file(self.contracts_dir, filename) and not was_pending:
+            return False
+        self.cache.invalidate(data_layout.shard_path(self.contracts_dir, filename))
+        self.cache.invalidate(data_layout.legacy_path(self.contracts_dir, filename))
+
+        for name in SUBDOCUMENT_FIELDS:
+            path = self._subdocument_path(contract_id, name)
+            self.writer.discard(path)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self.cache.invalidate(path)
+
+        self.owner_index.remove(contract_id)
+        return True
+
+    def stats(self):
+        return {
+            'backend': type(self).__name__,
+            'document_cache': self.cache.stats(),
+            'writes': self.writer.stats()
+        }
+
+    def rebuild_index(self):
+        """
+        Reconstruit l'index des propriétaires à partir des fichiers de contrats.
+
+        Returns:
+            int: Nombre de contrats indexés
+        """
+        entries = (
+            (contract.get('user_id', ''), contract_summary(contract))
+            for contract in self.iter_contracts(full=False)
+        )
+        return self.owner_index.rebuild(entries, contract_exists=self.exists)
+
+    def _indexed_ids(self, owner_key):
+        if not self.owner_index.is_complete():
+            print("Index des propriétaires absent: reconstruction à partir des contrats existants")
+            self.rebuild_index()
+        return self.owner_index.contract_ids(owner_key)
+
+    def _indexed_contracts(self, owner_key):
+        for contract_id in self._indexed_ids(owner_key):
+            try:
+                contract = self.get(contract_id)
+            except Exception as e:
+                print(f"Erreur lors de la lecture du contrat {contract_id}: {e}")
+                continue
+            if contract is not None:
+                yield contract
+
+    def iter_contracts(self, full=True):
+        for filename, contract_path in data_layout.iter_files(self.contracts_dir):
+            try:
+                contract = read_document(contract_path)
+                if needs_upgrade(contract):
+                    contract = normalize_contract(contract)
+                contract_id = contract.get('id') or filename[:-len('.json')]
+                for name in SUBDOCUMENT_FIELDS:
+                    if not full:
+                        contract.pop(name, None)
+                        continue
+                    found, value = self._read_subdocument_file(contract_id, name)
+                    if found:
+                        contract[name] = value
+            except Exception as e:
+                print(f"Erreur lors de la lecture du contrat {filename}: {e}")
+                continue
+            yield contract
+
+    def list_for_owner(self, user_id):
+        base_user_id = get_base_user_id(user_id)
+        # L'index peut contenir des entrées en trop après une interruption: revérifier le propriétaire
+        contracts = [
+            contract for contract in self._indexed_contracts(base_user_id)
+            if get_base_user_id(contract.get('user_id', '')) == base_user_id
+        ]
+        contracts.sort(key=lambda x: x.get('created_at', ''), reverse=True)
+        return contracts
+
+    def list_for_exact_owner(self, user_id):
+        return [
+            contract for contract in self._indexed_contracts(user_id)
+            if contract.get('user_id') == user_id
+        ]
+
+    def contract_ids_for_exact_owner(self, user_id):
+        return self._indexed_ids(user_id)
+
+    def owner_ids(self, prefix=''):
+        if not self.owner_index.is_complete():
+            self.rebuild_index()
+        return sorted(self.owner_index.owner_ids(prefix))
+
+    def storage_footprint(self, contract_id):
+        files, size = 0, 0
+        paths = [self._read_path(contract_id)]
+        paths += [self._subdocument_path(contract_id, name) for name in SUBDOCUMENT_FIELDS]
+        for path in paths:
+            try:
+                size += os.path.getsize(path)
+                files += 1
+            except FileNotFoundError:
+                pass
+        return files, size
+
+    def list_summaries(self, user_id):
+        # Les résumés sont lus dans l'index: aucun fichier de contrat n'est ouvert
+        base_user_id = get_base_user_id(user_id)
+        summaries = []
+        for contract_id in self._indexed_ids(base_user_id):
+            if not self.exists(contract_id):
+                continue
+            entry = self.owner_index.get_entry(contract_id)
+            summary = entry.get('summary') if entry else None
+            if summary is None:
+                # Entrée indexée avant l'ajout des résumés: la compléter une fois
+                contract = self.get(contract_id)
+                if contract is None:
+                    continue
+                summary = contract_summary(contract)
+                self.owner_index.add(contract_id, contract.get('user_id', ''), summary)
+            if get_base_user_id(summary.get('user_id', '')) == base_user_id:
+                summaries.append(summary)
+        return summaries
+
+    def list_tombstones(self, user_id):
+        # Un contrat revenu à l'utilisateur ne doit pas être signalé comme supprimé
+        return [
+            tombstone for tombstone in self.owner_index.tombstones(get_base_user_id(user_id))
+            if not self.exists(tombstone['id'])
+            or get_base_user_id(self.get_owner(tombstone['id']) or '') != get_base_user_id(user_id)
+        ]
+
+    def list_changes(self, user_id, cursor=None, limit=None):
+        # Une lecture sans verrou pourrait manquer un contrat modifié pendant le parcours de l'index
+        # alors qu'un contrat modifié après lui est renvoyé: le curseur passerait au-delà du premier
+        with self.change_locks.hold(get_base_user_id(user_id)):
+            return super().list_changes(user_id, cursor=cursor, limit=limit)
+
+    def purge_tombstones(self, before):
+        return self.owner_index.purge_tombstones(before)
+
+
+class SqliteContractStore(ContractStore):
+    """
+    Stockage SQLite (mode WAL) avec index sur le propriétaire, updated_at et is_draft.
+    Le document principal est conservé en JSON, les colonnes indexées et le résumé utilisé
+    par les listes en sont extraits à l'écriture. Les sous-documents sont stockés dans la
+    table contract_subdocuments, les tombstones des contrats supprimés dans contract_tombstones.
+    Les contrats enregistrés avant la normalisation à l'écriture sont réécrits à leur première lecture.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS contracts (
+            id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL DEFAULT '',
+            owner_base TEXT NOT NULL DEFAULT '',
+            title TEXT,
+            is_draft INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT NOT NULL DEFAULT '',
+            updated_at TEXT NOT NULL DEFAULT '',
+            document TEXT NOT NULL,
+            summary TEXT,
+            version INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_contracts_owner_base ON contracts (owner_base, created_at);
+        CREATE INDEX IF NOT EXISTS idx_contracts_owner_updated_at ON contracts (owner_base, updated_at);
+        CREATE INDEX IF NOT EXISTS idx_contracts_user_id ON contracts (user_id);
+        CREATE INDEX IF NOT EXISTS idx_contracts_updated_at ON contracts (updated_at);
+        CREATE INDEX IF NOT EXISTS idx_contracts_is_draft ON contracts (owner_base, is_draft);
+        CREATE TABLE IF NOT EXISTS contract_subdocuments (
+            contract_id TEXT NOT NULL,
+            name TEXT NOT NULL,
+            document TEXT NOT NULL,
+            PRIMARY KEY (contract_id, name)
+        );
+        CREATE TABLE IF NOT EXISTS contract_tombstones (
+            owner_base TEXT NOT NULL,
+            id TEXT NOT NULL,
+            user_id TEXT NOT NULL DEFAULT '',
+            deleted_at TEXT NOT NULL,
+            PRIMARY KEY (owner_base, id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_tombstones_owner_deleted_at ON contract_tombstones (owner_base, deleted_at);
+        CREATE INDEX IF NOT EXISTS idx_tombstones_deleted_at ON contract_tombstones (deleted_at);
+    """
+
+    # Version du schéma (PRAGMA user_version): 1 = sous-documents séparés
+    SCHEMA_VERSION = 1
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.locks = KeyedLock(os.path.join(os.path.dirname(os.path.abspath(db_path)), 'locks'))
+        self._local = threading.local()
+        self._migrate_schema()
+
+    def _migrate_schema(self):
+        conn = self._connection()
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(contracts)')]
+        if columns and 'summary' not in columns:
+            conn.execute('ALTER TABLE contracts ADD COLUMN summary TEXT')
+        if columns and 'version' not in columns:
+            conn.execute('ALTER TABLE contracts ADD COLUMN version INTEGER NOT NULL DEFAULT 0')
+        conn.executescript(self.SCHEMA)
+
+        # Calculer une fois les résumés des lignes créées avant l'ajout de la colonne
+        rows = conn.execute('SELECT id, document FROM contracts WHERE summary IS NULL').fetchall()
+        if rows:
+            with conn:
+                conn.executemany(
+                    'UPDATE contracts SET summary = ? WHERE id = ?',
+                    [(json.dumps(contract_summary(json.loads(document)), ensure_ascii=False), contract_id)
+                     for contract_id, document in rows]
+                )
+
+        if conn.execute('PRAGMA user_version').fetchone()[0] < 1:
+            # Extraire une fois les sous-documents des contrats importés avant leur séparation
+            rows = conn.execute(
+                """SELECT id, document FROM contracts
+                   WHERE document LIKE '%"elements"%' OR document LIKE '%"comments"%'"""
+            ).fetchall()
+            with conn:
+                for contract_id, document in rows:
+                    record, subdocuments = split_subdocuments(json.loads(document))
+                    if subdocuments:
+                        self._write_subdocuments(conn, contract_id, subdocuments)
+                        conn.execute('UPDATE contracts SET document = ? WHERE id = ?',
+                                     (json.dumps(record, ensure_ascii=False), contract_id))
+                conn.execute(f'PRAGMA user_version = {self.SCHEMA_VERSION}')
+
+    def _connection(self):
+        # Une connexion par thread: sqlite3 interdit le partage entre threads par défaut
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row_values(contract):
+        user_id = contract.get('user_id', '') or ''
+        return (
+            contract['id'],
+            user_id,
+            get_base_user_id(user_id),
+            contract.get('title'),
+            1 if contract.get('is_draft') else 0,
+            contract.get('created_at', '') or '',
+            contract.get('updated_at', '') or '',
+            json.dumps(contract, ensure_ascii=False),
+            json.dumps(contract_summary(contract), ensure_ascii=False),
+            contract.get('version', 0)
+        )
+
+    @staticmethod
+    def _write_subdocuments(conn, contract_id, subdocuments):
+        conn.executemany(
+            'INSERT OR REPLACE INTO contract_subdocuments (contract_id, name, document) VALUES (?, ?, ?)',
+            [(contract_id, name, json.dumps(value, ensure_ascii=False)) for name, value in subdocuments.items()]
+        )
+
+    def _load_documents(self, rows):
+        # rows: (id, document). Les contrats pas encore normalisés sont mis à niveau et réécrits;
+        # une ligne modifiée depuis sa lecture n'est pas écrasée
+        contracts = []
+        upgrades = []
+        for contract_id, document in rows:
+            contract = json.loads(document)
+            if needs_upgrade(contract):
+                contract = normalize_contract(contract)
+                upgrades.append((json.dumps(contract, ensure_ascii=False), contract_id, document))
+            contracts.append(contract)
+
+        if upgrades:
+            conn = self._connection()
+            with conn:
+                conn.executemany('UPDATE contracts SET document = ? WHERE id = ? AND document = ?', upgrades)
+        return contracts
+
+    def get(self, contract_id):
+        rows = self._connection().execute(
+            'SELECT id, document FROM contracts WHERE id = ?', (contract_id,)
+        ).fetchall()
+        contracts = self._load_documents(rows)
+        return contracts[0] if contracts else None
+
+    def get_subdocument(self, contract_id, name):
+        row = self._connection().execute(
+            'SELECT document FROM contract_subdocuments WHERE contract_id = ? AND name = ?',
+            (contract_id, name)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def exists(self, contract_id):
+        row = self._connection().execute(
+            'SELECT 1 FROM contracts WHERE id = ?', (contract_id,)
+        ).fetchone()
+        return row is not None
+
+    def get_owner(self, contract_id):
+        row = self._connection().execute(
+            'SELECT user_id FROM contracts WHERE id = ?', (contract_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def save(self, contract, expected_version=None, touch=False):
+        return self._save_records([(contract, expected_version)], touch=touch)[0]
+
+    def save_many(self, contracts, touch=False):
+        """
+        Crée ou remplace plusieurs contrats dans une seule transaction (touch: voir save).
+        """
+        self._save_records([(contract, None) for contract in contracts], touch=touch)
+
+    def _save_records(self, contracts, touch=False):
+        # contracts: (contrat, version attendue ou None). Transaction IMMEDIATE: la version lue et
+        # la version écrite ne peuvent pas être séparées par l'écriture d'un autre worker, et les
+        # dates updated_at attribuées dans la transaction suivent l'ordre des validations
+        conn = self._connection()
+        versions = []
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            for contract, expected_version in contracts:
+                # Même contrainte sur les IDs que le stockage en fichiers
+                data_layout.check_id(contract.get('id'))
+                record, subdocuments = split_subdocuments(contract)
+                previous = conn.execute(
+                    'SELECT owner_base, user_id, version FROM contracts WHERE id = ?', (record['id'],)
+                ).fetchone()
+                version = previous[2] if previous is not None else 0
+                if expected_version is not None and expected_version != version:
+                    raise VersionConflict(record['id'], version)
+                record['version'] = version + 1
+                if touch:
+                    record['updated_at'] = contract['updated_at'] = datetime.now().isoformat()
+                record = normalize_contract(record)
+
+                if subdocuments:
+                    self._write_subdocuments(conn, record['id'], subdocuments)
+                self._update_tombstones(conn, record, previous)
+                conn.execute(
+                    'INSERT OR REPLACE INTO contracts '
+                    '(id, user_id, owner_base, title, is_draft, created_at, updated_at, document, summary, version) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    self._row_values(record)
+                )
+                versions.append(record['version'])
+        return versions
+
+    @staticmethod
+    def _update_tombstones(conn, record, previous):
+        # Même logique que l'index des propriétaires des fichiers JSON (voir owner_index.py)
+        owner_base = get_base_user_id(record.get('user_id', '') or '')
+        if previous is not None and previous[0] == owner_base:
+            return
+        conn.execute('DELETE FROM contract_tombstones WHERE owner_base = ? AND id = ?', (owner_base, record['id']))
+        if previous is not None:
+            conn.execute(
+                'INSERT OR REPLACE INTO contract_tombstones (owner_base, id, user_id, deleted_at) VALUES (?, ?, ?, ?)',
+                (previous[0], record['id'], previous[1], datetime.now().isoformat())
+            )
+
+    def delete(self, contract_id):
+        conn = self._connection()
+        with conn:
+            previous = conn.execute(
+                'SELECT owner_base, user_id FROM contracts WHERE id = ?', (contract_id,)
+            ).fetchone()
+            cursor = conn.execute('DELETE FROM contracts WHERE id = ?', (contract_id,))
+            conn.execute('DELETE FROM contract_subdocuments WHERE contract_id = ?', (contract_id,))
+            if previous is not None:
+                conn.execute(
+                    'INSERT OR REPLACE INTO contract_tombstones (owner_base, id, user_id, deleted_at) VALUES (?, ?, ?, ?)',
+                    (previous[0], contract_id, previous[1], datetime.now().isoformat())
+                )
+        return cursor.rowcount > 0
+
+    def iter_contracts(self, full=True):
+        for (document,) in self._connection().execute('SELECT document FROM contracts'):
+            contract = json.loads(document)
+            if needs_upgrade(contract):
+                contract = normalize_contract(contract)
+            if full:
+                for name in SUBDOCUMENT_FIELDS:
+                    value = self.get_subdocument(contract['id'], name)
+                    if value is not None:
+                        contract[name] = value
+            yield contract
+
+    def list_for_owner(self, user_id):
+        rows = self._connection().execute(
+            'SELECT id, document FROM contracts WHERE owner_base = ? ORDER BY created_at DESC',
+            (get_base_user_id(user_id),)
+        ).fetchall()
+        return self._load_documents(rows)
+
+    def list_for_exact_owner(self, user_id):
+        rows = self._connection().execute(
+            'SELECT id, document FROM contracts WHERE user_id = ?', (user_id,)
+        ).fetchall()
+        return self._load_documents(rows)
+
+    def contract_ids_for_exact_owner(self, user_id):
+        rows = self._connection().execute(
+            'SELECT id FROM contracts WHERE user_id = ?', (user_id,)
+        ).fetchall()
+        return [contract_id for (contract_id,) in rows]
+
+    def owner_ids(self, prefix=''):
+        # Intervalle [prefix, prefix + U+FFFF) plutôt que LIKE: utilise l'index sur user_id
+        rows = self._connection().execute(
+            'SELECT DISTINCT user_id FROM contracts WHERE user_id >= ? AND user_id < ? ORDER BY user_id',
+            (prefix, prefix + '\uffff')
+        ).fetchall()
+        return [user_id for (user_id,) in rows]
+
+    def storage_footprint(self, contract_id):
+        # Les lignes ne sont pas des fichiers: seule la taille des documents est comptée
+        conn = self._connection()
+        row = conn.execute('SELECT length(CAST(document AS BLOB)) FROM contracts WHERE id = ?', (contract_id,)).fetchone()
+        subdocuments = conn.execute(
+            'SELECT COALESCE(SUM(length(CAST(document AS BLOB))), 0) FROM contract_subdocuments WHERE contract_id = ?',
+            (contract_id,)
+        ).fetchone()
+        return 0, (row[0] if row else 0) + subdocuments[0]
+
+    def list_summaries(self, user_id):
+        rows = self._connection().execute(
+            'SELECT summary FROM contracts WHERE owner_base = ?', (get_base_user_id(user_id),)
+        ).fetchall()
+        return [json.loads(summary) for (summary,) in rows]
+
+    def list_page(self, user_id, sort_by='created_at', descending=True, limit=None, cursor=None, full=False):
+        if sort_by not in SORT_FIELDS:
+            raise ValueError(f"Champ de tri non supporté: {sort_by}")
+
+        # Le nom de colonne provient de SORT_FIELDS: pas de risque d'injection
+        column = 'document' if full else 'summary'
+        direction = 'DESC' if descending else 'ASC'
+        query = f"SELECT {column}, COALESCE({sort_by}, ''), id FROM contracts WHERE owner_base = ?"
+        params = [get_base_user_id(user_id)]
+
+        if cursor:
+            sort_value, contract_id = decode_cursor(cursor)
+            query += f" AND (COALESCE({sort_by}, ''), id) {'<' if descending else '>'} (?, ?)"
+            params += [sort_value, contract_id]
+
+        query += f" ORDER BY COALESCE({sort_by}, '') {direction}, id {direction}"
+        if limit is not None:
+            query += ' LIMIT ?'
+            params.append(limit + 1)
+
+        rows = self._connection().execute(query, params).fetchall()
+
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][1], rows[-1][2])
+
+        if full:
+            return self._load_documents([(row[2], row[0]) for row in rows]), next_cursor
+        return [json.loads(row[0]) for row in rows], next_cursor
+
+    def list_tombstones(self, user_id):
+        rows = self._connection().execute(
+            'SELECT id, user_id, deleted_at FROM contract_tombstones WHERE owner_base = ?',
+            (get_base_user_id(user_id),)
+        ).fetchall()
+        return [{'id': contract_id, 'user_id': owner, 'deleted_at': deleted_at}
+                for contract_id, owner, deleted_at in rows]
+
+    def list_changes(self, user_id, cursor=None, limit=None):
+        # Seuls les changements postérieurs au curseur sont lus, via les index
+        # (owner_base, updated_at) et (owner_base, deleted_at)
+        conn = self._connection()
+        owner_base = get_base_user_id(user_id)
+        position = decode_cursor(cursor) if cursor else ('', '')
+        limit_clause = ' LIMIT ?' if limit is not None else ''
+        limit_params = [limit + 1] if limit is not None else []
+
+        with conn:
+            # Contrats et tombstones lus dans le même instantané de la base
+            conn.execute('BEGIN')
+            rows = conn.execute(
+                'SELECT summary FROM contracts WHERE owner_base = ? AND (updated_at, id) > (?, ?) '
+                'ORDER BY updated_at, id' + limit_clause,
+                [owner_base, *position, *limit_params]
+            ).fetchall()
+            summaries = [json.loads(summary) for (summary,) in rows]
+
+            tombstones = []
+            if cursor:
+                rows = conn.execute(
+                    'SELECT id, user_id, deleted_at FROM contract_tombstones WHERE owner_base = ? '
+                    'AND (deleted_at, id) > (?, ?) ORDER BY deleted_at, id' + limit_clause,
+                    [owner_base, *position, *limit_params]
+                ).fetchall()
+                tombstones = [{'id': contract_id, 'user_id': owner, 'deleted_at': deleted_at}
+                              for contract_id, owner, deleted_at in rows]
+
+        return paginate_changes(summaries, tombstones, limit, cursor)
+
+    def purge_tombstones(self, before):
+        conn = self._connection()
+        with conn:
+            cursor = conn.execute('DELETE FROM contract_tombstones WHERE deleted_at < ?', (before,))
+        return cursor.rowcount
+
+
+def create_contract_store(contracts_dir, db_path, backend=None):
+    """
+    Crée le backend de stockage configuré.
+
+    Args:
+        contracts_dir (str): Répertoire des fichiers JSON des contrats
+        db_path (str): Chemin de la base SQLite
+        backend (str, optional): "json" ou "sqlite". Par défaut, la variable
+            d'environnement LEXFORGE_CONTRACT_STORE (ou "json").
+            La taille du cache des contrats JSON est lue dans LEXFORGE_CONTRACT_CACHE_SIZE et la
+            fenêtre de regroupement des écritures (en millisecondes) dans LEXFORGE_WRITE_COALESCE_MS
+            (un seul worker gunicorn dans ce cas).
+
+    Returns:
+        ContractStore: Le backend de stockage
+    """
+    backend = (backend or os.environ.get('LEXFORGE_CONTRACT_STORE', 'json')).lower()
+    if backend == 'sqlite':
+        return SqliteContractStore(db_path)
+    if backend == 'json':
+        cache_size = int(os.environ.get('LEXFORGE_CONTRACT_CACHE_SIZE', '256'))
+        write_window = int(os.environ.get('LEXFORGE_WRITE_COALESCE_MS', '0')) / 1000
+        return JsonContractStore(contracts_dir, cache_size=cache_size, write_window=write_window)
+    raise ValueError(f"Backend de stockage inconnu: {backend}")
+
+
+def import_json_tree(source_dir, store, batch_size=500):
+    """
+    Importe tous les fichiers {contract_id}.json d'un répertoire dans un backend de stockage.
+
+    Args:
+        source_dir (str): Répertoire contenant les fichiers JSON des contrats
+        store (ContractStore): Backend de destination
+        batch_size (int, optional): Nombre de contrats écrits par transaction
+
+    Returns:
+        int: Nombre de contrats importés
+    """
+    source = JsonContractStore(source_dir)
+    imported = 0
+    batch = []
+
+    for contract in source.iter_contracts():
+        if not contract.get('id'):
+            continue
+        batch.append(contract)
+        if len(batch) >= batch_size:
+            store.save_many(batch)
+            imported += len(batch)
+            batch = []
+
+    if batch:
+        store.save_many(batch)
+        imported += len(batch)
+
+    return imported
+
+
+if __name__ == "__main__":
+    BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+    DATA_DIR = os.path.join(BACKEND_DIR, 'data')
+
+    parser = argparse.ArgumentParser(description="Outils du stockage des contrats LexForge")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = subparsers.add_parser('import', help="Importe data/contracts/*.json dans la base SQLite")
+    import_parser.add_argument('--source', default=os.path.join(DATA_DIR, 'contracts'))
+    import_parser.add_argument('--db', default=os.path.join(DATA_DIR, 'contracts.sqlite3'))
+
+    index_parser = subparsers.add_parser('rebuild-index', help="Reconstruit l'index des propriétaires des fichiers JSON")
+    index_parser.add_argument('--source', default=os.path.join(DATA_DIR, 'contracts'))
+
+    args = parser.parse_args()
+
+    if args.command == 'import':
+        count = import_json_tree(args.source, SqliteContractStore(args.db))
+        print(f"{count} contrats importés dans {args.db}")
+    elif args.command == 'rebuild-index':
+        count = JsonContractStore(args.source).rebuild_index()
+        print(f"{count} contrats indexés")
@@ -6,6 +6,10 @@ avec une attention particulière à la rigueur juridique et à l'exhaustivité.
 
 from config import TELLERS_INFO, DEFAULT_DURATION, DEFAULT_RENEWAL, DEFAULT_TERRITORY
 
+# Version des templates, à incrémenter à chaque modification des textes ou de la construction
+# des contrats: elle fait partie de la clé du cache des éléments générés (voir elements_cache.py)
+TEMPLATE_VERSION = 1
+
 
 class ContractTemplates:
     """Classe contenant tous les templates pour la génération des contrats professionnels."""
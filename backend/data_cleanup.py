@@ -0,0 +1,256 @@
+"""
+Nettoyage des données temporaires des utilisateurs anonymes.
+Un utilisateur anonyme (ID "anon_...") est considéré comme inactif lorsque ni son profil ni aucun
+de ses contrats n'a été modifié depuis la durée de rétention (30 jours par défaut). Ses brouillons
+qui n'ont pas été rattachés à un compte par la migration sont alors supprimés, ainsi que son profil
+s'il ne lui reste aucun contrat. Les contrats finalisés d'un utilisateur anonyme sont conservés.
+
+Le nettoyage se lance en ligne de commande (python data_cleanup.py) ou périodiquement dans le
+serveur (LEXFORGE_ANON_GC_INTERVAL_HOURS), par un seul worker à la fois: celui qui obtient le verrou
+data/locks/anonymous_gc.lock (même principe que tmp_janitor.py). Les suppressions passent par le stockage des contrats,
+ce qui garde l'index des propriétaires cohérent, et sont faites par lots espacés de pauses.
+Chaque nettoyage oublie aussi les tombstones des contrats supprimés depuis plus longtemps que leur
+durée de conservation (voir ContractStore.list_changes).
+"""
+import os
+import time
+import argparse
+import threading
+from datetime import datetime, timedelta
+
+import data_layout
+from atomic_writer import try_process_lock, start_leader_scheduler
+
+# Préfixe des IDs des utilisateurs anonymes
+ANONYMOUS_PREFIX = 'anon_'
+
+# Durée de rétention par défaut des données anonymes
+DEFAULT_TTL_DAYS = 30
+
+PROFILE_PREFIX = 'user_profile_'
+
+# Verrou du worker chargé du nettoyage périodique, dans le répertoire des verrous des données
+LOCK_FILENAME = 'anonymous_gc.lock'
+
+
+def _parse_timestamp(value):
+    """
+    Convertit une date ISO enregistrée dans un contrat ou un profil en datetime, ou None.
+    """
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+class AnonymousDataCollector:
+    """
+    Supprime les brouillons et profils des utilisateurs anonymes inactifs.
+    """
+
+    def __init__(self, contract_store, profiles_dir, ttl_days=DEFAULT_TTL_DAYS, batch_size=100, pause_seconds=0.0,
+                 tombstone_retention_days=None):
+        self.contract_store = contract_store
+        self.profiles_dir = profiles_dir
+        self.ttl = timedelta(days=ttl_days)
+        self.tombstone_retention = timedelta(days=tombstone_retention_days) if tombstone_retention_days else None
+        self.batch_size = batch_size
+        self.pause_seconds = pause_seconds
+        self.lock_path = os.path.join(os.path.dirname(os.path.abspath(profiles_dir)), 'locks', LOCK_FILENAME)
+        self._lock = threading.Lock()
+        self._lock_file = None
+        self.runs = 0
+        self.last_run = None
+        self.last_report = None
+
+    def _anonymous_profiles(self):
+        # {user_id: chemin} des profils anonymes, dans les deux organisations des fichiers
+        profiles = {}
+        for filename, path in data_layout.iter_files(self.profiles_dir, prefix=PROFILE_PREFIX + ANONYMOUS_PREFIX):
+            profiles[filename[len(PROFILE_PREFIX):-len('.json')]] = path
+        return profiles
+
+    def _last_activity(self, summaries, profile_path):
+        # Date de la dernière modification connue, ou None si elle ne peut pas être déterminée
+        timestamps = []
+        for summary in summaries:
+            timestamp = _parse_timestamp(summary.get('updated_at') or summary.get('created_at'))
+            if timestamp is None:
+                return None
+            timestamps.append(timestamp)
+
+        if profile_path is not None:
+            try:
+                timestamps.append(datetime.fromtimestamp(os.path.getmtime(profile_path)))
+            except FileNotFoundError:
+                pass
+
+        return max(timestamps) if timestamps else None
+
+    def collect(self, dry_run=False):
+        """
+        Supprime les données des utilisateurs anonymes inactifs.
+
+        Args:
+            dry_run (bool, optional): Compter les données à supprimer sans les supprimer
+
+        Returns:
+            dict: Rapport (utilisateurs, brouillons et profils supprimés, fichiers et octets libérés)
+        """
+        started = time.time()
+        cutoff = datetime.now() - self.ttl
+        report = {'users': 0, 'contracts': 0, 'profiles': 0, 'tombstones': 0, 'files': 0, 'bytes': 0,
+                  'errors': 0, 'dry_run': dry_run}
+        processed = 0
+
+        profiles = self._anonymous_profiles()
+        user_ids = set(self.contract_store.owner_ids(ANONYMOUS_PREFIX)) | set(profiles)
+
+        for user_id in sorted(user_ids):
+            try:
+                # Les contrats migrés ont changé de propriétaire: seuls ceux encore anonymes comptent
+                summaries = [
+                    summary for summary in self.contract_store.list_summaries(user_id)
+                    if summary.get('user_id') == user_id
+                ]
+                last_activity = self._last_activity(summaries, profiles.get(user_id))
+                if last_activity is None or last_activity >= cutoff:
+                    continue
+
+                report['users'] += 1
+                kept = False
+                for summary in summaries:
+                    # Seuls les brouillons sont des données temporaires
+                    if not summary.get('is_draft') or not self._still_expired(summary['id'], user_id, cutoff):
+                        kept = True
+                        continue
+                    files, size = self.contract_store.storage_footprint(summary['id'])
+                    if dry_run or self.contract_store.delete(summary['id']):
+                        report['contracts'] += 1
+                        report['files'] += files
+                        report['bytes'] += size
+                    processed += 1
+                    self._throttle(processed)
+
+                # Le profil reste tant que l'utilisateur a des contrats
+                profile_path = profiles.get(user_id)
+                if profile_path is not None and not kept:
+                    try:
+                        # Le profil a pu être enregistré depuis le début du nettoyage
+                        stat = os.stat(profile_path)
+                    except FileNotFoundError:
+                        continue
+                    if datetime.fromtimestamp(stat.st_mtime) >= cutoff:
+                        continue
+                    size = stat.st_size
+                    if dry_run or data_layout.remove_file(self.profiles_dir, f'{PROFILE_PREFIX}{user_id}.json'):
+                        report['profiles'] += 1
+                        report['files'] += 1
+                        report['bytes'] += size
+                    processed += 1
+                    self._throttle(processed)
+            except Exception as e:
+                print(f"Nettoyage: erreur sur l'utilisateur {user_id}: {e}")
+                report['errors'] += 1
+
+        if self.tombstone_retention is not None and not dry_run:
+            try:
+                before = (datetime.now() - self.tombstone_retention).isoformat()
+                report['tombstones'] = self.contract_store.purge_tombstones(before)
+            except Exception as e:
+                print(f"Nettoyage: erreur lors de la purge des tombstones: {e}")
+                report['errors'] += 1
+
+        report['duration_seconds'] = round(time.time() - started, 3)
+        with self._lock:
+            self.runs += 1
+            self.last_run = datetime.now().isoformat()
+            self.last_report = report
+        return report
+
+    def _still_expired(self, contract_id, user_id, cutoff):
+        # Revérifier le contrat juste avant sa suppression: il a pu être migré, finalisé ou modifié entre-temps
+        contract = self.contract_store.get(contract_id)
+        if contract is None or contract.get('user_id') != user_id or not contract.get('is_draft'):
+            return False
+        updated_at = _parse_timestamp(contract.get('updated_at') or contract.get('created_at'))
+        return updated_at is not None and updated_at < cutoff
+
+    def _throttle(self, processed):
+        # Pause entre deux lots, pour limiter la charge disque pendant que l'API tourne
+        if self.pause_seconds and processed % self.batch_size == 0:
+            time.sleep(self.pause_seconds)
+
+    def is_leader(self):
+        """
+        Indique si ce worker est chargé du nettoyage périodique; tente d'obtenir le verrou sinon.
+        """
+        if self._lock_file is not None:
+            return True
+        f = try_process_lock(self.lock_path)
+        if f is None:
+            # Un autre worker fait le nettoyage
+            return False
+        # Verrou conservé jusqu'à la fin du processus
+        self._lock_file = f
+        return True
+
+    def start_scheduler(self, interval_seconds):
+        """
+        Lance le nettoyage périodique dans un thread d'arrière-plan du worker (premier passage après un intervalle).
+        Seul le worker qui détient le verrou nettoie; les autres retentent à chaque intervalle.
+
+        Args:
+            interval_seconds (float): Intervalle entre deux nettoyages
+        """
+        def run():
+            report = self.collect()
+            print(f"Nettoyage des données anonymes: {report}")
+
+        return start_leader_scheduler(self.is_leader, run, interval_seconds, "Nettoyage des données anonymes",
+                                      run_immediately=False)
+
+    def stats(self):
+        """
+        Retourne le nombre de nettoyages effectués et le rapport du dernier.
+        """
+        with self._lock:
+            return {
+                'ttl_days': self.ttl.days,
+                'leader': self._lock_file is not None,
+                'runs': self.runs,
+                'last_run': self.last_run,
+                'last_report': self.last_report
+            }
+
+
+if __name__ == "__main__":
+    from contract_store import create_contract_store, TOMBSTONE_RETENTION_DAYS
+
+    DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+    parser = argparse.ArgumentParser(description="Suppression des brouillons et profils des utilisateurs anonymes inactifs")
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--ttl-days', type=int, default=DEFAULT_TTL_DAYS,
+                        help="Durée d'inactivité au-delà de laquelle les données anonymes sont supprimées")
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--pause-ms', type=int, default=0,
+                        help="Pause entre deux lots de suppressions, pour limiter la charge pendant que l'API tourne")
+    parser.add_argument('--tombstone-retention-days', type=int, default=TOMBSTONE_RETENTION_DAYS,
+                        help="Durée de conservation des tombstones des contrats supprimés (0 pour les conserver)")
+    parser.add_argument('--dry-run', action='store_true', help="Affiche ce qui serait supprimé sans rien supprimer")
+
+    args = parser.parse_args()
+
+    # Même backend de stockage que l'API (LEXFORGE_CONTRACT_STORE)
+    store = create_contract_store(os.path.join(args.data_dir, 'contracts'),
+                                  os.path.join(args.data_dir, 'contracts.sqlite3'))
+    collector = AnonymousDataCollector(store, os.path.join(args.data_dir, 'user_profiles'),
+                                       ttl_days=args.ttl_days, batch_size=args.batch_size,
+                                       pause_seconds=args.pause_ms / 1000,
+                                       tombstone_retention_days=args.tombstone_retention_days)
+    report = collector.collect(dry_run=args.dry_run)
+    action = "seraient supprimés" if args.dry_run else "supprimés"
+    print(f"{report['users']} utilisateurs anonymes inactifs: {report['contracts']} brouillons et "
+          f"{report['profiles']} profils {action} ({report['files']} fichiers, {report['bytes']} octets), "
+          f"{report['tombstones']} tombstones purgées, {report['errors']} erreurs")
@@ -0,0 +1,219 @@
+"""
+Organisation des fichiers de données (contrats et profils) en répertoires répartis par hachage.
+Chaque fichier <nom> est rangé dans <racine>/ab/cd/<nom>, où "abcd" sont les premiers caractères
+du SHA-1 du nom: aucun répertoire ne contient plus de quelques centaines d'entrées.
+
+Les fichiers de l'ancienne organisation à plat (<racine>/<nom>) restent lisibles, ce qui permet
+de migrer avec l'API en service (python data_layout.py migrate).
+"""
+import os
+import re
+import time
+import hashlib
+import argparse
+
+# IDs utilisés tels quels dans les noms de fichiers (contrats): UUID ou lettres, chiffres, _ et -
+SAFE_ID_PATTERN = re.compile(r'[A-Za-z0-9_-]{1,128}')
+
+# Verrou des processus qui écrivent dans le répertoire des contrats JSON (dans data/locks):
+# exclusif pour un processus qui regroupe les écritures, partagé sinon (voir
+# contract_store.JsonContractStore et storage_codec.migrate)
+WRITERS_LOCK_FILENAME = 'writers.lock'
+
+
+class InvalidId(ValueError):
+    """
+    ID qui ne peut pas servir de nom de fichier (ex: "../x").
+    """
+
+
+def check_id(value):
+    """
+    Vérifie qu'un ID peut être utilisé dans un nom de fichier sans sortir de son répertoire.
+
+    Raises:
+        InvalidId: Si l'ID est vide, trop long ou contient d'autres caractères que [A-Za-z0-9_-]
+    """
+    if not isinstance(value, str) or not SAFE_ID_PATTERN.fullmatch(value):
+        raise InvalidId(f"ID invalide: {value!r}")
+    return value
+
+
+def shard_path(root, filename):
+    """
+    Retourne l'emplacement réparti d'un fichier.
+
+    Args:
+        root (str): Répertoire racine (ex: CONTRACTS_DIR)
+        filename (str): Nom du fichier (ex: "<uuid>.json")
+
+    Returns:
+        str: Chemin <racine>/ab/cd/<nom>
+    """
+    digest = hashlib.sha1(filename.encode('utf-8')).hexdigest()
+    return os.path.join(root, digest[:2], digest[2:4], filename)
+
+
+def legacy_path(root, filename):
+    """
+    Retourne l'emplacement d'un fichier dans l'ancienne organisation à plat.
+    """
+    return os.path.join(root, filename)
+
+
+def resolve_path(root, filename):
+    """
+    Retourne le chemin à lire pour un fichier: l'emplacement réparti s'il existe, sinon
+    l'ancien emplacement à plat s'il existe, sinon l'emplacement réparti.
+    """
+    path = shard_path(root, filename)
+    if os.path.exists(path):
+        return path
+
+    flat_path = legacy_path(root, filename)
+    if os.path.exists(flat_path):
+        return flat_path
+
+    # Le fichier a pu être déplacé par une migration entre les deux vérifications
+    return path
+
+
+def write_path(root, filename):
+    """
+    Retourne l'emplacement réparti d'un fichier à écrire, en créant ses répertoires.
+    """
+    path = shard_path(root, filename)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+def remove_legacy(root, filename):
+    """
+    Supprime l'ancienne copie à plat d'un fichier qui vient d'être écrit à son emplacement réparti.
+    """
+    try:
+        os.remove(legacy_path(root, filename))
+    except FileNotFoundError:
+        pass
+
+
+def remove_file(root, filename):
+    """
+    Supprime un fichier à ses deux emplacements possibles.
+
+    Returns:
+        bool: True si un fichier a été supprimé
+    """
+    removed = False
+    # L'ancienne copie est supprimée en premier: une migration concurrente ne peut plus la recopier
+    for path in (legacy_path(root, filename), shard_path(root, filename)):
+        try:
+            os.remove(path)
+            removed = True
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def _is_shard_dir(entry):
+    return entry.is_dir() and len(entry.name) == 2 and all(c in '0123456789abcdef' for c in entry.name)
+
+
+def iter_files(root, prefix='', suffix='.json'):
+    """
+    Parcourt les fichiers d'un répertoire de données, dans les deux organisations.
+    Un fichier présent aux deux emplacements n'est renvoyé qu'une fois.
+
+    Args:
+        root (str): Répertoire racine
+        prefix (str, optional): Préfixe des noms de fichiers retenus
+        suffix (str, optional): Suffixe des noms de fichiers retenus
+
+    Yields:
+        tuple: (nom du fichier, chemin)
+    """
+    def wanted(name):
+        # Les fichiers cachés sont des écritures temporaires en cours
+        return not name.startswith('.') and name.startswith(prefix) and name.endswith(suffix)
+
+    try:
+        entries = list(os.scandir(root))
+    except FileNotFoundError:
+        return
+
+    for entry in entries:
+        if entry.is_file() and wanted(entry.name):
+            if not os.path.exists(shard_path(root, entry.name)):
+                yield entry.name, entry.path
+
+    for level1 in entries:
+        if not _is_shard_dir(level1):
+            continue
+        for level2 in os.scandir(level1.path):
+            if not _is_shard_dir(level2):
+                continue
+            for entry in os.scandir(level2.path):
+                if entry.is_file() and wanted(entry.name):
+                    yield entry.name, entry.path
+
+
+def migrate(root, pause_every=500, pause_seconds=0.0):
+    """
+    Déplace les fichiers à plat d'un répertoire vers leur emplacement réparti.
+    Peut être lancée pendant que l'API écrit: un fichier déjà présent à son emplacement
+    réparti est plus récent que la copie à plat, qui est alors simplement supprimée.
+
+    Args:
+        root (str): Répertoire racine
+        pause_every (int, optional): Nombre de fichiers déplacés entre deux pauses
+        pause_seconds (float, optional): Durée des pauses, pour limiter la charge disque
+
+    Returns:
+        dict: Nombre de fichiers déplacés et de copies obsolètes supprimées
+    """
+    report = {'moved': 0, 'stale_removed': 0}
+    processed = 0
+
+    for entry in os.scandir(root):
+        if not entry.is_file() or entry.name.startswith('.'):
+            continue
+
+        target = write_path(root, entry.name)
+        try:
+            # Le lien échoue si la cible existe: une écriture plus récente n'est jamais écrasée
+            os.link(entry.path, target)
+            report['moved'] += 1
+        except FileExistsError:
+            report['stale_removed'] += 1
+        except FileNotFoundError:
+            # Fichier supprimé ou déplacé entre-temps
+            continue
+        remove_legacy(root, entry.name)
+
+        processed += 1
+        if pause_seconds and processed % pause_every == 0:
+            time.sleep(pause_seconds)
+
+    return report
+
+
+if __name__ == "__main__":
+    DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+    parser = argparse.ArgumentParser(description="Organisation des fichiers de données LexForge")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    migrate_parser = subparsers.add_parser('migrate', help="Répartit les contrats et profils dans des sous-répertoires")
+    migrate_parser.add_argument('--data-dir', default=DATA_DIR)
+    migrate_parser.add_argument('--pause-ms', type=int, default=0,
+                                help="Pause tous les 500 fichiers, pour limiter la charge pendant que l'API tourne")
+
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        for subdir in ('contracts', 'user_profiles'):
+            root = os.path.join(args.data_dir, subdir)
+            if not os.path.isdir(root):
+                continue
+            report = migrate(root, pause_seconds=args.pause_ms / 1000)
+            print(f"{subdir}: {report['moved']} fichiers déplacés, {report['stale_removed']} copies obsolètes supprimées")
@@ -0,0 +1,129 @@
+"""
+Normalisation versionnée des données des contrats et des profils.
+Les informations des parties (auteur, cessionnaire, entreprise) sont normalisées une seule fois,
+à l'écriture, et le document enregistré porte la version de normalisation appliquée
+(schema_version). Les lectures utilisent les valeurs enregistrées telles quelles; les documents
+antérieurs sont mis à niveau à leur première lecture.
+"""
+
+# Version de la normalisation: à incrémenter à chaque modification de normalize_party_info
+# ou de normalize_contract.
+# 1 = parties normalisées; 2 = export_info des contrats importés retiré
+DATA_SCHEMA_VERSION = 2
+
+# Champs des données d'un contrat décrivant une partie
+PARTY_FIELDS = ('auteur_info', 'cessionnaire_info', 'entreprise_info')
+
+# Entités d'un profil utilisateur
+PROFILE_ENTITIES = ('physical_person', 'legal_entity')
+
+
+def normalize_party_info(data):
+    """
+    Normalise les informations d'une partie (auteur ou cessionnaire) entre l'étape 3 et le dashboard.
+
+    Args:
+        data (dict): Informations saisies
+
+    Returns:
+        dict: Copie normalisée (siren, adresse, representant_nom, adresse_complete)
+    """
+    normalized = data.copy() if data else {}
+
+    # Mapping entre les noms de champs potentiellement différents
+    field_mappings = {
+        'rcs': 'siren',
+        'siege': 'adresse',
+        'representant': 'representant_nom',
+    }
+
+    # Appliquer les mappings
+    for old_field, new_field in field_mappings.items():
+        if old_field in normalized and not normalized.get(new_field):
+            normalized[new_field] = normalized[old_field]
+
+    # Assurer que l'adresse complète est extraite des composants si nécessaire
+    if 'adresse' in normalized and 'code_postal' in normalized and 'ville' in normalized:
+        address_parts = []
+        if normalized.get('adresse'):
+            address_parts.append(normalized['adresse'])
+
+        city_part = ''
+        if normalized.get('code_postal'):
+            city_part += normalized['code_postal']
+        if normalized.get('ville'):
+            if city_part:
+                city_part += ' '
+            city_part += normalized['ville']
+
+        if city_part:
+            address_parts.append(city_part)
+
+        if address_parts:
+            normalized['adresse_complete'] = ', '.join(address_parts)
+
+    return normalized
+
+
+def normalize_contract_data(contract_data):
+    """
+    Normalise les informations des parties des données d'un contrat (voir PARTY_FIELDS).
+
+    Args:
+        contract_data (dict): Données du contrat (enregistrées ou reçues par un endpoint)
+
+    Returns:
+        dict: Copie des données, parties normalisées
+    """
+    normalized = dict(contract_data or {})
+    for field in PARTY_FIELDS:
+        if isinstance(normalized.get(field), dict):
+            normalized[field] = normalize_party_info(normalized[field])
+    return normalized
+
+
+def needs_upgrade(document):
+    """
+    Indique si un contrat ou un profil enregistré a été normalisé par une version antérieure.
+    """
+    return document.get('schema_version', 0) < DATA_SCHEMA_VERSION
+
+
+def normalize_contract(contract):
+    """
+    Prépare un contrat pour l'écriture: données normalisées et version de normalisation.
+    Les métadonnées d'un fichier d'export importé (export_info) ne sont pas conservées.
+    schema_version est ajouté en dernier: l'export sans décodage (voir contract_export.py)
+    reconnaît un enregistrement à jour à la fin de son fichier.
+
+    Args:
+        contract (dict): Contrat à enregistrer
+
+    Returns:
+        dict: Copie du contrat (les sous-documents ne sont pas copiés)
+    """
+    normalized = dict(contract)
+    normalized.pop('export_info', None)
+    normalized.pop('schema_version', None)
+    if 'data' in normalized:
+        normalized['data'] = normalize_contract_data(normalized['data'])
+    normalized['schema_version'] = DATA_SCHEMA_VERSION
+    return normalized
+
+
+def normalize_profile(profile):
+    """
+    Prépare un profil utilisateur pour l'écriture: entités normalisées et version de normalisation.
+
+    Args:
+        profile (dict): Profil à enregistrer
+
+    Returns:
+        dict: Copie du profil
+    """
+    normalized = dict(profile)
+    for entity in PROFILE_ENTITIES:
+        if isinstance(normalized.get(entity), dict):
+            normalized[entity] = normalize_party_info(normalized[entity])
+    normalized['schema_version'] = DATA_SCHEMA_VERSION
+    return normalized
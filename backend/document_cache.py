@@ -0,0 +1,82 @@
+"""
+Cache en mémoire des documents JSON lus sur le disque.
+Les entrées sont indexées par chemin et validées par (mtime_ns, taille) du fichier,
+ce qui permet de partager le disque entre plusieurs workers sans invalidation explicite.
+"""
+import os
+import copy
+
+from bounded_lru import BoundedLRU
+
+
+class DocumentCache:
+    """
+    Cache LRU borné de documents parsés (voir bounded_lru.py).
+    Chaque lecture renvoie une copie: les appelants peuvent modifier le document
+    sans altérer la version en cache.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        # Entrées (signature du fichier, document), indexées par chemin
+        self._entries = BoundedLRU(max_entries=max_entries)
+
+    @staticmethod
+    def _signature(path, stat=None):
+        stat = stat if stat is not None else os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def get(self, path, loader):
+        """
+        Retourne le document du fichier, depuis le cache s'il est à jour.
+
+        Args:
+            path (str): Chemin du fichier
+            loader (callable): Fonction qui lit et parse le fichier (appelée en cas d'échec du cache)
+
+        Returns:
+            Une copie du document
+
+        Raises:
+            FileNotFoundError: Si le fichier n'existe pas
+        """
+        if self.max_entries <= 0:
+            return loader(path)
+
+        signature = self._signature(path)
+
+        entry = self._entries.get(path, is_valid=lambda entry: entry[0] == signature)
+        if entry is not None:
+            return copy.deepcopy(entry[1])
+
+        document = loader(path)
+
+        # Si le fichier a changé pendant la lecture, ne pas mettre en cache une version incertaine
+        if self._signature(path) == signature:
+            self._entries.put(path, (signature, document))
+
+        return copy.deepcopy(document)
+
+    def put(self, path, document, stat):
+        """
+        Met en cache un document qui vient d'être écrit dans le fichier.
+
+        Args:
+            path (str): Chemin du fichier
+            document: Document écrit
+            stat (os.stat_result): État du fichier écrit, relevé avant son renommage (voir
+                atomic_write_bytes). Un os.stat(path) après coup pourrait être celui d'un fichier
+                plus récent écrit par un autre worker, qui serait alors masqué par ce document.
+        """
+        if self.max_entries <= 0:
+            return
+        self._entries.put(path, (self._signature(path, stat), copy.deepcopy(document)))
+
+    def invalidate(self, path):
+        self._entries.pop(path)
+
+    def stats(self):
+        """
+        Retourne les compteurs du cache (pour le dimensionnement en production).
+        """
+        return self._entries.stats()
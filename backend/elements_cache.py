@@ -0,0 +1,91 @@
+"""
+Cache des éléments de l'éditeur générés à partir des templates.
+Les éléments sont indexés par un hachage des paramètres qui les ont produits (données du contrat,
+cessionnaire résolu et version des templates): deux contrats aux paramètres identiques partagent
+la même entrée, et une modification des paramètres produit une nouvelle clé.
+"""
+import copy
+import json
+import hashlib
+
+from bounded_lru import BoundedLRU
+from contract_templates import TEMPLATE_VERSION
+
+
+def elements_cache_key(builder_args):
+    """
+    Calcule la clé de cache des éléments générés pour un jeu de paramètres.
+
+    Args:
+        builder_args (dict): Paramètres passés à ContractBuilder.build_contract_elements
+
+    Returns:
+        str: Hachage SHA-256 des paramètres et de la version des templates
+    """
+    payload = json.dumps([TEMPLATE_VERSION, builder_args], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def to_editor_elements(flowables):
+    """
+    Convertit les éléments ReportLab d'un contrat au format de l'éditeur.
+
+    Args:
+        flowables (list): Éléments produits par ContractBuilder.build_contract_elements
+
+    Returns:
+        list: Éléments {'type': 'paragraph', 'style', 'text'} ou {'type': 'spacer', 'height'}
+    """
+    editor_elements = []
+
+    for element in flowables:
+        if hasattr(element, 'text'):
+            # Si c'est un élément Paragraph
+            style_name = str(element.style.name) if hasattr(element, 'style') and hasattr(element.style, 'name') else 'ContractText'
+            editor_elements.append({
+                'type': 'paragraph',
+                'style': style_name,
+                'text': element.text
+            })
+        elif hasattr(element, 'height'):
+            # Si c'est un élément Spacer
+            editor_elements.append({
+                'type': 'spacer',
+                'height': element.height
+            })
+
+    return editor_elements
+
+
+class ElementsCache:
+    """
+    Cache LRU borné des éléments de l'éditeur, en mémoire du worker (voir bounded_lru.py).
+    Chaque lecture renvoie une copie.
+    """
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._entries = BoundedLRU(max_entries=max_entries)
+
+    def get_or_build(self, key, build):
+        """
+        Retourne les éléments associés à une clé, en les générant si nécessaire.
+
+        Args:
+            key (str): Clé calculée par elements_cache_key
+            build (callable): Fonction sans argument qui génère les éléments
+
+        Returns:
+            list: Une copie des éléments
+        """
+        elements = self._entries.get(key)
+        if elements is None:
+            elements = build()
+            self._entries.put(key, elements)
+        return copy.deepcopy(elements)
+
+    def stats(self):
+        """
+        Retourne les compteurs du cache.
+        """
+        return self._entries.stats()
@@ -0,0 +1,208 @@
+"""
+Application de modifications partielles à un document JSON.
+Deux formats sont acceptés par PATCH /api/contracts/<id>:
+    - JSON Patch (RFC 6902, application/json-patch+json): liste d'opérations add, remove,
+      replace, move, copy et test adressées par des pointeurs JSON (RFC 6901);
+    - JSON Merge Patch (RFC 7386, application/merge-patch+json): objet fusionné dans le
+      document, une valeur null supprimant le champ.
+"""
+import copy
+
+JSON_PATCH_MEDIA_TYPE = 'application/json-patch+json'
+MERGE_PATCH_MEDIA_TYPE = 'application/merge-patch+json'
+
+PATCH_OPERATIONS = ('add', 'remove', 'replace', 'move', 'copy', 'test')
+
+
+class JsonPatchError(ValueError):
+    """
+    Modification invalide ou inapplicable au document.
+    """
+
+
+class JsonPatchTestFailed(JsonPatchError):
+    """
+    Une opération test a échoué: le document n'est pas dans l'état attendu par le client.
+    """
+
+
+def parse_pointer(pointer):
+    """
+    Découpe un pointeur JSON ("/elements/3/text") en segments.
+
+    Raises:
+        JsonPatchError: Si le pointeur est invalide
+    """
+    if not isinstance(pointer, str) or (pointer and not pointer.startswith('/')):
+        raise JsonPatchError(f"Pointeur JSON invalide: {pointer!r}")
+    if not pointer:
+        return []
+    return [segment.replace('~1', '/').replace('~0', '~') for segment in pointer[1:].split('/')]
+
+
+def patch_roots(patch, merge=False):
+    """
+    Retourne les champs de premier niveau du document touchés par une modification,
+    pour ne charger et n'écrire que les sous-documents concernés.
+
+    Returns:
+        set: Noms des champs ('' si le document entier est visé)
+    """
+    if merge:
+        return set(patch) if isinstance(patch, dict) else {''}
+    roots = set()
+    for operation in _check_operations(patch):
+        for key in ('path', 'from'):
+            if key in operation:
+                segments = parse_pointer(operation[key])
+                roots.add(segments[0] if segments else '')
+    return roots
+
+
+def _check_operations(patch):
+    if not isinstance(patch, list):
+        raise JsonPatchError("Un JSON Patch doit être une liste d'opérations")
+    for operation in patch:
+        if not isinstance(operation, dict) or operation.get('op') not in PATCH_OPERATIONS:
+            raise JsonPatchError(f"Opération invalide: {operation!r}")
+        if 'path' not in operation:
+            raise JsonPatchError(f"Opération sans path: {operation!r}")
+        if operation['op'] in ('add', 'replace', 'test') and 'value' not in operation:
+            raise JsonPatchError(f"Opération sans value: {operation!r}")
+        if operation['op'] in ('move', 'copy') and 'from' not in operation:
+            raise JsonPatchError(f"Opération sans from: {operation!r}")
+    return patch
+
+
+def _list_index(container, segment, allow_end=False):
+    if allow_end and segment == '-':
+        return len(container)
+    if not segment.isdigit() or (len(segment) > 1 and segment.startswith('0')):
+        raise JsonPatchError(f"Index de liste invalide: {segment!r}")
+    index = int(segment)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise JsonPatchError(f"Index de liste hors limites: {index}")
+    return index
+
+
+def _resolve_parent(document, segments):
+    # Retourne le conteneur du dernier segment
+    container = document
+    for segment in segments[:-1]:
+        if isinstance(container, dict):
+            if segment not in container:
+                raise JsonPatchError(f"Chemin inexistant: /{'/'.join(segments)}")
+            container = container[segment]
+        elif isinstance(container, list):
+            container = container[_list_index(container, segment)]
+        else:
+            raise JsonPatchError(f"Chemin inexistant: /{'/'.join(segments)}")
+    return container
+
+
+def _get(document, segments):
+    if not segments:
+        return document
+    container = _resolve_parent(document, segments)
+    key = segments[-1]
+    if isinstance(container, dict):
+        if key not in container:
+            raise JsonPatchError(f"Chemin inexistant: /{'/'.join(segments)}")
+        return container[key]
+    if isinstance(container, list):
+        return container[_list_index(container, key)]
+    raise JsonPatchError(f"Chemin inexistant: /{'/'.join(segments)}")
+
+
+def _add(document, segments, value):
+    container = _resolve_parent(document, segments)
+    key = segments[-1]
+    if isinstance(container, dict):
+        container[key] = value
+    elif isinstance(container, list):
+        container.insert(_list_index(container, key, allow_end=True), value)
+    else:
+        raise JsonPatchError(f"Chemin inexistant: /{'/'.join(segments)}")
+
+
+def _remove(document, segments):
+    container = _resolve_parent(document, segments)
+    key = segments[-1]
+    if isinstance(container, dict):
+        if key not in container:
+            raise JsonPatchError(f"Chemin inexistant: /{'/'.join(segments)}")
+        return container.pop(key)
+    if isinstance(container, list):
+        return container.pop(_list_index(container, key))
+    raise JsonPatchError(f"Chemin inexistant: /{'/'.join(segments)}")
+
+
+def apply_json_patch(document, patch):
+    """
+    Applique un JSON Patch (RFC 6902) à un document.
+    Le document racine ne peut pas être remplacé: chaque opération vise un champ du document.
+
+    Args:
+        document (dict): Document modifié en place
+        patch (list): Opérations
+
+    Returns:
+        dict: Le document modifié
+
+    Raises:
+        JsonPatchTestFailed: Si une opération test échoue
+        JsonPatchError: Si une opération est invalide ou inapplicable (le document peut alors
+            être partiellement modifié: il ne doit pas être enregistré)
+    """
+    for operation in _check_operations(patch):
+        op = operation['op']
+        segments = parse_pointer(operation['path'])
+        if not segments:
+            raise JsonPatchError("Le document entier ne peut pas être remplacé")
+
+        if op == 'test':
+            if _get(document, segments) != operation['value']:
+                raise JsonPatchTestFailed(f"Test échoué sur {operation['path']}")
+        elif op == 'add':
+            _add(document, segments, copy.deepcopy(operation['value']))
+        elif op == 'remove':
+            _remove(document, segments)
+        elif op == 'replace':
+            _remove(document, segments)
+            _add(document, segments, copy.deepcopy(operation['value']))
+        else:
+            source = parse_pointer(operation['from'])
+            if op == 'move':
+                if segments[:len(source)] == source and segments != source:
+                    raise JsonPatchError(f"Impossible de déplacer {operation['from']} dans lui-même")
+                value = _remove(document, source)
+            else:
+                value = copy.deepcopy(_get(document, source))
+            _add(document, segments, value)
+    return document
+
+
+def apply_merge_patch(document, patch):
+    """
+    Applique un JSON Merge Patch (RFC 7386) à un document.
+
+    Args:
+        document (dict): Document modifié en place
+        patch (dict): Valeurs à fusionner (null supprime le champ)
+
+    Returns:
+        dict: Le document modifié
+    """
+    if not isinstance(patch, dict):
+        raise JsonPatchError("Un merge patch doit être un objet JSON")
+    for key, value in patch.items():
+        if value is None:
+            document.pop(key, None)
+        elif isinstance(value, dict):
+            target = document.get(key)
+            if not isinstance(target, dict):
+                target = {}
+            document[key] = apply_merge_patch(target, value)
+        else:
+            document[key] = copy.deepcopy(value)
+    return document
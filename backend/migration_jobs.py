@@ -0,0 +1,211 @@
+"""
+Migration des contrats d'un utilisateur anonyme vers un utilisateur authentifié.
+Les petites migrations sont faites pendant la requête; les grandes sont confiées à une tâche
+de fond dont l'avancement est enregistré dans un manifeste, ce qui permet de la reprendre
+après un redémarrage du serveur.
+
+Une tâche n'est exécutée que par le processus qui détient son verrou {job_id}.lock (verrou fcntl,
+libéré à la fin de la tâche ou à la mort du processus): les workers gunicorn qui démarrent
+pendant qu'elle tourne ne la relancent pas.
+"""
+import os
+import uuid
+import threading
+from datetime import datetime
+
+from atomic_writer import atomic_write_json, try_process_lock
+from storage_codec import read_document
+
+
+def migrate_contract_owner(contract, new_user_id):
+    """
+    Construit la version migrée d'un contrat: seul le propriétaire change, l'ancien
+    propriétaire est conservé dans original_user_id (comme pour un import). La date de
+    modification est attribuée à l'enregistrement (save avec touch=True).
+
+    Args:
+        contract (dict): Contrat à migrer
+        new_user_id (str): ID du nouveau propriétaire
+
+    Returns:
+        dict: Copie migrée du contrat
+    """
+    migrated_contract = contract.copy()
+    migrated_contract['original_user_id'] = contract.get('user_id')
+    migrated_contract['user_id'] = new_user_id
+    return migrated_contract
+
+
+def migrate_contract(contract_store, contract_id, anonymous_id, new_user_id):
+    """
+    Migre un contrat s'il appartient toujours à l'utilisateur anonyme.
+    La lecture et l'écriture sont faites sous le verrou du contrat et l'écriture exige la version
+    lue: une modification concurrente n'est jamais écrasée.
+
+    Args:
+        contract_store (ContractStore): Stockage des contrats
+        contract_id (str): ID du contrat
+        anonymous_id (str): ID de l'utilisateur anonyme
+        new_user_id (str): ID du nouveau propriétaire
+
+    Returns:
+        dict: Le contrat migré, ou None s'il a été supprimé ou a déjà changé de propriétaire
+    """
+    with contract_store.lock(contract_id):
+        contract = contract_store.get(contract_id)
+        # L'index peut contenir des entrées obsolètes; un contrat déjà migré (tâche reprise) est ignoré
+        if contract is None or contract.get('user_id') != anonymous_id:
+            return None
+        migrated_contract = migrate_contract_owner(contract, new_user_id)
+        migrated_contract['version'] = contract_store.save(migrated_contract,
+                                                           expected_version=contract.get('version', 0), touch=True)
+        return migrated_contract
+
+
+class MigrationJobs:
+    """
+    Tâches de migration en arrière-plan.
+    Chaque tâche est décrite par un manifeste {job_id}.json contenant les IDs des contrats
+    à migrer et la position atteinte. Migrer un contrat déjà migré est sans effet: une tâche
+    interrompue peut être reprise depuis son dernier point de sauvegarde sans risque.
+    """
+
+    # Nombre de contrats migrés entre deux enregistrements du manifeste
+    CHECKPOINT_EVERY = 50
+
+    def __init__(self, jobs_dir, contract_store):
+        self.jobs_dir = jobs_dir
+        self.contract_store = contract_store
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        self._running = set()
+        self._lock = threading.Lock()
+
+    def _manifest_path(self, job_id):
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _lock_path(self, job_id):
+        return os.path.join(self.jobs_dir, f"{job_id}.lock")
+
+    def _save(self, job):
+        job['updated_at'] = datetime.now().isoformat()
+        atomic_write_json(self._manifest_path(job['id']), job, ensure_ascii=False)
+
+    def get(self, job_id):
+        """
+        Retourne le manifeste d'une tâche, ou None si elle n'existe pas.
+        """
+        try:
+            return read_document(self._manifest_path(job_id))
+        except (FileNotFoundError, ValueError):
+            return None
+
+    @staticmethod
+    def progress(job):
+        """
+        Retourne l'avancement d'une tâche, sans la liste des contrats restants.
+        """
+        return {
+            'job_id': job['id'],
+            'status': job['status'],
+            'total': job['total'],
+            'migrated': job['migrated'],
+            'skipped': job['skipped'],
+            'errors': job['errors'],
+            'remaining': len(job['contract_ids']) - job['position']
+        }
+
+    def start(self, anonymous_id, new_user_id, contract_ids):
+        """
+        Crée une tâche de migration et la lance en arrière-plan.
+
+        Args:
+            anonymous_id (str): ID de l'utilisateur anonyme
+            new_user_id (str): ID du nouveau propriétaire
+            contract_ids (list): IDs des contrats à migrer
+
+        Returns:
+            dict: Manifeste de la tâche
+        """
+        job = {
+            'id': str(uuid.uuid4()),
+            'anonymous_id': anonymous_id,
+            'new_user_id': new_user_id,
+            'status': 'running',
+            'total': len(contract_ids),
+            'migrated': 0,
+            'skipped': 0,
+            'errors': 0,
+            'contract_ids': list(contract_ids),
+            'position': 0,
+            'created_at': datetime.now().isoformat()
+        }
+        self._save(job)
+        self._spawn(job['id'])
+        return job
+
+    def resume_pending(self):
+        """
+        Relance les tâches interrompues (à appeler au démarrage du serveur).
+
+        Returns:
+            int: Nombre de tâches relancées
+        """
+        resumed = 0
+        for filename in os.listdir(self.jobs_dir):
+            if not filename.endswith('.json') or filename.startswith('.'):
+                continue
+            job = self.get(filename[:-len('.json')])
+            if job is not None and job.get('status') == 'running':
+                if self._spawn(job['id']):
+                    remaining = len(job['contract_ids']) - job['position']
+                    print(f"Reprise de la migration {job['id']} ({remaining} contrats restants)")
+                    resumed += 1
+        return resumed
+
+    def _spawn(self, job_id):
+        # Retourne True si la tâche est lancée par ce processus
+        with self._lock:
+            if job_id in self._running:
+                return False
+            lock_file = try_process_lock(self._lock_path(job_id))
+            if lock_file is None:
+                # Un autre worker exécute la tâche
+                return False
+            self._running.add(job_id)
+        thread = threading.Thread(target=self._run, args=(job_id, lock_file), daemon=True)
+        thread.start()
+        return True
+
+    def _run(self, job_id, lock_file):
+        try:
+            # Relire le manifeste sous le verrou: un autre worker a pu avancer ou terminer la tâche
+            job = self.get(job_id)
+            if job is None or job.get('status') != 'running':
+                return
+
+            contract_ids = job['contract_ids']
+            while job['position'] < len(contract_ids):
+                contract_id = contract_ids[job['position']]
+                try:
+                    # Contrat supprimé, ou déjà migré avant une interruption: ignoré
+                    if migrate_contract(self.contract_store, contract_id, job['anonymous_id'], job['new_user_id']) is None:
+                        job['skipped'] += 1
+                    else:
+                        job['migrated'] += 1
+                except Exception as e:
+                    print(f"Migration {job_id}: erreur sur le contrat {contract_id}: {e}")
+                    job['errors'] += 1
+                job['position'] += 1
+
+                if job['position'] % self.CHECKPOINT_EVERY == 0:
+                    self._save(job)
+
+            job['status'] = 'done'
+            self._save(job)
+            print(f"Migration {job_id} terminée: {job['migrated']} contrats migrés, {job['errors']} erreurs")
+        except Exception as e:
+            print(f"Migration {job_id} interrompue: {e}")
+        finally:
+            with self._lock:
+                self._running.discard(job_id)
+                lock_file.close()
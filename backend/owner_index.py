@@ -0,0 +1,307 @@
+"""
+Index secondaire persistant des propriétaires de contrats.
+Associe l'ID complet et l'ID de base de chaque propriétaire à l'ensemble de ses contrats,
+pour éviter de parcourir tout CONTRACTS_DIR lors des listes, vérifications d'accès et migrations.
+
+Les contrats supprimés, ou passés à un propriétaire d'un autre ID de base, laissent une entrée
+(tombstone) pour l'ID de base de l'ancien propriétaire: la synchronisation du tableau de bord
+(GET /api/contracts/changes) les signale comme supprimés. Contrairement au reste de l'index,
+ces entrées ne peuvent pas être reconstruites à partir des contrats.
+
+Organisation sur disque:
+    owners/u-<clé propriétaire>/<contract_id>   (fichiers marqueurs vides)
+    contracts/<contract_id>                     (propriétaire actuel et résumé du contrat, en JSON)
+    tombstones/u-<ID de base>/<contract_id>     (ancien propriétaire et date de suppression, en JSON)
+    .complete                                   (présent une fois l'index construit)
+"""
+import os
+import json
+from datetime import datetime
+from urllib.parse import quote, unquote
+
+from utils import get_base_user_id
+from atomic_writer import atomic_write_json
+import data_layout
+
+
+class OwnerIndex:
+    """
+    Index propriétaire -> contrats, stocké sous forme de fichiers marqueurs.
+    Chaque opération ne touche que les entrées du contrat concerné.
+    """
+
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        self.owners_dir = os.path.join(index_dir, 'owners')
+        self.contracts_dir = os.path.join(index_dir, 'contracts')
+        self.tombstones_dir = os.path.join(index_dir, 'tombstones')
+        self.complete_marker = os.path.join(index_dir, '.complete')
+        os.makedirs(self.owners_dir, exist_ok=True)
+        os.makedirs(self.contracts_dir, exist_ok=True)
+        os.makedirs(self.tombstones_dir, exist_ok=True)
+
+    @staticmethod
+    def owner_keys(user_id):
+        """
+        Retourne les clés d'index d'un propriétaire (ID complet et ID de base).
+        """
+        user_id = user_id or ''
+        return {user_id, get_base_user_id(user_id)}
+
+    def _owner_dir(self, owner_key):
+        return os.path.join(self.owners_dir, 'u-' + quote(owner_key, safe=''))
+
+    def _reverse_path(self, contract_id):
+        return os.path.join(self.contracts_dir, data_layout.check_id(contract_id))
+
+    def _tombstone_dir(self, base_user_id):
+        return os.path.join(self.tombstones_dir, 'u-' + quote(base_user_id, safe=''))
+
+    def is_complete(self):
+        """
+        Indique si l'index a été entièrement construit à partir des contrats existants.
+        """
+        return os.path.exists(self.complete_marker)
+
+    def mark_complete(self):
+        with open(self.complete_marker, 'w') as f:
+            f.write('1')
+
+    def get_entry(self, contract_id):
+        """
+        Retourne l'entrée indexée d'un contrat ({'user_id': ..., 'summary': ...}),
+        ou None s'il n'est pas indexé.
+        """
+        try:
+            with open(self._reverse_path(contract_id), 'r', encoding='utf-8') as f:
+                content = f.read()
+        except FileNotFoundError:
+            return None
+
+        try:
+            return json.loads(content)
+        except ValueError:
+            # Ancien format: le fichier ne contenait que le user_id
+            return {'user_id': content, 'summary': None}
+
+    def get_owner(self, contract_id):
+        """
+        Retourne le user_id indexé d'un contrat, ou None s'il n'est pas indexé.
+        """
+        entry = self.get_entry(contract_id)
+        return entry['user_id'] if entry is not None else None
+
+    def get_summary(self, contract_id):
+        """
+        Retourne le résumé indexé d'un contrat, ou None s'il n'est pas disponible.
+        """
+        entry = self.get_entry(contract_id)
+        return entry.get('summary') if entry is not None else None
+
+    def contract_ids(self, owner_key):
+        """
+        Liste les IDs des contrats indexés pour une clé propriétaire (ID complet ou ID de base).
+        """
+        try:
+            return os.listdir(self._owner_dir(owner_key))
+        except FileNotFoundError:
+            return []
+
+    def add(self, contract_id, user_id, summary=None):
+        """
+        Indexe (ou réindexe) un contrat pour son propriétaire actuel.
+        Le résumé éventuel est conservé avec l'entrée pour les listes sans lecture du contrat.
+        Les nouvelles entrées sont créées avant la suppression des anciennes: en cas
+        d'interruption, l'index contient au pire des entrées en trop, jamais en moins.
+        """
+        user_id = user_id or ''
+        previous_user_id = self.get_owner(contract_id)
+
+        for owner_key in self.owner_keys(user_id):
+            self._add_marker(owner_key, contract_id)
+
+        if previous_user_id != user_id or summary is not None:
+            # Écriture atomique de l'index inverse; l'index peut être reconstruit, fsync inutile
+            atomic_write_json(self._reverse_path(contract_id), {'user_id': user_id, 'summary': summary},
+                              durable=False, ensure_ascii=False)
+
+        if previous_user_id is not None and previous_user_id != user_id:
+            for owner_key in self.owner_keys(previous_user_id) - self.owner_keys(user_id):
+                self._remove_marker(owner_key, contract_id)
+
+        base_user_id = get_base_user_id(user_id)
+        if previous_user_id is None or get_base_user_id(previous_user_id) != base_user_id:
+            # Contrat (re)devenu visible pour ce propriétaire: il n'est plus supprimé pour lui
+            self._remove_tombstone(base_user_id, contract_id)
+            if previous_user_id is not None:
+                # Le contrat disparaît du tableau de bord de l'ancien propriétaire
+                self._add_tombstone(previous_user_id, contract_id)
+
+    def remove(self, contract_id):
+        """
+        Retire un contrat de l'index.
+        """
+        previous_user_id = self.get_owner(contract_id)
+        if previous_user_id is None:
+            return
+
+        for owner_key in self.owner_keys(previous_user_id):
+            self._remove_marker(owner_key, contract_id)
+            try:
+                # Ne pas conserver les répertoires des propriétaires sans contrat
+                os.rmdir(self._owner_dir(owner_key))
+            except OSError:
+                # Répertoire non vide
+                pass
+
+        try:
+            os.remove(self._reverse_path(contract_id))
+        except FileNotFoundError:
+            pass
+
+        self._add_tombstone(previous_user_id, contract_id)
+
+    def tombstones(self, base_user_id):
+        """
+        Liste les contrats supprimés (ou passés à un autre propriétaire) pour un ID de base.
+
+        Returns:
+            list: Entrées {'id', 'user_id', 'deleted_at'}
+        """
+        tombstone_dir = self._tombstone_dir(base_user_id)
+        try:
+            contract_ids = os.listdir(tombstone_dir)
+        except FileNotFoundError:
+            return []
+
+        tombstones = []
+        for contract_id in contract_ids:
+            if contract_id.startswith('.'):
+                # Fichier temporaire d'une écriture en cours
+                continue
+            try:
+                with open(os.path.join(tombstone_dir, contract_id), 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+            except (FileNotFoundError, ValueError):
+                # Entrée supprimée ou en cours d'écriture
+                continue
+            tombstones.append({'id': contract_id, 'user_id': entry.get('user_id', ''),
+                               'deleted_at': entry.get('deleted_at', '')})
+        return tombstones
+
+    def purge_tombstones(self, before):
+        """
+        Supprime les tombstones antérieures à une date.
+
+        Args:
+            before (str): Date ISO; les suppressions plus anciennes sont oubliées
+
+        Returns:
+            int: Nombre de tombstones supprimées
+        """
+        purged = 0
+        for dirname in os.listdir(self.tombstones_dir):
+            base_user_id = unquote(dirname[len('u-'):])
+            for tombstone in self.tombstones(base_user_id):
+                if tombstone['deleted_at'] < before:
+                    self._remove_tombstone(base_user_id, tombstone['id'])
+                    purged += 1
+            try:
+                os.rmdir(self._tombstone_dir(base_user_id))
+            except OSError:
+                # Répertoire non vide
+                pass
+        return purged
+
+    def _add_tombstone(self, user_id, contract_id):
+        tombstone_dir = self._tombstone_dir(get_base_user_id(user_id))
+        os.makedirs(tombstone_dir, exist_ok=True)
+        atomic_write_json(os.path.join(tombstone_dir, contract_id),
+                          {'user_id': user_id, 'deleted_at': datetime.now().isoformat()},
+                          durable=False, ensure_ascii=False)
+
+    def _remove_tombstone(self, base_user_id, contract_id):
+        try:
+            os.remove(os.path.join(self._tombstone_dir(base_user_id), contract_id))
+        except FileNotFoundError:
+            pass
+
+    def owner_ids(self, prefix=''):
+        """
+        Liste les clés propriétaires indexées commençant par un préfixe (ex: "anon_").
+        """
+        owner_ids = []
+        for dirname in os.listdir(self.owners_dir):
+            owner_key = unquote(dirname[len('u-'):])
+            if owner_key.startswith(prefix):
+                owner_ids.append(owner_key)
+        return owner_ids
+
+    def _add_marker(self, owner_key, contract_id):
+        owner_dir = self._owner_dir(owner_key)
+        # Deux tentatives: le répertoire a pu être supprimé par remove() entre sa création et l'écriture
+        for _ in range(2):
+            os.makedirs(owner_dir, exist_ok=True)
+            try:
+                open(os.path.join(owner_dir, contract_id), 'a').close()
+                return
+            except FileNotFoundError:
+                continue
+
+    def _remove_marker(self, owner_key, contract_id):
+        try:
+            os.remove(os.path.join(self._owner_dir(owner_key), contract_id))
+        except FileNotFoundError:
+            pass
+
+    def rebuild(self, contracts, contract_exists=None):
+        """
+        Reconstruit l'index à partir des contrats fournis, sans l'effacer au préalable,
+        pour que les requêtes servies pendant la reconstruction restent correctes.
+
+        Args:
+            contracts (iterable): Couples (user_id, résumé) des contrats présents sur le disque
+            contract_exists (callable, optional): Indique si un contrat existe toujours, pour ne pas
+                désindexer les contrats créés pendant la reconstruction
+
+        Returns:
+            int: Nombre de contrats indexés
+        """
+        owners = {}
+        for user_id, summary in contracts:
+            contract_id = summary.get('id')
+            if not contract_id:
+                continue
+            owners[contract_id] = user_id or ''
+            self.add(contract_id, owners[contract_id], summary)
+
+        def current_owner(contract_id):
+            if contract_id in owners:
+                return owners[contract_id]
+            if contract_exists is not None and contract_exists(contract_id):
+                return self.get_owner(contract_id)
+            return None
+
+        # Supprimer les entrées obsolètes (contrats supprimés ou ayant changé de propriétaire)
+        for contract_id in os.listdir(self.contracts_dir):
+            if contract_id.startswith('.'):
+                # Fichier temporaire d'une écriture en cours
+                continue
+            if current_owner(contract_id) is None:
+                self.remove(contract_id)
+
+        for dirname in os.listdir(self.owners_dir):
+            owner_key = unquote(dirname[len('u-'):])
+            owner_dir = os.path.join(self.owners_dir, dirname)
+            for contract_id in os.listdir(owner_dir):
+                user_id = current_owner(contract_id)
+                if user_id is None or owner_key not in self.owner_keys(user_id):
+                    self._remove_marker(owner_key, contract_id)
+            try:
+                os.rmdir(owner_dir)
+            except OSError:
+                # Répertoire non vide
+                pass
+
+        self.mark_complete()
+        return len(owners)
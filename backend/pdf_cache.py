@@ -0,0 +1,184 @@
+"""
+Cache des PDF générés, indexé par leur contenu.
+La clé est un hachage des paramètres canonisés du PDF (voir pdf_generator.pdf_builder_args) et des
+versions des templates, de la mise en page et de ReportLab: deux demandes du même contrat inchangé
+partagent la même entrée, et toute modification du contrat, du cessionnaire ou des templates produit
+une nouvelle clé. Les entrées ne sont donc jamais invalidées, seulement évincées.
+
+Les PDF mis en cache sont produits en mode déterministe: une clé désigne toujours les mêmes octets,
+et sert d'ETag fort aux téléchargements, vérifiable sans générer ni lire le PDF.
+
+Deux niveaux, chacun borné en octets avec éviction LRU:
+- en mémoire du worker (voir bounded_lru.py);
+- sur le disque (backend/tmp/pdf_cache), partagé entre les workers. La dernière utilisation d'un
+  fichier est sa date de modification, mise à jour à chaque lecture (même ordre que tmp_janitor.py).
+"""
+import os
+import json
+import hashlib
+import threading
+
+import reportlab
+
+from atomic_writer import atomic_write_bytes
+from bounded_lru import BoundedLRU
+from contract_templates import TEMPLATE_VERSION
+from pdf_generator import PDF_LAYOUT_VERSION
+
+
+def pdf_cache_key(builder_args):
+    """
+    Calcule la clé de cache d'un PDF.
+
+    Args:
+        builder_args (dict): Paramètres produits par pdf_generator.pdf_builder_args
+
+    Returns:
+        str: Hachage SHA-256 des paramètres et des versions des templates, de la mise en page et de ReportLab
+    """
+    payload = json.dumps([TEMPLATE_VERSION, PDF_LAYOUT_VERSION, reportlab.Version, builder_args],
+                         sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class PdfCache:
+    """
+    Cache LRU des PDF générés, en mémoire puis sur le disque.
+    Un budget à 0 désactive le niveau correspondant.
+    """
+
+    def __init__(self, cache_dir, memory_max_bytes=32 * 1024 * 1024, disk_max_bytes=256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self._memory = BoundedLRU(max_bytes=memory_max_bytes)
+        # Taille estimée du niveau disque (les autres workers y écrivent aussi): recalculée
+        # par un parcours du répertoire au premier ajout et à chaque dépassement du budget
+        self._disk_bytes = None
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self.disk_hits = 0
+        self.misses = 0
+        self.disk_evictions = 0
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f'{key}.pdf')
+
+    def get_or_render(self, key, render):
+        """
+        Retourne le PDF associé à une clé, en le générant si nécessaire.
+
+        Args:
+            key (str): Clé calculée par pdf_cache_key
+            render (callable): Fonction sans argument qui génère le PDF (en mode déterministe)
+
+        Returns:
+            bytes: Contenu du PDF
+        """
+        pdf = self._memory.get(key)
+        if pdf is not None:
+            return pdf
+
+        pdf = self._get_disk(key)
+        if pdf is not None:
+            with self._lock:
+                self.disk_hits += 1
+            self._memory.put(key, pdf)
+            return pdf
+
+        with self._lock:
+            self.misses += 1
+        pdf = render()
+        self._memory.put(key, pdf)
+        self._put_disk(key, pdf)
+        return pdf
+
+    def _get_disk(self, key):
+        if self.disk_max_bytes <= 0:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                pdf = f.read()
+            # Marquer l'entrée comme récemment utilisée
+            os.utime(path)
+        except FileNotFoundError:
+            # Jamais écrit, ou évincé par un worker ou par le nettoyage de tmp
+            return None
+        except OSError as e:
+            print(f"Cache des PDF: lecture impossible de {path}: {e}")
+            return None
+        return pdf
+
+    def _put_disk(self, key, pdf):
+        if len(pdf) > self.disk_max_bytes:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Fichier jetable: pas de fsync
+            atomic_write_bytes(path, pdf, durable=False)
+        except OSError as e:
+            print(f"Cache des PDF: écriture impossible de {path}: {e}")
+            return
+
+        with self._disk_lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self._scan_disk()[1]
+            else:
+                self._disk_bytes += len(pdf)
+            if self._disk_bytes > self.disk_max_bytes:
+                self._evict_disk()
+
+    def _scan_disk(self):
+        # ([(dernière utilisation, chemin, taille)], taille totale) des fichiers du niveau disque
+        files = []
+        for root, dirs, names in os.walk(self.cache_dir):
+            for name in names:
+                if not name.endswith('.pdf'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, path, stat.st_size))
+        return files, sum(size for _, _, size in files)
+
+    def _evict_disk(self):
+        files, total = self._scan_disk()
+        files.sort()
+        for _, path, size in files:
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+                self.disk_evictions += 1
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Cache des PDF: suppression impossible de {path}: {e}")
+                continue
+            total -= size
+        self._disk_bytes = total
+
+    def stats(self):
+        """
+        Retourne l'occupation et les compteurs des deux niveaux du cache.
+        """
+        memory = self._memory.stats()
+        with self._lock:
+            lookups = memory['hits'] + self.disk_hits + self.misses
+            return {
+                'memory_entries': memory['entries'],
+                'memory_bytes': memory['bytes'],
+                'memory_max_bytes': self.memory_max_bytes,
+                'disk_bytes': self._disk_bytes,
+                'disk_max_bytes': self.disk_max_bytes,
+                'memory_hits': memory['hits'],
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'memory_evictions': memory['evictions'],
+                'disk_evictions': self.disk_evictions,
+                'hit_rate': round((memory['hits'] + self.disk_hits) / lookups, 4) if lookups else 0.0
+            }
@@ -48,27 +48,125 @@ def create_temp_file(prefix="", suffix=""):
     filename = os.path.join(TMP_DIR, f"{prefix}{uuid.uuid4().hex}{suffix}")
     return filename
 
-def generate_pdf(contract_type, is_free, author_type, author_info,
-                work_description, image_description, supports,
-                additional_rights, remuneration, is_exclusive, cessionnaire_info=None):
+# Version de la mise en page des PDF (styles, champs interactifs), à incrémenter à chaque
+# modification de ce module: avec TEMPLATE_VERSION, elle fait partie de la clé du cache des PDF
+PDF_LAYOUT_VERSION = 1
+
+# Hauteur réservée sous le bloc des signatures pour les mentions "Lu et approuvé" et les signatures
+SIGNATURE_FIELDS_HEIGHT = 60
+
+
+def get_cedant_label(contract_type):
     """
-    Génère un PDF du contrat avec des champs interactifs.
-    
+    Retourne la désignation du cédant selon le type de contrat.
+    """
+    if "Auteur (droits d'auteur)" in contract_type and "Image (droit à l'image)" in contract_type:
+        return "l'Auteur et Modèle"
+    elif "Auteur (droits d'auteur)" in contract_type:
+        return "l'Auteur"
+    return "le Modèle"
+
+
+class SignatureFieldsArea(Spacer):
+    """
+    Espace réservé sous le bloc des signatures, où sont placés les champs interactifs.
+    """
+
+    def __init__(self, height=SIGNATURE_FIELDS_HEIGHT):
+        super().__init__(1, height)
+
+
+class ContractDocTemplate(SimpleDocTemplate):
+    """
+    Document du contrat dont les champs interactifs (lieu, date, mentions et signatures) sont
+    ajoutés pendant la mise en page, à la position réelle du bloc des signatures.
+
     Args:
-        contract_type (list): Liste des types de contrats sélectionnés
-        is_free (str): Type de cession ("Gratuite" ou "Onéreuse")
-        author_type (str): Type d'auteur ("Personne physique" ou "Personne morale")
-        author_info (dict): Informations sur l'auteur
-        work_description (str): Description de l'œuvre
-        image_description (str): Description de l'image
-        supports (list): Liste des supports sélectionnés
-        additional_rights (list): Liste des droits supplémentaires sélectionnés
-        remuneration (str): Modalités de rémunération
-        is_exclusive (bool): True si la cession est exclusive, False sinon
-        cessionnaire_info (dict, optional): Informations sur le cessionnaire
-        
+        place_date_paragraph (Paragraph): Ligne "Fait à ..., le ..." du bloc des signatures
+        cedant_label (str): Désignation du cédant (voir get_cedant_label)
+    """
+
+    def __init__(self, filename, place_date_paragraph=None, cedant_label="le Cédant", **kw):
+        super().__init__(filename, **kw)
+        self.place_date_paragraph = place_date_paragraph
+        self.cedant_label = cedant_label
+
+    def afterFlowable(self, flowable):
+        # Position du bas de l'élément qui vient d'être dessiné, en coordonnées de la page
+        x = self.frame._x
+        y = self.frame._y + flowable.getSpaceAfter()
+
+        if flowable is self.place_date_paragraph:
+            self._add_place_date_fields(flowable, x, y)
+        elif isinstance(flowable, SignatureFieldsArea):
+            self._add_signature_fields(x, y, flowable.height)
+
+    def _add_place_date_fields(self, paragraph, x, y):
+        # Champs posés sur les blancs de la ligne "Fait à ________________, le ________________"
+        style = paragraph.style
+        blank = "_" * 16
+        width = pdfmetrics.stringWidth(blank, style.fontName, style.fontSize)
+        place_x = x + pdfmetrics.stringWidth("Fait à ", style.fontName, style.fontSize)
+        date_x = x + pdfmetrics.stringWidth(f"Fait à {blank}, le ", style.fontName, style.fontSize)
+        form = self.canv.acroForm
+
+        form.textfield(name='lieu', tooltip='Lieu de signature',
+                       x=place_x, y=y, width=width, height=style.leading,
+                       borderWidth=0, forceBorder=True)
+
+        form.textfield(name='date', tooltip='Date de signature',
+                       x=date_x, y=y, width=width, height=style.leading,
+                       borderWidth=0, forceBorder=True)
+
+    def _add_signature_fields(self, x, y, height):
+        # Une colonne par partie: la mention en haut de l'espace réservé, la signature en dessous
+        top = y + height
+        column_x = (x, x + self.width / 2)
+        form = self.canv.acroForm
+
+        form.textfield(name='mention_cedant', tooltip='Mention "Lu et approuvé"',
+                       x=column_x[0], y=top - 15, width=150, height=15,
+                       borderWidth=0, forceBorder=True)
+
+        form.textfield(name='mention_cessionnaire', tooltip='Mention "Lu et approuvé"',
+                       x=column_x[1], y=top - 15, width=150, height=15,
+                       borderWidth=0, forceBorder=True)
+
+        form.textfield(name='signature_cedant', tooltip=f'Signature de {self.cedant_label}',
+                       x=column_x[0], y=top - 50, width=150, height=30,
+                       borderWidth=0, forceBorder=True)
+
+        form.textfield(name='signature_cessionnaire', tooltip='Signature du Cessionnaire',
+                       x=column_x[1], y=top - 50, width=150, height=30,
+                       borderWidth=0, forceBorder=True)
+
+
+def find_place_date_paragraph(contract_elements, contract_type):
+    """
+    Retrouve la ligne "Fait à ..., le ..." du bloc des signatures parmi les éléments du contrat.
+
+    Returns:
+        Paragraph: L'élément, ou None s'il n'a pas été trouvé
+    """
+    signatures = ContractTemplates.get_signatures_template(contract_type)
+    place_date = next((p for p in signatures.split('\n\n') if p.strip()), None)
+    for element in reversed(contract_elements):
+        if isinstance(element, Paragraph) and element.text == place_date:
+            return element
+    return None
+
+
+def pdf_builder_args(contract_type, is_free, author_type, author_info,
+                     work_description, image_description, supports,
+                     additional_rights, remuneration, is_exclusive, cessionnaire_info=None):
+    """
+    Convertit les paramètres d'un PDF en paramètres du ContractBuilder: type de cession en booléen,
+    exclusivité et droits supplémentaires réservés aux cessions onéreuses, supports par défaut.
+    Deux jeux de paramètres qui produisent le même contrat donnent le même résultat, qui sert
+    de clé au cache des PDF (voir pdf_cache.py).
+
     Returns:
-        str: Chemin vers le fichier PDF généré
+        dict: Paramètres de ContractBuilder.build_contract_elements
     """
     # Conversion des paramètres
     is_free_bool = (is_free == "Gratuite")
@@ -81,23 +179,50 @@ def generate_pdf(contract_type, is_free, author_type, author_info,
     # Ajouter les supports par défaut
     final_supports = ensure_default_supports(supports)
     
-    # Créer un nom de fichier temporaire pour le PDF
-    output_filename = create_temp_file(prefix="contrat_cession_", suffix=".pdf")
-    
+    return {
+        'contract_type': contract_type, 'is_free': is_free_bool, 'author_type': author_type,
+        'author_info': author_info, 'work_description': work_description,
+        'image_description': image_description, 'supports': final_supports,
+        'additional_rights': final_additional_rights, 'remuneration': remuneration,
+        'is_exclusive': is_exclusive_bool, 'cessionnaire_info': cessionnaire_info
+    }
+
+
+def render_pdf(builder_args, deterministic=False):
+    """
+    Met en page le PDF d'un contrat, en mémoire.
+    Le contenu et les champs de signature sont produits en une seule mise en page.
+
+    En mode déterministe, ReportLab n'écrit ni la date de génération ni un identifiant aléatoire
+    (invariant): les mêmes paramètres donnent toujours les mêmes octets, avec la même version de
+    ReportLab (voir pdf_cache.pdf_cache_key). Les autres métadonnées sont tirées du contrat.
+
+    Args:
+        builder_args (dict): Paramètres produits par pdf_builder_args
+        deterministic (bool, optional): Produire un PDF reproductible à l'octet près
+
+    Returns:
+        bytes: Contenu du PDF
+    """
     # Générer le contenu du contrat avec les paramètres mis à jour
-    contract_elements = ContractBuilder.build_contract_elements(
-        contract_type, is_free_bool, author_type, author_info,
-        work_description, image_description, final_supports,
-        final_additional_rights, remuneration, is_exclusive_bool,
-        cessionnaire_info=cessionnaire_info
-    )
+    contract_elements = ContractBuilder.build_contract_elements(**builder_args)
+    
+    # Réserver la place des mentions et des signatures sous le bloc des signatures
+    contract_elements.append(SignatureFieldsArea())
     
     # Créer un document PDF avec moins d'options pour accélérer la génération
     buffer = io.BytesIO()
     
     # Utiliser des marges plus petites et des réglages plus simples
-    doc = SimpleDocTemplate(
+    contract_type = builder_args['contract_type']
+    doc = ContractDocTemplate(
         buffer, 
+        place_date_paragraph=find_place_date_paragraph(contract_elements, contract_type),
+        cedant_label=get_cedant_label(contract_type),
+        title=ContractTemplates.get_title(contract_type),
+        author="LexForge",
+        creator="LexForge",
+        invariant=1 if deterministic else None,
         pagesize=A4,
         rightMargin=15*mm, 
         leftMargin=15*mm,
@@ -105,58 +230,52 @@ def generate_pdf(contract_type, is_free, author_type, author_info,
         bottomMargin=15*mm
     )
     
-    # Construire le document en une seule passe
+    # Construire le document et ses champs interactifs en une seule passe
     doc.build(contract_elements)
     
-    # Ajouter des champs interactifs pour les signatures
-    buffer.seek(0)
-    
-    # Version simplifiée des champs interactifs dans un second fichier
-    p = canvas.Canvas(output_filename, pagesize=A4)
-    form = p.acroForm
-    
-    # Déterminer le nom du cédant en fonction du type de contrat
-    if "Auteur (droits d'auteur)" in contract_type and "Image (droit à l'image)" in contract_type:
-        cedant_label = "l'Auteur et Modèle"
-    elif "Auteur (droits d'auteur)" in contract_type:
-        cedant_label = "l'Auteur"
-    else:
-        cedant_label = "le Modèle"
-    
-    # Ajouter seulement les champs essentiels
-    form.textfield(name='lieu', tooltip='Lieu de signature',
-                  x=80, y=120, width=100, height=15,
-                  borderWidth=0, forceBorder=True)
-    
-    form.textfield(name='date', tooltip='Date de signature',
-                  x=230, y=120, width=100, height=15, 
-                  borderWidth=0, forceBorder=True)
-    
-    form.textfield(name='mention_cedant', tooltip='Mention "Lu et approuvé"',
-                  x=70, y=95, width=150, height=15,
-                  borderWidth=0, forceBorder=True)
-    
-    form.textfield(name='mention_cessionnaire', tooltip='Mention "Lu et approuvé"',
-                  x=350, y=95, width=150, height=15,
-                  borderWidth=0, forceBorder=True)
-    
-    form.textfield(name='signature_cedant', tooltip=f'Signature de {cedant_label}',
-                  x=70, y=60, width=150, height=30,
-                  borderWidth=0, forceBorder=True)
-    
-    form.textfield(name='signature_cessionnaire', tooltip='Signature du Cessionnaire',
-                  x=350, y=60, width=150, height=30,
-                  borderWidth=0, forceBorder=True)
+    return buffer.getvalue()
+
+
+def generate_pdf(contract_type, is_free, author_type, author_info,
+                work_description, image_description, supports,
+                additional_rights, remuneration, is_exclusive, cessionnaire_info=None, as_bytes=False,
+                deterministic=False):
+    """
+    Génère un PDF du contrat avec des champs interactifs.
+    Le PDF est écrit une seule fois sur le disque, ou renvoyé directement en mémoire (as_bytes).
     
-    # Ne pas essayer d'ajouter des champs de paraphe sur chaque page
-    # Cela causait une erreur car SimpleDocTemplate n'a pas d'attribut page_count
+    Args:
+        contract_type (list): Liste des types de contrats sélectionnés
+        is_free (str): Type de cession ("Gratuite" ou "Onéreuse")
+        author_type (str): Type d'auteur ("Personne physique" ou "Personne morale")
+        author_info (dict): Informations sur l'auteur
+        work_description (str): Description de l'œuvre
+        image_description (str): Description de l'image
+        supports (list): Liste des supports sélectionnés
+        additional_rights (list): Liste des droits supplémentaires sélectionnés
+        remuneration (str): Modalités de rémunération
+        is_exclusive (bool): True si la cession est exclusive, False sinon
+        cessionnaire_info (dict, optional): Informations sur le cessionnaire
+        as_bytes (bool, optional): Renvoyer le contenu du PDF au lieu de l'écrire dans TMP_DIR
+        deterministic (bool, optional): Produire un PDF reproductible à l'octet près (voir render_pdf)
+        
+    Returns:
+        str: Chemin vers le fichier PDF généré, ou bytes: Contenu du PDF si as_bytes
+    """
+    pdf = render_pdf(pdf_builder_args(
+        contract_type, is_free, author_type, author_info,
+        work_description, image_description, supports,
+        additional_rights, remuneration, is_exclusive,
+        cessionnaire_info=cessionnaire_info
+    ), deterministic=deterministic)
     
-    # Finaliser et sauvegarder le PDF
-    p.save()
+    if as_bytes:
+        return pdf
     
-    # Sauvegarder le PDF dans un fichier
+    # Sauvegarder le PDF dans un fichier temporaire
+    output_filename = create_temp_file(prefix="contrat_cession_", suffix=".pdf")
     with open(output_filename, 'wb') as f:
-        f.write(buffer.getvalue())
+        f.write(pdf)
     
     return output_filename
 
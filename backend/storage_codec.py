@@ -0,0 +1,316 @@
+"""
+Encodage sur disque des contrats et des profils utilisateurs.
+Les documents peuvent être écrits en JSON indenté (format historique), en JSON compact
+(encodé avec orjson s'il est installé) ou en msgpack. La lecture détecte le format du
+fichier: les anciens fichiers restent lisibles sans conversion préalable.
+
+Le codec utilisé pour les écritures est choisi par la variable LEXFORGE_STORAGE_CODEC
+('json', 'json-compact' ou 'msgpack', 'json-compact' par défaut).
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+from atomic_writer import atomic_write_bytes, KeyedLock, try_process_lock
+import data_layout
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+CODECS = ('json', 'json-compact', 'msgpack')
+DEFAULT_CODEC = 'json-compact'
+
+
+def _encode_json(document):
+    return json.dumps(document, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+def _encode_json_compact(document):
+    if orjson is not None:
+        return orjson.dumps(document)
+    return json.dumps(document, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _encode_msgpack(document):
+    return msgpack.packb(document, use_bin_type=True)
+
+
+_ENCODERS = {
+    'json': _encode_json,
+    'json-compact': _encode_json_compact,
+    'msgpack': _encode_msgpack,
+}
+
+
+def check_codec(codec):
+    """
+    Vérifie qu'un codec existe et que sa dépendance est installée.
+
+    Raises:
+        ValueError: Si le codec est inconnu ou indisponible
+    """
+    if codec not in CODECS:
+        raise ValueError(f"Codec de stockage inconnu: {codec} (attendu: {', '.join(CODECS)})")
+    if codec == 'msgpack' and msgpack is None:
+        raise ValueError("Le codec msgpack nécessite le paquet msgpack (pip install msgpack)")
+    return codec
+
+
+def get_default_codec():
+    """
+    Retourne le codec configuré pour les écritures.
+    """
+    return check_codec(os.environ.get('LEXFORGE_STORAGE_CODEC', DEFAULT_CODEC))
+
+
+def detect_codec(data):
+    """
+    Détecte le format d'un contenu lu sur le disque.
+    Un document JSON commence par '{' ou '[' (éventuellement après des espaces ou un BOM),
+    une map msgpack par un octet 0x80-0x8f, 0xde ou 0xdf.
+    """
+    stripped = data.lstrip(b' \t\r\n\xef\xbb\xbf')
+    if not stripped or stripped[:1] in (b'{', b'['):
+        return 'json'
+    if stripped[0] in range(0x80, 0x90) or stripped[0] in (0xde, 0xdf):
+        return 'msgpack'
+    return 'json'
+
+
+def encode(document, codec=None):
+    """
+    Encode un document avec le codec demandé (ou le codec configuré).
+
+    Args:
+        document: Document à encoder
+        codec (str, optional): Nom du codec
+
+    Returns:
+        bytes: Contenu à écrire sur le disque
+    """
+    return _ENCODERS[check_codec(codec) if codec else get_default_codec()](document)
+
+
+def decode(data):
+    """
+    Décode un contenu lu sur le disque, quel que soit son format.
+
+    Args:
+        data (bytes): Contenu du fichier
+
+    Returns:
+        Le document décodé
+    """
+    if detect_codec(data) == 'msgpack':
+        if msgpack is None:
+            raise ValueError("Fichier au format msgpack illisible: le paquet msgpack n'est pas installé")
+        return msgpack.unpackb(data, raw=False)
+
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # orjson refuse le BOM et certains encodages acceptés par le module json
+            pass
+    return json.loads(data)
+
+
+def read_document(path):
+    """
+    Lit et décode un fichier de données.
+
+    Raises:
+        FileNotFoundError: Si le fichier n'existe pas
+    """
+    with open(path, 'rb') as f:
+        return decode(f.read())
+
+
+def write_document(path, document, codec=None, durable=True):
+    """
+    Encode un document et l'écrit de manière atomique.
+
+    Args:
+        path (str): Chemin du fichier
+        document: Document à écrire
+        codec (str, optional): Nom du codec (par défaut le codec configuré)
+        durable (bool, optional): Forcer l'écriture sur disque avant le renommage
+
+    Returns:
+        os.stat_result: État du fichier écrit (voir atomic_write_bytes)
+    """
+    return atomic_write_bytes(path, encode(document, codec), durable=durable)
+
+
+# Sous-documents stockés à côté des contrats (voir contract_store.SUBDOCUMENT_FIELDS)
+SUBDOCUMENT_SUFFIXES = ('.elements', '.comments')
+
+
+def _data_files(data_dir):
+    """
+    Liste les fichiers de contrats (avec leurs sous-documents) et de profils d'un répertoire de données.
+
+    Yields:
+        tuple: (clé de verrou, chemin). La clé est celle sous laquelle l'application écrit le
+            fichier: l'ID du contrat pour un contrat et ses sous-documents, le nom du fichier pour un profil
+    """
+    contracts_dir = os.path.join(data_dir, 'contracts')
+    for suffix in ('.json',) + SUBDOCUMENT_SUFFIXES:
+        for filename, path in data_layout.iter_files(contracts_dir, suffix=suffix):
+            yield filename[:-len(suffix)], path
+    for filename, path in data_layout.iter_files(os.path.join(data_dir, 'user_profiles'), prefix='user_profile_'):
+        yield filename, path
+
+
+def migrate(data_dir, codec):
+    """
+    Réécrit les contrats, leurs sous-documents et les profils existants avec le codec demandé.
+    Les fichiers déjà au bon format ne sont pas réécrits.
+    Chaque fichier est lu et réécrit sous le verrou de son contrat ou de son profil (data/locks,
+    voir atomic_writer.KeyedLock): la migration peut tourner pendant que l'API écrit, sauf si
+    elle regroupe les écritures (verrou des écrivains pris en mode partagé, comme le stockage).
+
+    Args:
+        data_dir (str): Répertoire de données (contenant contracts/ et user_profiles/)
+        codec (str): Codec cible
+
+    Returns:
+        dict: Nombre de fichiers réécrits, ignorés et en erreur, octets avant et après
+
+    Raises:
+        RuntimeError: Si un processus qui regroupe les écritures détient le répertoire de données
+    """
+    check_codec(codec)
+    lock_dir = os.path.join(data_dir, 'locks')
+    writers_lock = try_process_lock(os.path.join(lock_dir, data_layout.WRITERS_LOCK_FILENAME), exclusive=False)
+    if writers_lock is None:
+        raise RuntimeError(
+            "Un processus regroupe les écritures dans le répertoire de données (LEXFORGE_WRITE_COALESCE_MS): "
+            "ses écritures différées écraseraient la migration, l'arrêter avant de migrer"
+        )
+
+    report = {'rewritten': 0, 'unchanged': 0, 'errors': 0, 'bytes_before': 0, 'bytes_after': 0}
+    locks = KeyedLock(lock_dir)
+
+    try:
+        for key, path in _data_files(data_dir):
+            with locks.hold(key):
+                try:
+                    with open(path, 'rb') as f:
+                        data = f.read()
+                except FileNotFoundError:
+                    # Supprimé ou déplacé depuis le parcours
+                    continue
+                try:
+                    encoded = encode(decode(data), codec)
+                except Exception as e:
+                    print(f"Erreur lors de la conversion de {path}: {e}")
+                    report['errors'] += 1
+                    continue
+
+                report['bytes_before'] += len(data)
+                report['bytes_after'] += len(encoded)
+                if encoded == data:
+                    report['unchanged'] += 1
+                    continue
+
+                atomic_write_bytes(path, encoded)
+                report['rewritten'] += 1
+    finally:
+        writers_lock.close()
+
+    return report
+
+
+def benchmark(data_dir, repeat=20):
+    """
+    Mesure, pour chaque codec disponible, la taille sur disque et le temps de décodage
+    des contrats existants. Aucun fichier n'est modifié.
+
+    Args:
+        data_dir (str): Répertoire de données
+        repeat (int, optional): Nombre de décodages par document
+
+    Returns:
+        dict: Par codec, octets totaux, octets moyens et temps de décodage moyen (µs) par contrat
+    """
+    documents = [
+        read_document(path)
+        for filename, path in data_layout.iter_files(os.path.join(data_dir, 'contracts'))
+    ]
+
+    results = {}
+    if not documents:
+        return results
+
+    for codec in CODECS:
+        if codec == 'msgpack' and msgpack is None:
+            continue
+        encoded = [encode(document, codec) for document in documents]
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for data in encoded:
+                # Le format historique est mesuré avec le module json, comme avant la migration
+                if codec == 'json':
+                    json.loads(data)
+                else:
+                    decode(data)
+        elapsed = time.perf_counter() - start
+        total_bytes = sum(len(data) for data in encoded)
+        results[codec] = {
+            'contracts': len(documents),
+            'total_bytes': total_bytes,
+            'bytes_per_contract': round(total_bytes / len(documents)),
+            'parse_us_per_contract': round(elapsed / (repeat * len(documents)) * 1e6, 1)
+        }
+
+    return results
+
+
+if __name__ == "__main__":
+    DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+    parser = argparse.ArgumentParser(description="Encodage sur disque des données LexForge")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    migrate_parser = subparsers.add_parser('migrate', help="Réécrit les contrats, sous-documents et profils avec le codec demandé")
+    migrate_parser.add_argument('--data-dir', default=DATA_DIR)
+    migrate_parser.add_argument('--codec', choices=CODECS, default=None)
+
+    bench_parser = subparsers.add_parser('benchmark', help="Compare la taille et le temps de lecture des contrats par codec")
+    bench_parser.add_argument('--data-dir', default=DATA_DIR)
+    bench_parser.add_argument('--repeat', type=int, default=20)
+
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        try:
+            codec = check_codec(args.codec or get_default_codec())
+        except ValueError as e:
+            parser.error(str(e))
+        try:
+            report = migrate(args.data_dir, codec)
+        except RuntimeError as e:
+            print(f"Migration impossible: {e}")
+            sys.exit(1)
+        print(f"Codec {codec}: {report['rewritten']} fichiers réécrits, {report['unchanged']} inchangés, "
+              f"{report['errors']} erreurs ({report['bytes_before']} -> {report['bytes_after']} octets)")
+        sys.exit(1 if report['errors'] else 0)
+    elif args.command == 'benchmark':
+        results = benchmark(args.data_dir, args.repeat)
+        if not results:
+            print("Aucun contrat à mesurer")
+        for codec, result in results.items():
+            print(f"{codec:>13}: {result['bytes_per_contract']:>8} octets/contrat, "
+                  f"{result['parse_us_per_contract']:>8} µs/contrat ({result['contracts']} contrats, "
+                  f"{result['total_bytes']} octets)")
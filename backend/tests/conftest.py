@@ -0,0 +1,49 @@
+"""
+Configuration commune des tests du backend (python -m pytest depuis backend/).
+L'application est importée une seule fois, avec des répertoires de données et temporaire
+jetables; chaque test d'API reçoit son propre stockage des contrats.
+"""
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from contract_store import JsonContractStore, SqliteContractStore  # noqa: E402
+
+STORE_BACKENDS = ('json', 'sqlite')
+
+# Utilisateur propriétaire des contrats créés par les tests
+USER_ID = 'user_tests_clerk'
+
+
+def make_store(backend, directory):
+    """
+    Crée un stockage des contrats vide dans un répertoire.
+    """
+    if backend == 'sqlite':
+        return SqliteContractStore(os.path.join(directory, 'contracts.sqlite3'))
+    return JsonContractStore(os.path.join(directory, 'contracts'))
+
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    os.environ['LEXFORGE_DATA_DIR'] = str(tmp_path_factory.mktemp('data'))
+    os.environ['LEXFORGE_TMP_DIR'] = str(tmp_path_factory.mktemp('tmp'))
+    os.environ['LEXFORGE_TMP_JANITOR_INTERVAL_MINUTES'] = '0'
+    import app
+    return app
+
+
+@pytest.fixture(params=STORE_BACKENDS)
+def store(request, tmp_path):
+    return make_store(request.param, str(tmp_path))
+
+
+@pytest.fixture
+def client(app_module, store, monkeypatch):
+    # Les endpoints utilisent le stockage global du module
+    monkeypatch.setattr(app_module, 'contract_store', store)
+    return app_module.app.test_client()
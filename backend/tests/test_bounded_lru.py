@@ -0,0 +1,55 @@
+"""
+Tests de bounded_lru.py: éviction LRU en nombre d'entrées et en octets, validité et compteurs.
+"""
+import pytest
+
+from bounded_lru import BoundedLRU
+
+
+def test_evicts_least_recently_used_entry():
+    cache = BoundedLRU(max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    assert cache.stats() == {'entries': 2, 'max_entries': 2, 'hits': 3, 'misses': 1, 'evictions': 1,
+                             'hit_rate': 0.75}
+
+
+def test_byte_budget():
+    cache = BoundedLRU(max_bytes=10)
+    cache.put('a', b'12345')
+    cache.put('b', b'1234')
+    cache.put('a', b'123')
+    cache.put('trop-grand', b'12345678901')
+    cache.put('c', b'12345')
+
+    assert cache.get('trop-grand') is None
+    assert cache.get('b') is None
+    stats = cache.stats()
+    assert (stats['entries'], stats['bytes'], stats['max_bytes'], stats['evictions']) == (2, 8, 10, 1)
+
+
+def test_invalid_entry_is_a_miss():
+    cache = BoundedLRU(max_entries=4)
+    cache.put('a', ('v1', 'document'))
+    assert cache.get('a', is_valid=lambda entry: entry[0] == 'v2') is None
+    assert cache.get('a', is_valid=lambda entry: entry[0] == 'v1') == ('v1', 'document')
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_zero_budget_disables_cache():
+    cache = BoundedLRU(max_entries=0)
+    cache.put('a', 1)
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+def test_requires_exactly_one_budget():
+    with pytest.raises(ValueError):
+        BoundedLRU()
+    with pytest.raises(ValueError):
+        BoundedLRU(max_entries=1, max_bytes=1)
@@ -0,0 +1,56 @@
+"""
+Tests de la synchronisation incrémentale (list_changes): contrats modifiés et supprimés après un
+curseur, pagination à dates égales et changement de propriétaire, sur les deux backends.
+"""
+from conftest import USER_ID
+
+ANONYMOUS_ID = 'anon_tests'
+
+
+def new_contract(contract_id, user_id=USER_ID, **fields):
+    return dict({'id': contract_id, 'user_id': user_id, 'title': contract_id, 'is_draft': True}, **fields)
+
+
+def sync(store, user_id, cursor=None, limit=None):
+    # Parcourt toutes les pages à partir d'un curseur
+    contracts, deleted = [], []
+    while True:
+        page, page_deleted, cursor, has_more = store.list_changes(user_id, cursor, limit)
+        contracts += [summary['id'] for summary in page]
+        deleted += [tombstone['id'] for tombstone in page_deleted]
+        if not has_more:
+            return contracts, deleted, cursor
+
+
+def test_save_and_delete_after_cursor_are_returned(store):
+    store.save(new_contract('contrat-a'), touch=True)
+    store.save(new_contract('contrat-b'), touch=True)
+    _, _, cursor = sync(store, USER_ID)
+
+    store.save(new_contract('contrat-a', title='Modifié'), touch=True)
+    store.delete('contrat-b')
+
+    assert sync(store, USER_ID, cursor)[:2] == (['contrat-a'], ['contrat-b'])
+
+
+def test_changes_with_same_updated_at_are_split_across_pages(store):
+    store.save(new_contract('contrat-avant', updated_at='2024-01-01T00:00:00'))
+    _, _, cursor = sync(store, USER_ID)
+    for contract_id in ('contrat-x', 'contrat-y', 'contrat-z'):
+        store.save(new_contract(contract_id, updated_at='2024-01-02T00:00:00'))
+
+    contracts, deleted, _ = sync(store, USER_ID, cursor, limit=1)
+
+    assert contracts == ['contrat-x', 'contrat-y', 'contrat-z']
+    assert deleted == []
+
+
+def test_owner_change_produces_tombstone_for_previous_owner(store):
+    store.save(new_contract('contrat-anonyme', ANONYMOUS_ID), touch=True)
+    contracts, _, anonymous_cursor = sync(store, ANONYMOUS_ID)
+    assert contracts == ['contrat-anonyme']
+
+    store.save(new_contract('contrat-anonyme', original_user_id=ANONYMOUS_ID), touch=True)
+
+    assert sync(store, ANONYMOUS_ID, anonymous_cursor)[:2] == ([], ['contrat-anonyme'])
+    assert sync(store, USER_ID)[0] == ['contrat-anonyme']
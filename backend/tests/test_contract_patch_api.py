@@ -0,0 +1,87 @@
+"""
+Tests de PATCH /api/contracts/<id>: champs gérés par le serveur et échecs des opérations test,
+sur les deux backends de stockage.
+"""
+import pytest
+
+from conftest import USER_ID
+from json_patch import JSON_PATCH_MEDIA_TYPE, MERGE_PATCH_MEDIA_TYPE
+
+PROTECTED_FIELDS = ('id', 'user_id', 'original_user_id', 'created_at', 'updated_at', 'schema_version', 'version')
+
+
+@pytest.fixture
+def contract_id(store):
+    store.save({
+        'id': 'contrat-patch',
+        'user_id': USER_ID,
+        'original_user_id': 'anon_tests',
+        'title': 'Contrat',
+        'is_draft': True,
+        'created_at': '2024-01-01T00:00:00',
+        'data': {'auteur_info': {'nom': 'Dupont'}}
+    }, touch=True)
+    return 'contrat-patch'
+
+
+def patch(client, contract_id, body, media_type):
+    return client.patch(f'/api/contracts/{contract_id}?user_id={USER_ID}', json=body, content_type=media_type)
+
+
+@pytest.mark.parametrize('field', PROTECTED_FIELDS)
+def test_json_patch_rejects_protected_fields(client, store, contract_id, field):
+    before = store.get(contract_id)
+    response = patch(client, contract_id, [{'op': 'replace', 'path': f'/{field}', 'value': 'autre'}],
+                     JSON_PATCH_MEDIA_TYPE)
+    assert response.status_code == 400
+    assert store.get(contract_id) == before
+
+
+@pytest.mark.parametrize('field', PROTECTED_FIELDS)
+def test_json_patch_rejects_removing_protected_fields(client, store, contract_id, field):
+    response = patch(client, contract_id, [{'op': 'remove', 'path': f'/{field}'}], JSON_PATCH_MEDIA_TYPE)
+    assert response.status_code == 400
+    assert store.get(contract_id)[field] is not None
+
+
+@pytest.mark.parametrize('field', PROTECTED_FIELDS)
+def test_merge_patch_rejects_protected_fields(client, store, contract_id, field):
+    before = store.get(contract_id)
+    response = patch(client, contract_id, {field: 'autre', 'title': 'Modifié'}, MERGE_PATCH_MEDIA_TYPE)
+    assert response.status_code == 400
+    assert store.get(contract_id) == before
+
+
+def test_merge_patch_rejects_removing_version(client, store, contract_id):
+    response = patch(client, contract_id, {'version': None}, MERGE_PATCH_MEDIA_TYPE)
+    assert response.status_code == 400
+    assert store.get(contract_id)['version'] == 1
+
+
+def test_patch_updates_editable_fields(client, store, contract_id):
+    response = patch(client, contract_id, [{'op': 'replace', 'path': '/data/auteur_info/nom', 'value': 'Martin'}],
+                     JSON_PATCH_MEDIA_TYPE)
+    assert response.status_code == 200
+    assert response.json['version'] == 2
+    contract = store.get(contract_id)
+    assert contract['data']['auteur_info']['nom'] == 'Martin'
+    assert contract['updated_at'] == response.json['updated_at']
+
+
+def test_failed_test_operation_returns_409(client, store, contract_id):
+    response = patch(client, contract_id, [{'op': 'test', 'path': '/title', 'value': 'Autre titre'},
+                                           {'op': 'replace', 'path': '/title', 'value': 'Modifié'}],
+                     JSON_PATCH_MEDIA_TYPE)
+    assert response.status_code == 409
+    assert store.get(contract_id)['title'] == 'Contrat'
+
+
+@pytest.mark.parametrize('body', [
+    [{'op': 'add', 'path': '/comments/5', 'value': {}}],
+    [{'op': 'move', 'from': '/data', 'path': '/data/copie'}],
+    [{'op': 'replace', 'path': '/data', 'value': 'texte'}],
+])
+def test_invalid_patch_returns_400(client, store, contract_id, body):
+    response = patch(client, contract_id, body, JSON_PATCH_MEDIA_TYPE)
+    assert response.status_code == 400
+    assert store.get(contract_id)['version'] == 1
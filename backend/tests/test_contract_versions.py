@@ -0,0 +1,210 @@
+"""
+Tests des versions des contrats: écritures conditionnelles du stockage (expected_version),
+ETag / If-Match / If-None-Match de l'API et écritures concurrentes, sur les deux backends.
+"""
+import threading
+import multiprocessing
+
+import pytest
+
+from conftest import USER_ID, STORE_BACKENDS, make_store
+from contract_store import VersionConflict
+
+CONTRACT_ID = 'contrat-versions'
+
+
+def new_contract(title='Contrat'):
+    return {'id': CONTRACT_ID, 'user_id': USER_ID, 'title': title, 'is_draft': True,
+            'data': {'auteur_info': {'nom': 'Dupont'}}}
+
+
+def run_concurrently(count, target):
+    # Lance les appels en même temps (barrière) et retourne leurs résultats ou exceptions
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def run(index):
+        barrier.wait()
+        try:
+            results[index] = target(index)
+        except Exception as e:
+            results[index] = e
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+# Stockage
+
+def test_save_increments_version(store):
+    assert store.save(new_contract()) == 1
+    assert store.save(new_contract('Modifié'), expected_version=1) == 2
+    assert store.get(CONTRACT_ID)['version'] == 2
+
+
+def test_save_with_stale_version_is_rejected(store):
+    store.save(new_contract())
+    store.save(new_contract('Deuxième'), expected_version=1)
+
+    with pytest.raises(VersionConflict) as excinfo:
+        store.save(new_contract('Écrasé'), expected_version=1)
+
+    assert excinfo.value.version == 2
+    contract = store.get(CONTRACT_ID)
+    assert contract['title'] == 'Deuxième'
+    assert contract['version'] == 2
+
+
+def test_save_without_expected_version_always_writes(store):
+    store.save(new_contract())
+    store.save(new_contract('Deuxième'))
+    assert store.get(CONTRACT_ID)['version'] == 2
+
+
+def test_concurrent_saves_with_same_expected_version(store):
+    store.save(new_contract())
+
+    results = run_concurrently(8, lambda index: store.save(new_contract(f'Écriture {index}'), expected_version=1))
+
+    written = [result for result in results if result == 2]
+    conflicts = [result for result in results if isinstance(result, VersionConflict)]
+    assert len(written) == 1
+    assert len(conflicts) == 7
+    contract = store.get(CONTRACT_ID)
+    assert contract['version'] == 2
+    assert contract['title'] == f'Écriture {results.index(2)}'
+
+
+def _save_in_process(backend, directory, index, start, results):
+    # Chaque processus ouvre son propre stockage, comme un worker gunicorn
+    store = make_store(backend, directory)
+    start.wait()
+    try:
+        results[index] = store.save(new_contract(f'Processus {index}'), expected_version=1)
+    except VersionConflict:
+        results[index] = -1
+
+
+@pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason="fork indisponible")
+@pytest.mark.parametrize('backend', STORE_BACKENDS)
+def test_concurrent_saves_from_several_processes(backend, tmp_path):
+    make_store(backend, str(tmp_path)).save(new_contract())
+
+    context = multiprocessing.get_context('fork')
+    start = context.Event()
+    results = context.Array('i', [0] * 4)
+    processes = [context.Process(target=_save_in_process, args=(backend, str(tmp_path), index, start, results))
+                 for index in range(len(results))]
+    for process in processes:
+        process.start()
+    start.set()
+    for process in processes:
+        process.join(timeout=60)
+
+    assert sorted(results) == [-1, -1, -1, 2]
+    assert make_store(backend, str(tmp_path)).get(CONTRACT_ID)['version'] == 2
+
+
+# API
+
+@pytest.fixture
+def contract_id(store):
+    store.save(new_contract())
+    return CONTRACT_ID
+
+
+def put(client, contract_id, title, if_match=None):
+    headers = {'If-Match': f'"{if_match}"'} if if_match is not None else {}
+    return client.put(f'/api/contracts/{contract_id}', json={'user_id': USER_ID, 'title': title}, headers=headers)
+
+
+def test_get_returns_version_as_etag(client, contract_id):
+    response = client.get(f'/api/contracts/{contract_id}?user_id={USER_ID}')
+    assert response.status_code == 200
+    assert response.headers['ETag'] == '"1"'
+    assert response.json['contract']['version'] == 1
+
+
+def test_get_with_current_etag_is_not_modified(client, contract_id):
+    response = client.get(f'/api/contracts/{contract_id}?user_id={USER_ID}', headers={'If-None-Match': '"1"'})
+    assert response.status_code == 304
+
+    put(client, contract_id, 'Modifié', if_match=1)
+    response = client.get(f'/api/contracts/{contract_id}?user_id={USER_ID}', headers={'If-None-Match': '"1"'})
+    assert response.status_code == 200
+    assert response.headers['ETag'] == '"2"'
+
+
+def test_etag_if_match_round_trip(client, store, contract_id):
+    etag = client.get(f'/api/contracts/{contract_id}?user_id={USER_ID}').headers['ETag']
+
+    response = client.put(f'/api/contracts/{contract_id}', json={'user_id': USER_ID, 'title': 'Premier'},
+                          headers={'If-Match': etag})
+    assert response.status_code == 200
+    assert response.json['version'] == 2
+    new_etag = response.headers['ETag']
+    assert new_etag == '"2"'
+
+    # Le nouvel ETag permet l'écriture suivante, l'ancien est refusé
+    assert client.put(f'/api/contracts/{contract_id}', json={'user_id': USER_ID, 'title': 'Second'},
+                      headers={'If-Match': new_etag}).status_code == 200
+    response = client.put(f'/api/contracts/{contract_id}', json={'user_id': USER_ID, 'title': 'Périmé'},
+                          headers={'If-Match': etag})
+    assert response.status_code == 409
+    assert store.get(contract_id)['title'] == 'Second'
+
+
+def test_put_with_stale_if_match_returns_409(client, store, contract_id):
+    put(client, contract_id, 'Deuxième', if_match=1)
+
+    response = put(client, contract_id, 'Écrasé', if_match=1)
+
+    assert response.status_code == 409
+    assert response.json['version'] == 2
+    assert response.headers['ETag'] == '"2"'
+    assert store.get(contract_id)['title'] == 'Deuxième'
+
+
+def test_patch_with_stale_if_match_returns_409(client, store, contract_id):
+    put(client, contract_id, 'Deuxième', if_match=1)
+
+    response = client.patch(f'/api/contracts/{contract_id}?user_id={USER_ID}', json={'title': 'Écrasé'},
+                            content_type='application/merge-patch+json', headers={'If-Match': '"1"'})
+
+    assert response.status_code == 409
+    assert response.headers['ETag'] == '"2"'
+    assert store.get(contract_id)['title'] == 'Deuxième'
+
+
+def test_put_without_if_match_is_accepted(client, contract_id):
+    put(client, contract_id, 'Deuxième')
+    response = put(client, contract_id, 'Troisième')
+    assert response.status_code == 200
+    assert response.json['version'] == 3
+
+
+def test_store_version_conflict_returns_409(client, store, contract_id, monkeypatch):
+    # Conflit détecté par le stockage lui-même (écriture d'un autre worker entre la lecture et l'écriture)
+    def conflicting_save(contract, expected_version=None, touch=False):
+        raise VersionConflict(contract['id'], 7)
+
+    monkeypatch.setattr(store, 'save', conflicting_save)
+    response = put(client, contract_id, 'Modifié')
+
+    assert response.status_code == 409
+    assert response.json['version'] == 7
+    assert response.headers['ETag'] == '"7"'
+
+
+def test_concurrent_puts_with_same_if_match(app_module, client, store, contract_id):
+    results = run_concurrently(
+        6, lambda index: put(app_module.app.test_client(), contract_id, f'Écriture {index}', if_match=1)
+    )
+
+    statuses = sorted(response.status_code for response in results)
+    assert statuses == [200, 409, 409, 409, 409, 409]
+    assert store.get(contract_id)['version'] == 2
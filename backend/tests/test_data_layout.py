@@ -0,0 +1,55 @@
+"""
+Tests de la répartition des fichiers de données dans des sous-répertoires (data_layout.migrate).
+"""
+import os
+
+import data_layout
+from conftest import USER_ID, make_store
+from storage_codec import write_document
+
+CONTRACT_IDS = [f'contrat-{index}' for index in range(20)]
+
+
+def legacy_contract(contract_id, title='Contrat'):
+    # Contrat de l'organisation à plat: sous-documents encore intégrés au contrat
+    return {'id': contract_id, 'user_id': USER_ID, 'title': title, 'is_draft': True, 'version': 1,
+            'elements': [{'type': 'paragraph', 'text': contract_id}], 'comments': [{'text': 'À revoir'}]}
+
+
+def write_legacy(contracts_dir, document):
+    os.makedirs(contracts_dir, exist_ok=True)
+    write_document(data_layout.legacy_path(contracts_dir, f"{document['id']}.json"), document)
+
+
+def flat_files(contracts_dir):
+    return sorted(entry.name for entry in os.scandir(contracts_dir) if entry.is_file())
+
+
+def test_flat_to_sharded_migration(tmp_path):
+    contracts_dir = os.path.join(str(tmp_path), 'contracts')
+    for contract_id in CONTRACT_IDS:
+        write_legacy(contracts_dir, legacy_contract(contract_id))
+
+    report = data_layout.migrate(contracts_dir)
+
+    assert report == {'moved': len(CONTRACT_IDS), 'stale_removed': 0}
+    assert flat_files(contracts_dir) == []
+    store = make_store('json', str(tmp_path))
+    for contract_id in CONTRACT_IDS:
+        assert os.path.exists(data_layout.shard_path(contracts_dir, f'{contract_id}.json'))
+        assert store.get(contract_id)['title'] == 'Contrat'
+        assert store.get_full(contract_id)['elements'] == legacy_contract(contract_id)['elements']
+
+
+def test_migration_keeps_newer_sharded_copy(tmp_path):
+    contracts_dir = os.path.join(str(tmp_path), 'contracts')
+    # Écriture de l'API avant la migration: la nouvelle version est à l'emplacement réparti,
+    # l'ancienne copie à plat est restée
+    make_store('json', str(tmp_path)).save(legacy_contract('contrat-0', 'Modifié'), touch=True)
+    write_legacy(contracts_dir, legacy_contract('contrat-0'))
+
+    report = data_layout.migrate(contracts_dir)
+
+    assert report == {'moved': 0, 'stale_removed': 1}
+    assert flat_files(contracts_dir) == []
+    assert make_store('json', str(tmp_path)).get('contrat-0')['title'] == 'Modifié'
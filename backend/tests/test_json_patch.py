@@ -0,0 +1,203 @@
+"""
+Tests de json_patch.py: opérations JSON Patch (RFC 6902), pointeurs et JSON Merge Patch (RFC 7386).
+"""
+import pytest
+
+from json_patch import (JsonPatchError, JsonPatchTestFailed, apply_json_patch, apply_merge_patch,
+                        parse_pointer, patch_roots)
+
+
+def document():
+    return {
+        'title': 'Contrat',
+        'data': {'auteur_info': {'nom': 'Dupont'}, 'a/b': 1, 'm~n': 2},
+        'elements': [{'text': 'zéro'}, {'text': 'un'}, {'text': 'deux'}]
+    }
+
+
+# Pointeurs
+
+def test_parse_pointer_unescapes_segments():
+    assert parse_pointer('') == []
+    assert parse_pointer('/data/a~1b') == ['data', 'a/b']
+    assert parse_pointer('/data/m~0n') == ['data', 'm~n']
+
+
+@pytest.mark.parametrize('pointer', ['data', 3, None])
+def test_parse_pointer_rejects_invalid_pointer(pointer):
+    with pytest.raises(JsonPatchError):
+        parse_pointer(pointer)
+
+
+def test_patch_roots():
+    patch = [{'op': 'replace', 'path': '/elements/0/text', 'value': 'x'},
+             {'op': 'move', 'from': '/comments/0', 'path': '/data/note'}]
+    assert patch_roots(patch) == {'elements', 'comments', 'data'}
+    assert patch_roots({'title': 'x', 'is_draft': False}, merge=True) == {'title', 'is_draft'}
+
+
+# add
+
+def test_add_object_member():
+    doc = apply_json_patch(document(), [{'op': 'add', 'path': '/data/cessionnaire', 'value': {'nom': 'X'}}])
+    assert doc['data']['cessionnaire'] == {'nom': 'X'}
+
+
+def test_add_inserts_into_list():
+    doc = apply_json_patch(document(), [{'op': 'add', 'path': '/elements/1', 'value': {'text': 'inséré'}}])
+    assert [element['text'] for element in doc['elements']] == ['zéro', 'inséré', 'un', 'deux']
+
+
+def test_add_dash_appends_to_list():
+    doc = apply_json_patch(document(), [{'op': 'add', 'path': '/elements/-', 'value': {'text': 'trois'}}])
+    assert doc['elements'][-1] == {'text': 'trois'}
+
+
+def test_add_at_list_length_appends():
+    doc = apply_json_patch(document(), [{'op': 'add', 'path': '/elements/3', 'value': {'text': 'trois'}}])
+    assert len(doc['elements']) == 4
+
+
+@pytest.mark.parametrize('index', ['4', '-1', '01', 'x'])
+def test_add_rejects_list_index_out_of_bounds_or_invalid(index):
+    with pytest.raises(JsonPatchError):
+        apply_json_patch(document(), [{'op': 'add', 'path': f'/elements/{index}', 'value': {}}])
+
+
+def test_add_rejects_missing_parent():
+    with pytest.raises(JsonPatchError):
+        apply_json_patch(document(), [{'op': 'add', 'path': '/data/absent/nom', 'value': 'X'}])
+
+
+def test_add_value_is_copied():
+    value = {'nom': 'X'}
+    doc = apply_json_patch(document(), [{'op': 'add', 'path': '/data/cessionnaire', 'value': value}])
+    value['nom'] = 'Y'
+    assert doc['data']['cessionnaire'] == {'nom': 'X'}
+
+
+# remove
+
+def test_remove_object_member_and_list_item():
+    doc = apply_json_patch(document(), [{'op': 'remove', 'path': '/data/auteur_info'},
+                                        {'op': 'remove', 'path': '/elements/0'}])
+    assert 'auteur_info' not in doc['data']
+    assert [element['text'] for element in doc['elements']] == ['un', 'deux']
+
+
+@pytest.mark.parametrize('path', ['/data/absent', '/elements/3', '/elements/-', '/title/x'])
+def test_remove_rejects_missing_target(path):
+    with pytest.raises(JsonPatchError):
+        apply_json_patch(document(), [{'op': 'remove', 'path': path}])
+
+
+# replace
+
+def test_replace_value():
+    doc = apply_json_patch(document(), [{'op': 'replace', 'path': '/elements/2/text', 'value': 'DEUX'},
+                                        {'op': 'replace', 'path': '/title', 'value': 'Nouveau'}])
+    assert doc['elements'][2]['text'] == 'DEUX'
+    assert doc['title'] == 'Nouveau'
+
+
+@pytest.mark.parametrize('path', ['/data/absent', '/elements/3', '/elements/-'])
+def test_replace_rejects_missing_target(path):
+    with pytest.raises(JsonPatchError):
+        apply_json_patch(document(), [{'op': 'replace', 'path': path, 'value': 'x'}])
+
+
+# move
+
+def test_move_list_item():
+    doc = apply_json_patch(document(), [{'op': 'move', 'from': '/elements/0', 'path': '/elements/-'}])
+    assert [element['text'] for element in doc['elements']] == ['un', 'deux', 'zéro']
+
+
+def test_move_between_objects():
+    doc = apply_json_patch(document(), [{'op': 'move', 'from': '/data/auteur_info', 'path': '/data/cedant'}])
+    assert doc['data']['cedant'] == {'nom': 'Dupont'}
+    assert 'auteur_info' not in doc['data']
+
+
+def test_move_rejects_move_into_own_child():
+    with pytest.raises(JsonPatchError):
+        apply_json_patch(document(), [{'op': 'move', 'from': '/data', 'path': '/data/auteur_info/data'}])
+
+
+def test_move_rejects_missing_source():
+    with pytest.raises(JsonPatchError):
+        apply_json_patch(document(), [{'op': 'move', 'from': '/data/absent', 'path': '/data/x'}])
+
+
+# copy
+
+def test_copy_is_independent_of_source():
+    doc = apply_json_patch(document(), [{'op': 'copy', 'from': '/data/auteur_info', 'path': '/data/cedant'}])
+    doc['data']['cedant']['nom'] = 'Martin'
+    assert doc['data']['auteur_info'] == {'nom': 'Dupont'}
+
+
+def test_copy_rejects_missing_source():
+    with pytest.raises(JsonPatchError):
+        apply_json_patch(document(), [{'op': 'copy', 'from': '/elements/9', 'path': '/elements/-'}])
+
+
+# test
+
+def test_test_operation_passes_when_value_matches():
+    doc = apply_json_patch(document(), [{'op': 'test', 'path': '/elements/1/text', 'value': 'un'},
+                                        {'op': 'replace', 'path': '/elements/1/text', 'value': 'UN'}])
+    assert doc['elements'][1]['text'] == 'UN'
+
+
+def test_test_operation_failure():
+    with pytest.raises(JsonPatchTestFailed):
+        apply_json_patch(document(), [{'op': 'test', 'path': '/elements/1/text', 'value': 'autre'}])
+
+
+def test_test_operation_on_missing_path_is_not_a_test_failure():
+    with pytest.raises(JsonPatchError) as excinfo:
+        apply_json_patch(document(), [{'op': 'test', 'path': '/data/absent', 'value': 1}])
+    assert not isinstance(excinfo.value, JsonPatchTestFailed)
+
+
+# Opérations invalides
+
+@pytest.mark.parametrize('patch', [
+    {'op': 'add', 'path': '/title', 'value': 'x'},
+    [{'op': 'inconnue', 'path': '/title'}],
+    ['add'],
+    [{'op': 'remove'}],
+    [{'op': 'add', 'path': '/title'}],
+    [{'op': 'replace', 'path': '/title'}],
+    [{'op': 'test', 'path': '/title'}],
+    [{'op': 'move', 'path': '/title'}],
+    [{'op': 'copy', 'path': '/title'}],
+])
+def test_rejects_malformed_patch(patch):
+    with pytest.raises(JsonPatchError):
+        apply_json_patch(document(), patch)
+
+
+def test_rejects_whole_document_target():
+    with pytest.raises(JsonPatchError):
+        apply_json_patch(document(), [{'op': 'replace', 'path': '', 'value': {}}])
+
+
+# JSON Merge Patch
+
+def test_merge_patch_sets_merges_and_removes():
+    doc = apply_merge_patch(document(), {'title': 'Nouveau', 'data': {'auteur_info': {'prenom': 'Jean'}, 'a/b': None}})
+    assert doc['title'] == 'Nouveau'
+    assert doc['data']['auteur_info'] == {'nom': 'Dupont', 'prenom': 'Jean'}
+    assert 'a/b' not in doc['data']
+
+
+def test_merge_patch_replaces_lists():
+    doc = apply_merge_patch(document(), {'elements': [{'text': 'seul'}]})
+    assert doc['elements'] == [{'text': 'seul'}]
+
+
+def test_merge_patch_rejects_non_object():
+    with pytest.raises(JsonPatchError):
+        apply_merge_patch(document(), ['title'])
@@ -0,0 +1,53 @@
+"""
+Tests des tâches de migration en arrière-plan (migration_jobs.py): reprise au démarrage par
+plusieurs workers, sur les deux backends.
+"""
+import os
+import time
+
+import pytest
+
+from conftest import STORE_BACKENDS, make_store
+from migration_jobs import MigrationJobs
+from atomic_writer import atomic_write_json
+
+ANONYMOUS_ID = 'anon_migration'
+NEW_USER_ID = 'user_migration_clerk'
+
+
+def wait_until_idle(*jobs_list, timeout=60):
+    deadline = time.time() + timeout
+    while any(jobs._running for jobs in jobs_list):
+        assert time.time() < deadline, "Tâche de migration toujours en cours"
+        time.sleep(0.01)
+
+
+@pytest.mark.parametrize('backend', STORE_BACKENDS)
+def test_resume_pending_runs_each_job_once(backend, tmp_path):
+    store = make_store(backend, str(tmp_path))
+    contract_ids = [f'contrat-{index}' for index in range(300)]
+    for contract_id in contract_ids:
+        store.save({'id': contract_id, 'user_id': ANONYMOUS_ID, 'title': contract_id, 'is_draft': True})
+
+    # Tâche interrompue par un redémarrage, reprise par deux workers
+    jobs_dir = os.path.join(str(tmp_path), 'migration_jobs')
+    os.makedirs(jobs_dir)
+    atomic_write_json(os.path.join(jobs_dir, 'job-1.json'), {
+        'id': 'job-1', 'anonymous_id': ANONYMOUS_ID, 'new_user_id': NEW_USER_ID, 'status': 'running',
+        'total': len(contract_ids), 'migrated': 0, 'skipped': 0, 'errors': 0,
+        'contract_ids': contract_ids, 'position': 0, 'created_at': '2024-01-01T00:00:00'
+    })
+    workers = [MigrationJobs(jobs_dir, make_store(backend, str(tmp_path))) for _ in range(2)]
+
+    resumed = [jobs.resume_pending() for jobs in workers]
+    wait_until_idle(*workers)
+
+    assert resumed[0] == 1
+    job = workers[0].get('job-1')
+    assert job['status'] == 'done'
+    assert (job['migrated'], job['skipped'], job['errors']) == (len(contract_ids), 0, 0)
+    assert job['position'] == len(contract_ids)
+    assert all(store.get(contract_id)['user_id'] == NEW_USER_ID for contract_id in contract_ids)
+
+    # Une tâche terminée n'est plus reprise
+    assert workers[1].resume_pending() == 0
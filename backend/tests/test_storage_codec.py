@@ -0,0 +1,89 @@
+"""
+Tests de la migration des fichiers de données d'un codec à l'autre (storage_codec.migrate).
+"""
+import os
+
+import pytest
+
+import storage_codec
+from contract_store import JsonContractStore
+from conftest import USER_ID, make_store
+
+
+def contract(index):
+    return {
+        'id': f'contrat-{index}',
+        'user_id': USER_ID,
+        'title': f'Contrat n°{index} — cession',
+        'is_draft': index % 2 == 0,
+        'data': {'auteur_info': {'nom': 'Dupont', 'prenom': 'Élise'}, 'remuneration': index * 1.5},
+        'elements': [{'type': 'paragraph', 'style': 'ContractText', 'text': f'Article {index}'},
+                     {'type': 'spacer', 'height': 12}],
+        'comments': [{'id': f'commentaire-{index}', 'text': 'À revoir'}]
+    }
+
+
+def read_data_files(data_dir):
+    # {chemin relatif: document} des contrats, sous-documents et profils
+    return {os.path.relpath(path, data_dir): storage_codec.read_document(path)
+            for _, path in storage_codec._data_files(data_dir)}
+
+
+def test_json_compact_json_round_trip(tmp_path):
+    data_dir = str(tmp_path)
+    store = make_store('json', data_dir)
+    for index in range(5):
+        store.save(contract(index), touch=True)
+    profiles_dir = os.path.join(data_dir, 'user_profiles')
+    os.makedirs(profiles_dir)
+    storage_codec.write_document(os.path.join(profiles_dir, f'user_profile_{USER_ID}.json'),
+                                 {'user_id': USER_ID, 'nom': 'Dupont'}, codec='json')
+
+    assert storage_codec.migrate(data_dir, 'json')['errors'] == 0
+    original = read_data_files(data_dir)
+    # 5 contrats, leurs éléments et leurs commentaires, et le profil
+    assert len(original) == 16
+    assert any(path.endswith('.elements') for path in original)
+    assert any(path.endswith('.comments') for path in original)
+
+    report = storage_codec.migrate(data_dir, 'json-compact')
+    assert (report['rewritten'], report['errors']) == (16, 0)
+    assert report['bytes_after'] < report['bytes_before']
+    assert read_data_files(data_dir) == original
+
+    report = storage_codec.migrate(data_dir, 'json')
+    assert (report['rewritten'], report['errors']) == (16, 0)
+    assert read_data_files(data_dir) == original
+
+    # Les contrats restent lisibles par un nouveau stockage, sous-documents compris
+    reopened = make_store('json', data_dir)
+    for index in range(5):
+        document = reopened.get_full(f'contrat-{index}')
+        assert document['elements'] == contract(index)['elements']
+        assert document['comments'] == contract(index)['comments']
+        assert document['data'] == contract(index)['data']
+
+
+def test_migrate_skips_files_already_in_target_codec(tmp_path):
+    data_dir = str(tmp_path)
+    make_store('json', data_dir).save(contract(0))
+    storage_codec.migrate(data_dir, 'json')
+
+    report = storage_codec.migrate(data_dir, 'json')
+
+    assert (report['rewritten'], report['unchanged']) == (0, 3)
+
+
+def test_migrate_refuses_to_run_beside_a_coalescing_writer(tmp_path):
+    data_dir = str(tmp_path)
+    coalescing_store = JsonContractStore(os.path.join(data_dir, 'contracts'), write_window=60)
+    coalescing_store.save(contract(0))
+
+    with pytest.raises(RuntimeError):
+        storage_codec.migrate(data_dir, 'json')
+
+    # Le verrou des écrivains est partagé avec les stockages qui écrivent directement
+    coalescing_store.writer.flush_all()
+    coalescing_store._writers_lock.close()
+    make_store('json', data_dir).save(contract(1))
+    assert storage_codec.migrate(data_dir, 'json')['errors'] == 0
@@ -0,0 +1,206 @@
+"""
+Nettoyage du répertoire temporaire (backend/tmp).
+Les fichiers créés par utils.create_temp_file et pdf_generator.create_temp_file, et les artefacts
+mis en cache sur le disque, ne sont jamais supprimés par le code qui les crée. Le nettoyage
+supprime les fichiers plus anciens que la durée maximale, puis les moins récemment utilisés
+(date d'accès ou de modification la plus récente) jusqu'à revenir sous le budget en octets.
+
+Le nettoyage tourne dans un thread d'arrière-plan de chaque worker, mais un seul worker à la fois
+le fait: celui qui obtient le verrou .janitor.lock (verrou fcntl, libéré à la mort du processus).
+L'occupation du répertoire est enregistrée dans .janitor.json après chaque passage, pour que
+GET /api/metrics l'expose depuis n'importe quel worker.
+"""
+import os
+import json
+import time
+import argparse
+import threading
+from datetime import datetime
+
+from atomic_writer import atomic_write_bytes, try_process_lock, start_leader_scheduler
+
+# Budget par défaut du répertoire temporaire (disque de 1 Go sur Render)
+DEFAULT_MAX_MB = 512
+
+# Durée de conservation par défaut d'un fichier temporaire
+DEFAULT_MAX_AGE_HOURS = 24
+
+# Fichiers du nettoyage lui-même (verrou et occupation), jamais supprimés
+JANITOR_PREFIX = '.janitor'
+LOCK_FILENAME = JANITOR_PREFIX + '.lock'
+USAGE_FILENAME = JANITOR_PREFIX + '.json'
+
+
+class TmpJanitor:
+    """
+    Maintient le répertoire temporaire sous un budget en octets et une durée maximale.
+    """
+
+    def __init__(self, tmp_dir, max_bytes=DEFAULT_MAX_MB * 1024 * 1024, max_age_seconds=DEFAULT_MAX_AGE_HOURS * 3600):
+        self.tmp_dir = tmp_dir
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        self._lock_file = None
+        self.runs = 0
+        self.last_run = None
+        self.last_report = None
+
+    def _iter_files(self):
+        # (chemin, taille, dernière utilisation) des fichiers du répertoire et de ses sous-répertoires
+        for root, dirs, files in os.walk(self.tmp_dir):
+            for name in files:
+                if name.startswith(JANITOR_PREFIX):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_size, max(stat.st_atime, stat.st_mtime)
+
+    def sweep(self, dry_run=False):
+        """
+        Supprime les fichiers expirés, puis les moins récemment utilisés au-delà du budget.
+
+        Args:
+            dry_run (bool, optional): Compter les fichiers à supprimer sans les supprimer
+
+        Returns:
+            dict: Rapport (fichiers et octets restants, supprimés par âge et par budget)
+        """
+        started = time.time()
+        cutoff = started - self.max_age_seconds
+        report = {'files': 0, 'bytes': 0, 'expired': 0, 'evicted': 0, 'freed_bytes': 0, 'errors': 0,
+                  'dry_run': dry_run}
+
+        def remove(path, size):
+            try:
+                if not dry_run:
+                    os.remove(path)
+            except FileNotFoundError:
+                return False
+            except OSError as e:
+                print(f"Nettoyage de tmp: impossible de supprimer {path}: {e}")
+                report['errors'] += 1
+                return False
+            report['freed_bytes'] += size
+            return True
+
+        remaining = []
+        for path, size, last_used in self._iter_files():
+            if last_used < cutoff:
+                if remove(path, size):
+                    report['expired'] += 1
+                    continue
+            remaining.append((last_used, path, size))
+
+        # Éviction LRU: les fichiers utilisés le moins récemment partent en premier
+        total = sum(size for _, _, size in remaining)
+        remaining.sort()
+        kept = len(remaining)
+        for last_used, path, size in remaining:
+            if total <= self.max_bytes:
+                break
+            if remove(path, size):
+                report['evicted'] += 1
+                total -= size
+                kept -= 1
+
+        report['files'] = kept
+        report['bytes'] = total
+        report['duration_seconds'] = round(time.time() - started, 3)
+
+        with self._lock:
+            self.runs += 1
+            self.last_run = datetime.now().isoformat()
+            self.last_report = report
+        if not dry_run:
+            self._write_usage(report)
+        return report
+
+    def _write_usage(self, report):
+        usage = {'files': report['files'], 'bytes': report['bytes'], 'updated_at': self.last_run, 'pid': os.getpid()}
+        try:
+            atomic_write_bytes(os.path.join(self.tmp_dir, USAGE_FILENAME), json.dumps(usage).encode('utf-8'),
+                               durable=False)
+        except OSError as e:
+            print(f"Nettoyage de tmp: impossible d'enregistrer l'occupation: {e}")
+
+    def usage(self):
+        """
+        Retourne l'occupation du répertoire mesurée par le dernier nettoyage, tous workers confondus.
+
+        Returns:
+            dict: {'files', 'bytes', 'updated_at', 'pid'}, ou None avant le premier nettoyage
+        """
+        try:
+            with open(os.path.join(self.tmp_dir, USAGE_FILENAME), 'rb') as f:
+                return json.loads(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def is_leader(self):
+        """
+        Indique si ce worker est chargé du nettoyage; tente d'obtenir le verrou sinon.
+        """
+        if self._lock_file is not None:
+            return True
+        f = try_process_lock(os.path.join(self.tmp_dir, LOCK_FILENAME))
+        if f is None:
+            # Un autre worker fait le nettoyage
+            return False
+        # Verrou conservé jusqu'à la fin du processus
+        self._lock_file = f
+        return True
+
+    def start_scheduler(self, interval_seconds):
+        """
+        Lance le nettoyage périodique dans un thread d'arrière-plan du worker (premier passage immédiat).
+        Seul le worker qui détient le verrou nettoie; les autres retentent à chaque intervalle.
+
+        Args:
+            interval_seconds (float): Intervalle entre deux nettoyages
+        """
+        def run():
+            report = self.sweep()
+            if report['expired'] or report['evicted']:
+                print(f"Nettoyage de tmp: {report}")
+
+        return start_leader_scheduler(self.is_leader, run, interval_seconds, "Nettoyage de tmp")
+
+    def stats(self):
+        """
+        Retourne le budget, l'occupation du répertoire et le rapport du dernier nettoyage de ce worker.
+        """
+        with self._lock:
+            return {
+                'max_bytes': self.max_bytes,
+                'max_age_hours': round(self.max_age_seconds / 3600, 2),
+                'leader': self._lock_file is not None,
+                'usage': self.usage(),
+                'runs': self.runs,
+                'last_run': self.last_run,
+                'last_report': self.last_report
+            }
+
+
+if __name__ == "__main__":
+    TMP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tmp')
+
+    parser = argparse.ArgumentParser(description="Nettoyage du répertoire temporaire")
+    parser.add_argument('--tmp-dir', default=TMP_DIR)
+    parser.add_argument('--max-mb', type=int, default=DEFAULT_MAX_MB,
+                        help="Taille maximale du répertoire, au-delà de laquelle les fichiers les moins récemment utilisés sont supprimés")
+    parser.add_argument('--max-age-hours', type=float, default=DEFAULT_MAX_AGE_HOURS)
+    parser.add_argument('--dry-run', action='store_true', help="Affiche ce qui serait supprimé sans rien supprimer")
+
+    args = parser.parse_args()
+
+    janitor = TmpJanitor(args.tmp_dir, max_bytes=args.max_mb * 1024 * 1024,
+                         max_age_seconds=args.max_age_hours * 3600)
+    report = janitor.sweep(dry_run=args.dry_run)
+    action = "seraient supprimés" if args.dry_run else "supprimés"
+    print(f"{report['expired']} fichiers expirés et {report['evicted']} fichiers hors budget {action} "
+          f"({report['freed_bytes']} octets), {report['files']} fichiers restants ({report['bytes']} octets), "
+          f"{report['errors']} erreurs")
@@ -45,6 +45,45 @@ def collect_author_info(is_physical_person, data):
     return author_info
 
 
+def get_base_user_id(user_id):
+    """
+    Extrait l'ID de base d'un utilisateur (sans le suffixe de la méthode d'authentification).
+
+    Args:
+        user_id (str): ID utilisateur complet (ex: "user_XYZ_clerk")
+
+    Returns:
+        str: ID de base (ex: "user_XYZ"), inchangé pour les IDs anonymes
+    """
+    if not user_id:
+        return ''
+
+    base_user_id = user_id
+    if '_' in user_id and not user_id.startswith('anon_'):
+        # Formater: user_XYZ (2 premières parties de l'ID)
+        parts = user_id.split('_')
+        if len(parts) >= 2:
+            base_user_id = f"{parts[0]}_{parts[1]}"
+
+    return base_user_id
+
+
+def user_has_access(user_id, contract_user_id):
+    """
+    Vérifie si un utilisateur a accès à un contrat.
+    Les IDs complets et les IDs de base sont acceptés pour compatibilité: comparer les IDs
+    de base couvre toutes les combinaisons (complet/complet, base/base, complet/base).
+
+    Args:
+        user_id (str): ID de l'utilisateur qui fait la requête
+        contract_user_id (str): ID du propriétaire du contrat
+
+    Returns:
+        bool: True si l'accès est autorisé
+    """
+    return get_base_user_id(user_id) == get_base_user_id(contract_user_id)
+
+
 def ensure_default_supports(selected_supports):
     """
     S'assure que les supports par défaut sont inclus dans la liste des supports sélectionnés.
@@ -4,18 +4,23 @@ Script de nettoyage des fichiers qui pourraient compromettre l'isolation des don
 """
 
 import os
-import json
+import sys
 import shutil
 from datetime import datetime
 
 # Chemins des répertoires
 BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from contract_store import create_contract_store
+import data_layout
 DATA_DIR = os.path.join(BACKEND_DIR, 'data')
 USER_PROFILES_DIR = os.path.join(DATA_DIR, 'user_profiles')
 CONTRACTS_DIR = os.path.join(DATA_DIR, 'contracts')
+CONTRACTS_DB_PATH = os.path.join(DATA_DIR, 'contracts.sqlite3')
 
-# Fichier de profil global à supprimer
-GLOBAL_PROFILE = os.path.join(USER_PROFILES_DIR, 'user_profile.json')
+# Fichier de profil global à supprimer (ancien emplacement à plat ou sous-répertoire réparti)
+GLOBAL_PROFILE = data_layout.resolve_path(USER_PROFILES_DIR, 'user_profile.json')
 
 # Créer un dossier de backup
 BACKUP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data_backup')
@@ -33,7 +38,7 @@ if os.path.exists(DATA_DIR):
 # 2. Suppression du fichier de profil global s'il existe
 if os.path.exists(GLOBAL_PROFILE):
     print(f"2. Suppression du fichier de profil global {GLOBAL_PROFILE}...")
-    os.remove(GLOBAL_PROFILE)
+    data_layout.remove_file(USER_PROFILES_DIR, 'user_profile.json')
     print(f"   ✅ Fichier supprimé")
 else:
     print("2. Aucun fichier de profil global trouvé. Tout est en ordre.")
@@ -41,22 +46,30 @@ else:
 # 3. Vérification des fichiers de contrats pour s'assurer qu'ils ont tous un user_id
 print("3. Vérification des contrats...")
 contracts_fixed = 0
-for filename in os.listdir(CONTRACTS_DIR):
-    if filename.endswith('.json'):
-        file_path = os.path.join(CONTRACTS_DIR, filename)
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                contract = json.load(f)
-            
+# Même backend de stockage que l'API (LEXFORGE_CONTRACT_STORE): les contrats corrigés passent par
+# save(), qui tient à jour l'index des propriétaires, le résumé et la version du contrat
+contract_store = create_contract_store(CONTRACTS_DIR, CONTRACTS_DB_PATH)
+for contract in contract_store.iter_contracts(full=False):
+    contract_id = contract.get('id')
+    if 'user_id' in contract:
+        continue
+    if not contract_id:
+        print(f"   ❌ Contrat sans ID, impossible à corriger: {contract.get('title', '')}")
+        continue
+    try:
+        with contract_store.lock(contract_id):
+            # Relire sous le verrou: le contrat a pu être modifié depuis le parcours
+            contract = contract_store.get(contract_id)
+            if contract is None or 'user_id' in contract:
+                continue
+
             # Si le contrat n'a pas de user_id, ajouter 'anonymous'
-            if 'user_id' not in contract:
-                contract['user_id'] = 'anonymous'
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    json.dump(contract, f, ensure_ascii=False, indent=2)
-                contracts_fixed += 1
-                print(f"   ⚠️ Contrat {filename} corrigé - ajout du user_id 'anonymous'")
-        except Exception as e:
-            print(f"   ❌ Erreur lors de la vérification du contrat {filename}: {e}")
+            contract['user_id'] = 'anonymous'
+            contract_store.save(contract, touch=True)
+        contracts_fixed += 1
+        print(f"   ⚠️ Contrat {contract_id} corrigé - ajout du user_id 'anonymous'")
+    except Exception as e:
+        print(f"   ❌ Erreur lors de la vérification du contrat {contract_id}: {e}")
 
 if contracts_fixed == 0:
     print("   ✅ Tous les contrats ont déjà un user_id")
@@ -68,17 +81,16 @@ print("4. Vérification des profils utilisateurs...")
 simple_ids = []
 composite_ids = []
 
-for filename in os.listdir(USER_PROFILES_DIR):
-    if filename.startswith('user_profile_') and filename.endswith('.json'):
-        # Extraire l'ID utilisateur du nom de fichier
-        user_id = filename.replace('user_profile_', '').replace('.json', '')
-        
-        # Vérifier si c'est un ID simple (sans méthode d'authentification)
-        if '_' not in user_id and not user_id.startswith('anon_'):
-            simple_ids.append((user_id, filename))
-        elif '_' in user_id:
-            # C'est déjà un ID composite
-            composite_ids.append(user_id.split('_')[0])  # Extraire l'ID de base
+for filename, file_path in data_layout.iter_files(USER_PROFILES_DIR, prefix='user_profile_'):
+    # Extraire l'ID utilisateur du nom de fichier
+    user_id = filename.replace('user_profile_', '').replace('.json', '')
+    
+    # Vérifier si c'est un ID simple (sans méthode d'authentification)
+    if '_' not in user_id and not user_id.startswith('anon_'):
+        simple_ids.append((user_id, filename))
+    elif '_' in user_id:
+        # C'est déjà un ID composite
+        composite_ids.append(user_id.split('_')[0])  # Extraire l'ID de base
 
 if simple_ids:
     print(f"   ⚠️ Trouvé {len(simple_ids)} profils avec des IDs simples qui pourraient causer des problèmes:")
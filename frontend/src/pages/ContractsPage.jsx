@@ -267,9 +267,10 @@ const ContractsPage = () => {
       // Fermer le modal de renommage
       setShowRenameModal(false);
       
-      // Définir le contrat finalisé
+      // Définir le contrat finalisé (la liste ne contient que des résumés: utiliser le contrat complet)
       setFinalizedContract({
         ...draftContract,
+        ...contractDetails,
         title: newTitle,
         is_draft: false
       });
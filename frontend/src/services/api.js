@@ -476,8 +476,10 @@ export const getContracts = async () => {
     const userId = getCurrentUserId();
     console.log('DEBUG - getContracts - userId utilisé pour la requête:', userId);
     
+    // Le tableau de bord n'affiche que les résumés (sans data, elements ni comments),
+    // sans limit: tous les contrats sont renvoyés en une fois
     const response = await api.get('/contracts', {
-      params: { user_id: userId }
+      params: { user_id: userId, view: 'summary' }
     });
     console.log('DEBUG - getContracts - Nombre de contrats reçus:', response.data.contracts.length);
     console.log('DEBUG - getContracts - Contrats reçus:', response.data.contracts);